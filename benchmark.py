@@ -0,0 +1,289 @@
+import json
+import os
+import resource
+import runpy
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+import datasetstore
+import fixtureserver as fx
+
+# 离线端到端压测：本地替身服务代替 Steam / SteamSpy / SteamScout / Ollama，
+# 每个阶段在单独的子进程里按 1×、10×、100× 语料规模运行，记录吞吐、延迟分位数和峰值内存
+SCALES = [1, 10, 100]
+BASE_GAMES = 39          # 1× = 研究中的游戏数
+REVIEWS_PER_GAME = 300   # 替身接口里每个游戏的评论总数（按点赞数降序）
+TOP_K = 50
+
+# 各替身的延迟（秒/请求；Ollama 为流式每块的间隔）与错误率（503 + Retry-After）
+LATENCY = {'steam': 0.02, 'steamspy': 0.01, 'steamscout': 0.02, 'ollama': 0.0}
+ERROR_RATE = {'steam': 0.0, 'steamspy': 0.0, 'steamscout': 0.0, 'ollama': 0.0}
+OLLAMA_TOKEN_LATENCY = 0.002
+# 压测时放开客户端限速，测的是流水线本身而不是礼貌限速
+REQUESTS_PER_SECOND = 500
+
+STAGES = ['fetch_reviews', 'median_playtime', 'regional_scores', 'process_game_reviews',
+          'figure5', 'figure6', 'figure7', 'figure8', 'table2']
+ANALYSIS_SCRIPTS = {'figure5': 'figure5.py', 'figure6': 'figure6.py', 'figure7': 'figure7.py',
+                    'figure8': 'figure8.py', 'table2': 'table2.py'}
+
+WORK_DIR = 'benchmarks/work'
+# 每次运行追加一行一个阶段的结果，带 git 提交号，用于跨提交对比
+RESULTS_FILE = 'benchmarks/results.jsonl'
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def app_ids_for(scale):
+    return [100000 + i for i in range(BASE_GAMES * scale)]
+
+
+def git_revision():
+    """(提交号, 工作区是否有未提交的修改)；不在 git 仓库里时返回 ('unknown', False)"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def timed(func, latencies):
+    """包装 func，把每次调用的耗时追加到 latencies"""
+    def call(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    return call
+
+
+def start_servers():
+    """启动四个替身服务，返回 (服务器, {名称: 基础 URL})"""
+    catalog = {str(app_id): dict(entry, appid=app_id) for app_id, entry in zip(
+        app_ids_for(max(SCALES)), fx.synthetic_steamspy_catalog(BASE_GAMES * max(SCALES)).values())}
+    groups = {
+        'steam': fx.steam_reviews_routes(REVIEWS_PER_GAME),
+        'steamspy': fx.steamspy_routes(catalog),
+        'steamscout': fx.steamscout_routes(),
+        'ollama': fx.ollama_routes(OLLAMA_TOKEN_LATENCY),
+    }
+    servers = {name: fx.FixtureServer(fx.with_faults(routes, LATENCY[name], ERROR_RATE[name])).start()
+               for name, routes in groups.items()}
+    return servers, {name: server.url for name, server in servers.items()}
+
+
+# ---- 输入准备（在父进程里完成，不计入阶段耗时和内存） ----
+
+def replicate_games(df, scale, id_column):
+    """把游戏表复制 scale 份，每份的 ID 加偏移以保持唯一"""
+    copies = []
+    for i in range(scale):
+        copy = df.copy()
+        copy[id_column] = pd.to_numeric(copy[id_column], errors='coerce') + i * 10 ** 7
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def prepare_analysis_inputs(workdir, scale):
+    """按规模复制仓库里的分析输入：games_studied、地区评分表和情感数据集
+
+    返回 {分析脚本: 输入行数}，用于计算吞吐。
+    """
+    games = pd.read_excel(os.path.join(REPO_DIR, 'games_studied.xlsx'), sheet_name='All')
+    with pd.ExcelWriter(os.path.join(workdir, 'games_studied.xlsx')) as writer:
+        replicate_games(games, scale, 'steamId').to_excel(writer, sheet_name='All', index=False)
+
+    # 地区评分表：行是语言、列是游戏，最后一行是全球平均
+    regional = pd.read_excel(os.path.join(REPO_DIR, 'games_studied_regional_score.xlsx'), sheet_name='Sheet1')
+    games_part = regional.iloc[:, 1:]
+    wide = pd.concat([regional[['Language']]] + [games_part.set_axis([f"{c}_{i}" for c in games_part.columns], axis=1)
+                                                 for i in range(scale)], axis=1)
+    wide.to_excel(os.path.join(workdir, 'games_studied_regional_score.xlsx'), sheet_name='Sheet1', index=False)
+
+    excel_file = pd.ExcelFile(os.path.join(REPO_DIR, 'emotion_scores.xlsx'))
+    sheets = [name for name in excel_file.sheet_names if name != 'Sheet1']
+    frames = {name: excel_file.parse(name) for name in sheets}
+    output = os.path.join(workdir, datasetstore.EMOTIONS_DATASET)
+    for i in range(scale):
+        for name, df in frames.items():
+            datasetstore.write_frame(df, output, datasetstore.EMOTION_SCHEMA, int(name) + i * 10 ** 7)
+
+    rows = dict.fromkeys(['figure5', 'figure6', 'figure7'], len(games) * scale)
+    rows['table2'] = games_part.size * scale
+    rows['figure8'] = sum(len(df) for df in frames.values()) * scale
+    return rows
+
+
+def prepare_review_dataset(workdir, scale):
+    """与 Steam 替身相同的合成评论，每个游戏取前 TOP_K 条写成评论数据集（workdir 为打分阶段的目录）"""
+    output = os.path.join(workdir, datasetstore.REVIEWS_DATASET)
+    for app_id in app_ids_for(scale):
+        reviews = fx.synthetic_steam_reviews(str(app_id), REVIEWS_PER_GAME)[:TOP_K]
+        df = pd.DataFrame({
+            'review_id': [r['recommendationid'] for r in reviews],
+            'language': [r['language'] for r in reviews],
+            'is_recommended': [r['voted_up'] for r in reviews],
+            'votes_up': [r['votes_up'] for r in reviews],
+            'votes_funny': [r['votes_funny'] for r in reviews],
+            'weighted_score': [float(r['weighted_vote_score']) for r in reviews],
+            'playtime_at_review': [f"{r['author']['playtime_at_review'] / 60:.1f}h" for r in reviews],
+            'content': [r['review'] for r in reviews],
+            'created_at': pd.to_datetime([r['timestamp_created'] for r in reviews], unit='s'),
+            'steam_purchase': [r['steam_purchase'] for r in reviews],
+        })
+        datasetstore.write_frame(df, output, datasetstore.REVIEW_SCHEMA, app_id)
+    return BASE_GAMES * scale * TOP_K
+
+
+# ---- 各阶段（在子进程里运行，返回 (处理条数, 每条耗时列表, 错误数)） ----
+
+def stage_fetch_reviews(urls, app_ids):
+    import fetchsteamreviewsample as fetcher
+    fetcher.STEAM_REVIEWS_URL = urls['steam'] + '/appreviews/{app_id}'
+    latencies = []
+    results = fetcher.fetch_all(app_ids, requests_per_second=REQUESTS_PER_SECOND,
+                                fetch=timed(fetcher.fetch_reviews, latencies))
+    return len(results), latencies, sum(df is None for df in results.values())
+
+
+def stage_median_playtime(urls, app_ids):
+    import steamspyapisample as steamspy
+    client = steamspy.SteamSpyClient(base_url=urls['steamspy'] + '/api.php',
+                                     requests_per_second=REQUESTS_PER_SECOND, cache_path=None)
+    latencies = []
+    client.appdetails = timed(client.appdetails, latencies)
+    with steamspy.ResultSink() as sink:
+        playtimes = steamspy.get_median_playtime(app_ids, client=client, sink=sink)
+    client.close()
+    return len(playtimes), latencies, sum(value is None for value in playtimes.values())
+
+
+def stage_regional_scores(urls, app_ids):
+    import fetchregionalscoresample as regional
+    latencies = []
+    regional.fetch_scores_http = timed(regional.fetch_scores_http, latencies)
+    url = urls['steamscout'] + '/SteamScout/steamAPI.php?appID={app_id}'
+    results = regional.fetch_all_http(app_ids, requests_per_second=REQUESTS_PER_SECOND, url=url)
+    return len(results), latencies, sum(df is None for df in results.values())
+
+
+def stage_process_game_reviews(urls, app_ids):
+    import sentimentanalysissample as scoring
+    latencies = []
+    scoring.analyze_sentiment = timed(scoring.analyze_sentiment, latencies)
+    scoring.process_game_reviews(datasetstore.REVIEWS_DATASET, datasetstore.EMOTIONS_DATASET)
+    scores = datasetstore.read_frame(datasetstore.EMOTIONS_DATASET, datasetstore.EMOTION_SCHEMA,
+                                     columns=['dominant_emotion'])
+    return len(scores), latencies, int((scores['dominant_emotion'] == 'error').sum())
+
+
+def run_analysis(stage, rows):
+    """在工作目录里整体运行一个分析脚本；每次运行算一条延迟"""
+    import matplotlib
+    matplotlib.use('Agg')
+    start = time.perf_counter()
+    runpy.run_path(os.path.join(REPO_DIR, ANALYSIS_SCRIPTS[stage]), run_name='__main__')
+    return rows, [time.perf_counter() - start], 0
+
+
+def run_stage(stage, scale, urls, workdir, app_ids, rows):
+    """子进程入口：切到工作目录运行阶段，返回指标字典"""
+    os.chdir(workdir)
+    os.environ['OLLAMA_HOST'] = urls['ollama']
+    start = time.perf_counter()
+    try:
+        if stage in ANALYSIS_SCRIPTS:
+            items, latencies, errors = run_analysis(stage, rows)
+        else:
+            items, latencies, errors = globals()[f"stage_{stage}"](urls, app_ids)
+        status = 'ok'
+    except Exception as e:
+        items, latencies, errors, status = 0, [], 0, f"failed: {type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    metrics = {'stage': stage, 'scale': scale, 'status': status, 'items': items, 'errors': errors,
+               'seconds': round(seconds, 3), 'throughput': round(items / seconds, 2) if seconds else None}
+    if latencies:
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        metrics.update(p50_ms=round(p50 * 1000, 2), p90_ms=round(p90 * 1000, 2), p99_ms=round(p99 * 1000, 2))
+    # Linux 上 ru_maxrss 的单位是 KB；阶段里启动的子进程（如多进程池）单独统计，
+    # RUSAGE_CHILDREN 是已回收子进程中的最大值，不是总和
+    metrics['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    metrics['children_peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    return metrics
+
+
+def previous_results(path, commit):
+    """其他提交最近一次的结果：{(阶段, 规模): 指标}"""
+    previous = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get('commit') != commit and record.get('status') == 'ok':
+                    previous[(record['stage'], record['scale'])] = record
+    return previous
+
+
+def report(results, previous):
+    table = pd.DataFrame(results)
+    baseline = [previous.get((r['stage'], r['scale']), {}) for r in results]
+    table['vs_commit'] = [b.get('commit', '') for b in baseline]
+    table['throughput_change'] = [
+        f"{(r['throughput'] / b['throughput'] - 1) * 100:+.1f}%" if b.get('throughput') and r['throughput'] else ''
+        for r, b in zip(results, baseline)]
+    columns = ['stage', 'scale', 'status', 'items', 'errors', 'seconds', 'throughput',
+               'p50_ms', 'p90_ms', 'p99_ms', 'peak_rss_mb', 'children_peak_rss_mb', 'vs_commit', 'throughput_change']
+    print(table.reindex(columns=columns).to_string(index=False))
+
+
+def run_benchmark(stages=STAGES, scales=SCALES, results_file=RESULTS_FILE, work_dir=WORK_DIR):
+    commit, dirty = git_revision()
+    previous = previous_results(results_file, commit)
+    servers, urls = start_servers()
+    # 子进程在导入 ollama 之前设置 OLLAMA_HOST（客户端在导入时读取）
+    os.environ['MPLBACKEND'] = 'Agg'
+    results = []
+    try:
+        for scale in scales:
+            workdir = os.path.abspath(os.path.join(work_dir, f"{scale}x"))
+            shutil.rmtree(workdir, ignore_errors=True)
+            os.makedirs(workdir)
+            # 打分阶段有自己的目录，写出的情感数据集不会混进分析脚本的输入
+            scoring_dir = os.path.join(workdir, 'scoring')
+            os.makedirs(scoring_dir)
+            analysis_rows = prepare_analysis_inputs(workdir, scale) if set(stages) & set(ANALYSIS_SCRIPTS) else {}
+            review_rows = prepare_review_dataset(scoring_dir, scale) if 'process_game_reviews' in stages else 0
+            for stage in stages:
+                scoring = stage == 'process_game_reviews'
+                print(f"[{scale}x] {stage} ...")
+                # 每个阶段一个新进程，峰值内存只反映该阶段
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                    metrics = pool.submit(run_stage, stage, scale, urls, scoring_dir if scoring else workdir,
+                                          app_ids_for(scale),
+                                          review_rows if scoring else analysis_rows.get(stage, 0)).result()
+                metrics.update(commit=commit, dirty=dirty, timestamp=pd.Timestamp.now().isoformat(timespec='seconds'))
+                results.append(metrics)
+    finally:
+        for server in servers.values():
+            server.stop()
+
+    os.makedirs(os.path.dirname(results_file) or '.', exist_ok=True)
+    with open(results_file, 'a', encoding='utf-8') as f:
+        for metrics in results:
+            f.write(json.dumps(metrics, ensure_ascii=False) + '\n')
+    report(results, previous)
+    return results
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,210 @@
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import metrics
+
+# 各阶段之间的交换格式：按 app_id 分区的 Parquet 数据集（hive 目录结构），每个游戏一个文件，
+# 行序即写入顺序（评论按点赞数排列）；xlsx 只作为显式导出目标
+REVIEWS_DATASET = 'data/reviews'
+EMOTIONS_DATASET = 'data/emotion_scores'
+
+EMOTION_TYPES = ['Anger', 'Disgust', 'Anticipation', 'Fear',
+                 'Joy', 'Sadness', 'Trust', 'Surprise']
+
+REVIEW_SCHEMA = pa.schema([
+    ('app_id', pa.int64()),
+    ('review_id', pa.string()),
+    ('language', pa.string()),
+    ('is_recommended', pa.bool_()),
+    ('votes_up', pa.int64()),
+    ('votes_funny', pa.int64()),
+    ('weighted_score', pa.float64()),
+    ('playtime_at_review', pa.string()),
+    ('content', pa.string()),
+    ('created_at', pa.timestamp('s')),
+    ('steam_purchase', pa.bool_()),
+])
+
+EMOTION_SCHEMA = pa.schema([
+    ('app_id', pa.int64()),
+    ('review_id', pa.string()),
+    ('content', pa.string()),
+    ('language', pa.string()),
+    ('is_recommended', pa.string()),
+    ('sentiment', pa.string()),
+    ('confidence', pa.float64()),
+    ('dominant_emotion', pa.string()),
+] + [(emotion, pa.float64()) for emotion in EMOTION_TYPES])
+
+# 读取 一游戏一工作表 Excel 的进程数：每个进程只打开一次工作簿，负责一段连续的工作表
+EXCEL_WORKERS = os.cpu_count() or 1
+SKIP_SHEETS = ('0_Summary', 'Sheet1')
+
+# 不按 language 分区：分区会把一个游戏的行按语言分组，读回来就不是写入时的顺序了；
+# 按语言过滤仍可下推到 Parquet 行组统计
+PARTITION_SCHEMA = pa.schema([('app_id', pa.int64())])
+
+
+def partitioning():
+    return ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+
+def to_table(df, schema):
+    """DataFrame -> 符合 schema 的 Arrow 表（df 需已含 app_id 列）"""
+    df = df.copy()
+    df['review_id'] = df['review_id'].astype(str)
+    if 'is_recommended' in df and pa.types.is_string(schema.field('is_recommended').type):
+        df['is_recommended'] = df['is_recommended'].astype(object).where(df['is_recommended'].notna(), None)
+    return pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+
+def write_frame(df, path, schema, app_id):
+    """写入（替换）单个游戏的数据，保持 df 的行序
+
+    先写到临时目录再换进去，中断时旧分区仍然完整；以 '.' 开头的目录不会被读取。
+    """
+    partition = os.path.join(path, f"app_id={int(app_id)}")
+    tmp = os.path.join(path, f".tmp-app_id={int(app_id)}")
+    old = os.path.join(path, f".old-app_id={int(app_id)}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    table = to_table(df.assign(app_id=int(app_id)), schema)
+    # 分区列不写进文件，读取时由目录名还原
+    pq.write_table(table.drop_columns(['app_id']), os.path.join(tmp, 'part-0.parquet'))
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(partition):
+        os.rename(partition, old)
+    os.rename(tmp, partition)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def to_expression(filters):
+    """{列名: 值或值列表} -> pyarrow 过滤表达式；已经是表达式时原样返回"""
+    if filters is None or isinstance(filters, ds.Expression):
+        return filters
+    expression = None
+    for column, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            condition = ds.field(column).isin(list(value))
+        else:
+            condition = ds.field(column) == value
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def open_dataset(path, schema):
+    return ds.dataset(path, schema=schema, format='parquet', partitioning=partitioning())
+
+
+def read_frame(path, schema, columns=None, filters=None):
+    """读取数据集：columns 只读需要的列，filters 下推到分区裁剪和 Parquet 行组统计"""
+    table = open_dataset(path, schema).to_table(columns=columns, filter=to_expression(filters))
+    return table.to_pandas()
+
+
+def exists(path):
+    return os.path.isdir(path) and any(name.startswith('app_id=') for name in os.listdir(path))
+
+
+def app_ids(path):
+    """数据集中已有的 app_id（按分区目录，不读文件内容）"""
+    if not os.path.isdir(path):
+        return []
+    return sorted(int(name.split('=', 1)[1]) for name in os.listdir(path) if name.startswith('app_id='))
+
+
+def export_excel(path, schema, output_file, columns=None, order=None):
+    """显式导出为 一游戏一工作表 的 Excel；order 指定工作表顺序"""
+    ids = order if order is not None else app_ids(path)
+    columns = columns or [name for name in schema.names if name != 'app_id']
+    with metrics.timer('excel_io_seconds', op='write', file=output_file), \
+            pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        for app_id in ids:
+            df = read_frame(path, schema, columns=columns, filters={'app_id': int(app_id)})
+            df.to_excel(writer, sheet_name=str(app_id), index=False)
+
+
+def _read_sheets(xlsx_file, sheet_names, columns):
+    """在一个进程里流式读取若干工作表：返回 ({列名: 值列表}, 各工作表的行数)
+
+    columns 为 None 时取第一个工作表的全部列；末尾的空行去掉（与 pandas.read_excel 一致）。
+    """
+    workbook = openpyxl.load_workbook(xlsx_file, read_only=True, data_only=True)
+    data, lengths = {}, []
+    try:
+        for sheet_name in sheet_names:
+            rows = workbook[sheet_name].iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            names = columns or list(data) or [name for name in header if name is not None]
+            missing = [name for name in names if name not in header]
+            if missing:
+                raise KeyError(f"{xlsx_file} 的工作表 {sheet_name} 缺少列 {missing}")
+            values = list(rows)
+            while values and all(value is None for value in values[-1]):
+                values.pop()
+            for name in names:
+                i = header.index(name)
+                data.setdefault(name, []).extend(row[i] if i < len(row) else None for row in values)
+            lengths.append(len(values))
+    finally:
+        workbook.close()
+    return data, lengths
+
+
+def read_workbook(xlsx_file, columns=None, skip_sheets=SKIP_SHEETS, workers=EXCEL_WORKERS):
+    """读取 一游戏一工作表 的 Excel，所有工作表合成一个 DataFrame，app_id 列为工作表名
+
+    只取 columns 列；工作表按连续的段分给进程池，各段的值按列拼接后一次构造 DataFrame，
+    不生成逐表的中间 DataFrame。
+    """
+    with metrics.timer('excel_io_seconds', op='read', file=xlsx_file):
+        workbook = openpyxl.load_workbook(xlsx_file, read_only=True)
+        sheet_names = [name for name in workbook.sheetnames if name not in skip_sheets]
+        workbook.close()
+
+        size = -(-len(sheet_names) // max(workers, 1)) or 1
+        chunks = [sheet_names[start:start + size] for start in range(0, len(sheet_names), size)]
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+                parts = list(pool.map(_read_sheets, repeat(xlsx_file), chunks, repeat(columns)))
+        else:
+            parts = [_read_sheets(xlsx_file, chunk, columns) for chunk in chunks]
+
+    names = list(columns or (parts[0][0] if parts else []))
+    lengths = [length for _, part_lengths in parts for length in part_lengths]
+    data = {'app_id': np.repeat(np.array([int(name) for name in sheet_names], dtype=np.int64), lengths)}
+    for name in names:
+        data[name] = list(chain.from_iterable(part[name] for part, _ in parts))
+    frame = pd.DataFrame(data)
+    # 与 pandas.read_excel 一致：全部能解析成数字的文本列转为数字（如以文本保存的 review_id）
+    for name in names:
+        if pd.api.types.infer_dtype(frame[name], skipna=True) in ('string', 'mixed', 'mixed-integer'):
+            numeric = pd.to_numeric(frame[name], errors='coerce')
+            if numeric.notna().equals(frame[name].notna()):
+                frame[name] = numeric
+    return frame
+
+
+def import_excel(xlsx_file, path, schema, skip_sheets=SKIP_SHEETS):
+    """把旧的 一游戏一工作表 Excel 一次性转成数据集"""
+    frame = read_workbook(xlsx_file, [name for name in schema.names if name != 'app_id'], skip_sheets)
+    if schema is REVIEW_SCHEMA:
+        frame['created_at'] = pd.to_datetime(frame['created_at'])
+    for app_id, df in frame.groupby('app_id', sort=False):
+        write_frame(df, path, schema, app_id)
+
+
+if __name__ == "__main__":
+    # 把仓库里已有的 Excel 结果转成数据集
+    import_excel('steam_reviews_top50.xlsx', REVIEWS_DATASET, REVIEW_SCHEMA)
+    import_excel('emotion_scores.xlsx', EMOTIONS_DATASET, EMOTION_SCHEMA)
+    print(f"已导入 {REVIEWS_DATASET} 与 {EMOTIONS_DATASET}")
@@ -0,0 +1,162 @@
+import hashlib
+import os
+
+import numpy as np
+from ollama import embed
+
+# 已打分评论的向量库：新评论与足够相似的已打分评论共享情感向量，不再调用大模型
+INDEX_DIR = 'embedding_index'
+EMBED_MODEL = 'bge-m3'  # 多语言（含中文）嵌入模型，可在 CPU 上运行
+EMBED_BATCH_SIZE = 64
+SEARCH_CHUNK = 50000
+# 分片文件数超过这个值时，启动时合并成一个
+MAX_SHARDS = 64
+
+
+def embed_texts(texts, model=EMBED_MODEL, batch_size=EMBED_BATCH_SIZE):
+    """批量求嵌入并做 L2 归一化（之后内积即余弦相似度）；空输入返回 (0, 0) 的数组"""
+    if len(texts) == 0:
+        return np.empty((0, 0), dtype=np.float32)
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        batch = [text if isinstance(text, str) else '' for text in texts[start:start + batch_size]]
+        vectors.extend(embed(model=model, input=batch)['embeddings'])
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def text_key(text):
+    """评论文本的哈希，用来判断某条评论是否已经在库里"""
+    return hashlib.sha1(str(text).encode('utf-8')).hexdigest()
+
+
+class EmbeddingIndex:
+    """持久化在 INDEX_DIR 下的向量库：向量、情感强度、置信度和文本哈希按行对齐，支持增量追加
+
+    内存里是按倍数扩容的预分配数组，追加均摊 O(新增行数)；磁盘上每次 save 只把上次保存之后
+    新增的行写成一个分片文件（shard-NNNNNN.npz），启动时分片超过 MAX_SHARDS 个就合并成一个。
+    规模在几十万条以内，按块做矩阵乘法的精确最近邻已足够快，不需要额外的 ANN 依赖。
+    """
+
+    def __init__(self, path=INDEX_DIR):
+        self.path = path
+        self.size = 0
+        self.saved = 0
+        self._vectors = None
+        self._emotions = None
+        self._confidence = None
+        self.keys = []
+        self.key_set = set()
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.endswith('.tmp'):  # 上次中断时没写完的分片
+                os.remove(os.path.join(path, name))
+        shards = self.shard_files()
+        # 合并出的分片包含它之前所有分片的内容，之前的分片（合并后没来得及删的）跳过并删除
+        for i in range(len(shards) - 1, 0, -1):
+            with np.load(os.path.join(path, shards[i])) as data:
+                if 'merged' in data.files:
+                    for name in shards[:i]:
+                        os.remove(os.path.join(path, name))
+                    shards = shards[i:]
+                    break
+        for name in shards:
+            with np.load(os.path.join(path, name)) as data:
+                self.add(data['vectors'], data['emotions'], data['confidence'],
+                         data['keys'].tolist() if 'keys' in data.files else None)
+        self.saved = self.size
+        self.next_shard = int(shards[-1][6:12]) + 1 if shards else 0
+        if len(shards) > MAX_SHARDS:
+            self._write_shard(self.next_shard, slice(0, self.size), merged=True)
+            for name in shards:
+                os.remove(os.path.join(path, name))
+            self.next_shard += 1
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, text):
+        return text_key(text) in self.key_set
+
+    @property
+    def vectors(self):
+        return None if self._vectors is None else self._vectors[:self.size]
+
+    @property
+    def emotions(self):
+        return None if self._emotions is None else self._emotions[:self.size]
+
+    @property
+    def confidence(self):
+        return None if self._confidence is None else self._confidence[:self.size]
+
+    def shard_files(self):
+        return sorted(name for name in os.listdir(self.path)
+                      if name.startswith('shard-') and name.endswith('.npz'))
+
+    def add(self, vectors, emotions, confidence, keys=None):
+        """追加已打分的评论：容量不够时按倍数扩容；keys 为各行的 text_key（未知时为空字符串）"""
+        if len(vectors) == 0:
+            return
+        keys = [''] * len(vectors) if keys is None else list(keys)
+        self.keys.extend(keys)
+        self.key_set.update(key for key in keys if key)
+        end = self.size + len(vectors)
+        if self._vectors is None:
+            self._vectors = np.empty((end, vectors.shape[1]), dtype=np.float32)
+            self._emotions = np.empty((end, emotions.shape[1]), dtype=np.float64)
+            self._confidence = np.empty(end, dtype=np.float64)
+        elif end > len(self._vectors):
+            capacity = max(end, 2 * len(self._vectors))
+            self._vectors = _grow(self._vectors, self.size, capacity)
+            self._emotions = _grow(self._emotions, self.size, capacity)
+            self._confidence = _grow(self._confidence, self.size, capacity)
+        self._vectors[self.size:end] = vectors
+        self._emotions[self.size:end] = emotions
+        self._confidence[self.size:end] = confidence
+        self.size = end
+
+    def save(self):
+        """把上次保存之后新增的行写成一个新分片"""
+        if self.size == self.saved:
+            return
+        self._write_shard(self.next_shard, slice(self.saved, self.size))
+        self.next_shard += 1
+        self.saved = self.size
+
+    def _shard_name(self, number):
+        return f"shard-{number:06d}.npz"
+
+    def _write_shard(self, number, rows, merged=False):
+        """先写临时文件再替换，中断时不会留下半个分片；merged 表示包含之前所有分片的内容"""
+        tmp = os.path.join(self.path, self._shard_name(number) + '.tmp')
+        extra = {'merged': np.array(True)} if merged else {}
+        with open(tmp, 'wb') as f:
+            np.savez(f, vectors=self._vectors[rows], emotions=self._emotions[rows],
+                     confidence=self._confidence[rows], keys=np.array(self.keys[rows], dtype=str), **extra)
+        os.replace(tmp, os.path.join(self.path, self._shard_name(number)))
+
+    def search(self, queries, k):
+        """返回 (相似度, 下标)，形状均为 (len(queries), k)，按相似度降序"""
+        k = min(k, len(self))
+        vectors = self.vectors
+        best_sim = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_idx = np.zeros((len(queries), k), dtype=np.int64)
+        for start in range(0, len(self), SEARCH_CHUNK):
+            sims = queries @ vectors[start:start + SEARCH_CHUNK].T
+            idx = np.arange(start, start + sims.shape[1])[None, :].repeat(len(queries), axis=0)
+            # 与目前的前 k 合并后再取前 k
+            sims = np.hstack([best_sim, sims])
+            idx = np.hstack([best_idx, idx])
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            best_sim = np.take_along_axis(sims, top, axis=1)
+            best_idx = np.take_along_axis(idx, top, axis=1)
+        order = np.argsort(-best_sim, axis=1)
+        return np.take_along_axis(best_sim, order, axis=1), np.take_along_axis(best_idx, order, axis=1)
+
+
+def _grow(array, size, capacity):
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:size] = array[:size]
+    return grown
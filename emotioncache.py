@@ -0,0 +1,114 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+# 情感打分结果缓存：键为 评论文本 + 模型 + 选项 + 提示词版本 的哈希
+CACHE_PATH = 'emotion_cache.sqlite'
+MAX_BYTES = 512 * 1024 * 1024
+# 命中时只在内存里记下使用时间，攒够这么多条（或写入、淘汰、关闭时）再一次写回 last_used
+TOUCH_BATCH = 1000
+
+
+def make_key(text, model, options, prompt_version):
+    """内容寻址的缓存键：任何一项变化都会得到新的键"""
+    payload = json.dumps({'text': text, 'model': model, 'options': options, 'prompt_version': prompt_version},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class EmotionCache:
+    """SQLite 持久化的结果缓存，总大小超过 max_bytes 时按最近最少使用淘汰"""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, result TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        self.counters = {'hits': 0, 'misses': 0, 'stores': 0, 'skipped_errors': 0, 'evictions': 0}
+        self.touched = {}
+
+    def close(self):
+        with self.lock, self.conn:
+            self._flush_touched()
+        self.conn.close()
+
+    def _flush_touched(self):
+        """把攒下的使用时间写回（调用方持有锁并负责提交）"""
+        if self.touched:
+            self.conn.executemany("UPDATE results SET last_used = ? WHERE key = ?",
+                                  [(used, key) for key, used in self.touched.items()])
+            self.touched = {}
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT result FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters['misses'] += 1
+                return None
+            self.counters['hits'] += 1
+            # 读路径不写库、不提交，并发的打分线程不会排队等磁盘同步
+            self.touched[key] = time.time()
+            if len(self.touched) >= TOUCH_BATCH:
+                with self.conn:
+                    self._flush_touched()
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """保存结果；出错时的兜底结果（dominant_emotion == 'error'）不缓存"""
+        if result.get('dominant_emotion') == 'error':
+            with self.lock:
+                self.counters['skipped_errors'] += 1
+            return
+        body = json.dumps(result, ensure_ascii=False)
+        size = len(body.encode('utf-8'))
+        with self.lock, self.conn:
+            self._flush_touched()  # 淘汰按 last_used 排序，先写回命中记录
+            old = self.conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO results (key, result, size, last_used) VALUES (?, ?, ?, ?)",
+                              (key, body, size, time.time()))
+            self.total_bytes += size - (old[0] if old else 0)
+            self.counters['stores'] += 1
+            self._evict()
+
+    def _evict(self):
+        """删除最久未使用的条目直到总大小回到上限以内（调用方持有锁）"""
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute("SELECT key, size FROM results ORDER BY last_used LIMIT 256").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.total_bytes -= size
+                self.counters['evictions'] += 1
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            entries = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = entries
+        stats['bytes'] = self.total_bytes
+        return stats
+
+
+def cached(scorer, cache, model, options, prompt_version):
+    """包装打分函数：命中缓存直接返回，否则调用 scorer 并写入缓存"""
+    def score(text):
+        key = make_key(text, model, options, prompt_version)
+        result = cache.get(key)
+        if result is None:
+            result = scorer(text)
+            cache.put(key, result)
+        return result
+    return score
@@ -0,0 +1,130 @@
+import math
+import re
+
+# 中英双语情感词典：词 -> 强度（0-1），与 analyze_sentiment 提示词中的示例保持一致
+LEXICON = {
+    'Anger': {
+        '垃圾': 0.95, '辣鸡': 0.95, '傻逼': 0.95, '退钱': 0.9, '坑钱': 0.9, '骗钱': 0.9, '恶心人': 0.85,
+        '吃相难看': 0.9, '滚出去': 0.8, '差评': 0.8, '气死': 0.85, '愤怒': 0.85, '什么玩意': 0.8,
+        'trash': 0.9, 'garbage': 0.9, 'scam': 0.9, 'refund': 0.8, 'cash grab': 0.9, 'greedy': 0.85,
+        'terrible': 0.85, 'worst': 0.85, 'awful': 0.8, 'hate': 0.85, 'angry': 0.85, 'ripoff': 0.9,
+    },
+    'Disgust': {
+        '恶心': 0.9, '反胃': 0.85, '辣眼睛': 0.85, '令人作呕': 0.9, '一坨屎': 0.9, '一坨': 0.85, '粪作': 0.85,
+        'disgusting': 0.9, 'gross': 0.8, 'pathetic': 0.8, 'shameful': 0.8, 'unplayable': 0.85,
+        'broken': 0.75, 'sucks': 0.8, 'dogshit': 0.9, 'shit': 0.8,
+    },
+    'Anticipation': {
+        '等更新': 0.8, '期待': 0.85, '等优化': 0.8, '希望': 0.7, '未来可期': 0.85, '坐等': 0.75, '催更': 0.75,
+        'looking forward': 0.85, 'can\'t wait': 0.85, 'hope': 0.7, 'hopefully': 0.7, 'potential': 0.75,
+        'future updates': 0.8, 'early access': 0.6, 'roadmap': 0.7,
+    },
+    'Fear': {
+        '封号': 0.7, '害怕': 0.8, '吓人': 0.8, '恐怖': 0.75, '担心': 0.7, '跑路': 0.75, '吓死': 0.8,
+        'scary': 0.8, 'terrifying': 0.85, 'afraid': 0.8, 'worried': 0.7, 'ban': 0.6, 'horror': 0.6,
+        'creepy': 0.75, 'anxious': 0.7,
+    },
+    'Joy': {
+        '太好玩了': 0.95, '好玩': 0.9, '神作': 0.95, '好评': 0.85, '推荐': 0.8, '爽快': 0.85, '很爽': 0.85, '开心': 0.85,
+        '喜欢': 0.8, '快乐': 0.9, '上头': 0.85, '真香': 0.9, '满分': 0.9,
+        'masterpiece': 0.95, 'amazing': 0.9, 'awesome': 0.9, 'fun': 0.85, 'love': 0.85, 'great': 0.8,
+        'excellent': 0.9, 'fantastic': 0.9, 'addictive': 0.85, 'goty': 0.95, 'best game': 0.95,
+    },
+    'Sadness': {
+        '好友退游': 0.85, '退游': 0.8, '可惜': 0.75, '难过': 0.85, '伤心': 0.85, '遗憾': 0.75, '哭了': 0.8,
+        '凉了': 0.75, '泪目': 0.8,
+        'sad': 0.85, 'unfortunately': 0.7, 'disappointed': 0.8, 'disappointing': 0.8, 'miss': 0.6,
+        'cried': 0.8, 'dead game': 0.8, 'heartbreaking': 0.85,
+    },
+    'Trust': {
+        '官方良心': 0.9, '良心': 0.85, '诚意': 0.8, '靠谱': 0.8, '支持': 0.75, '值得': 0.8, '信任': 0.85,
+        'worth it': 0.85, 'worth the money': 0.85, 'recommend': 0.8, 'reliable': 0.8, 'devs care': 0.85,
+        'trust': 0.85, 'solid': 0.75, 'polished': 0.75,
+    },
+    'Surprise': {
+        '没想到': 0.75, '惊喜': 0.8, '意外': 0.7, '震惊': 0.8, '居然': 0.7, '竟然': 0.7,
+        'surprised': 0.8, 'surprisingly': 0.75, 'unexpected': 0.75, 'wow': 0.75, 'didn\'t expect': 0.8,
+        'mind blowing': 0.85, 'shocked': 0.8,
+    },
+}
+
+POSITIVE = {'Anticipation', 'Joy', 'Trust', 'Surprise'}
+
+# 形如 10/10、3/10 的打分
+RATING_PATTERN = re.compile(r'(?<![\d.])(10|\d)(?:\.\d)?\s*/\s*10(?![\d])')
+
+# 否定词：命中词前面同一分句内、中文 NEGATION_WINDOW_CHARS 个字或英文 NEGATION_WINDOW_WORDS 个词以内出现时，
+# 这个命中不计入情感强度，权重算到相反的极性上（"不好玩" 不再是 Joy）
+NEGATION_ZH = re.compile(r'不|没|别|毫无|并非|无(?!敌|比|限)')
+NEGATION_EN = re.compile(r"\b(?:not|no|never|cannot|hardly|without)\b|n't\b", re.IGNORECASE)
+CLAUSE_BREAK = re.compile(r'[，。！？；、,.!?;:\n]')
+NEGATION_WINDOW_CHARS = 3
+NEGATION_WINDOW_WORDS = 3
+
+# 超过这个长度的评论词典覆盖不全，置信度按比例降低，更可能交给大模型
+SHORT_TEXT_CHARS = 80
+
+
+def _compile():
+    """按词长降序构造一个正则，英文词加单词边界，中文直接匹配"""
+    terms = {}
+    for emotion, words in LEXICON.items():
+        for word, weight in words.items():
+            terms[word] = (emotion, weight)
+    parts = []
+    for word in sorted(terms, key=len, reverse=True):
+        escaped = re.escape(word)
+        parts.append(rf'\b{escaped}\b' if word.isascii() else escaped)
+    return re.compile('|'.join(parts), re.IGNORECASE), terms
+
+
+PATTERN, TERMS = _compile()
+
+
+def is_negated(text, start, word):
+    """命中词（从 start 开始）是否被前面同一分句里的否定词修饰"""
+    before = CLAUSE_BREAK.split(text[max(0, start - 40):start])[-1]
+    if word.isascii():
+        return bool(NEGATION_EN.search(' '.join(before.split()[-NEGATION_WINDOW_WORDS:])))
+    return bool(NEGATION_ZH.search(before[-NEGATION_WINDOW_CHARS:]))
+
+
+def score_text(text):
+    """返回 (八维情感强度, 置信度)；没有命中任何（未被否定的）词时置信度为 0"""
+    emotions = {emotion: 0.0 for emotion in LEXICON}
+    if not isinstance(text, str) or not text.strip():
+        return emotions, 0.0
+
+    hits, negated = [], []
+    for match in PATTERN.finditer(text):
+        term = TERMS[match.group(0).lower()]
+        (negated if is_negated(text, match.start(), match.group(0)) else hits).append(term)
+    for match in RATING_PATTERN.finditer(text):
+        rating = int(match.group(1))
+        if rating >= 8:
+            hits.append(('Joy', 0.6 + 0.04 * rating))
+        elif rating <= 4:
+            hits.append(('Disgust', 0.9 - 0.05 * rating))
+
+    if not hits:
+        return emotions, 0.0
+
+    positive = negative = 0.0
+    for emotion, weight in negated:
+        if emotion in POSITIVE:
+            negative += weight
+        else:
+            positive += weight
+    for emotion, weight in hits:
+        # 同一情感多次命中时略微增强，最多到 1.0
+        emotions[emotion] = min(1.0, max(emotions[emotion], weight) + 0.05 * (emotions[emotion] > 0))
+        if emotion in POSITIVE:
+            positive += weight
+        else:
+            negative += weight
+
+    # 置信度 = 极性纯度 × 命中强度 × 长度系数
+    purity = abs(positive - negative) / (positive + negative)
+    strength = 1 - math.exp(-(positive + negative))
+    length = min(1.0, SHORT_TEXT_CHARS / max(len(text), 1))
+    return emotions, round(purity * strength * length, 4)
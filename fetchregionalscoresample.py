@@ -1,59 +1,298 @@
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-import pandas as pd
-import random
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+import pandas as pd
+
+import metrics
+from httpclient import RateLimiter, get_with_retry
+
+try:
+    from selenium import webdriver
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from webdriver_manager.chrome import ChromeDriverManager
+except ImportError:  # 只用 http 后端时不需要安装 selenium / Chrome
+    webdriver = None
 
 # 要爬取的 appID 列表
 app_ids = [
     2358720, 1623730
 ]
 
-# 设置 ChromeDriver 的路径
-service = Service(ChromeDriverManager().install())
+SCOUT_URL = "https://www.togeproductions.com/SteamScout/steamAPI.php?appID={app_id}"
+
+# 浏览器池大小（同时打开的页面数）、等待表格出现的超时、行数保持不变多久视为加载完成
+POOL_SIZE = 4
+PAGE_TIMEOUT = 90
+SETTLE_SECONDS = 3
+
+# 抓取后端：'selenium' 渲染整页；'http' 不启动浏览器，直接请求数据源并只解析需要的表格
+# SCOUT_URL 的表格由 JavaScript 生成，直接请求只能拿到空壳页面，所以 http 后端必须把
+# SCOUT_DATA_URL 设为页面实际发出的数据请求（返回含表格的 HTML，可用 {app_id} 占位），未设置时启动即报错
+BACKEND = 'selenium'
+SCOUT_DATA_URL = None
+HTTP_WORKERS = 8
+HTTP_REQUESTS_PER_SECOND = 2.0
+
+# 设置后 selenium 后端会把渲染好的页面保存为 <app_id>.html，供 fixtureserver 回放
+RECORD_DIR = None
 
 # 创建一个 Excel 文件
 output_file = "regional_review_scores.xlsx"
 
-# 初始创建 Excel 文件
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-    for app_id in app_ids:
-        url = f"https://www.togeproductions.com/SteamScout/steamAPI.php?appID={app_id}"
 
-        # 初始化 Selenium WebDriver
-        driver = webdriver.Chrome(service=service)
-        driver.get(url)
+def make_driver(service):
+    """无头 Chrome"""
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    return webdriver.Chrome(service=service, options=options)
 
-        # 随机等待页面加载，时间范围从 40 到 70 秒
-        time.sleep(random.randint(40, 70))
 
-        # 获取页面内容
-        html = driver.page_source
+class DriverPool:
+    """可复用的浏览器池：用完归还，崩溃的浏览器换新的"""
 
-        # 使用 pandas 读取 HTML 中的表格
+    def __init__(self, service, size=POOL_SIZE):
+        self.service = service
+        self.drivers = queue.Queue()
+        for _ in range(size):
+            self.drivers.put(make_driver(service))
+
+    def run(self, func, *args):
+        with metrics.timer('driver_wait_seconds'):
+            driver = self.drivers.get()
         try:
-            tables = pd.read_html(html)
-            if tables:  # 检查是否有表格
-                df = tables[0]
-
-                # 对调第一列和第二列，包括标题
-                if df.shape[1] >= 2:  # 确保有至少两列
-                    # 交换列标题
-                    df.columns = [df.columns[1], df.columns[0]] + list(df.columns[2:])
-                    # 交换数据
-                    df.iloc[:, [0, 1]] = df.iloc[:, [1, 0]].values
-
-                # 将数据写入 Excel，表名为 appID
-                df.to_excel(writer, sheet_name=str(app_id), index=False)
-                print(f"数据已保存到 {output_file} 的工作表 {app_id}")
-            else:
-                print(f"No tables found for appID: {app_id}")
+            with metrics.timer('scrape_page_seconds'):
+                return func(driver, *args)
+        except TimeoutException:
+            # 页面超时不代表浏览器坏了，照常归还
+            metrics.inc('scrape_timeouts')
+            raise
+        except WebDriverException:
+            # 浏览器本身出问题（崩溃、会话失效），换一个新的再归还
+            metrics.inc('scrape_driver_restarts')
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+            driver = make_driver(self.service)
+            raise
+        finally:
+            self.drivers.put(driver)
+
+    def close(self):
+        while not self.drivers.empty():
+            self.drivers.get().quit()
+
+
+class table_settled:
+    """等待条件：页面里已有带数据行的表格，且行数 SETTLE_SECONDS 秒内不再变化"""
+
+    def __init__(self, settle=SETTLE_SECONDS):
+        self.settle = settle
+        self.count = 0
+        self.since = None
+
+    def __call__(self, driver):
+        count = len(driver.find_elements(By.CSS_SELECTOR, 'table tr td'))
+        now = time.monotonic()
+        if count != self.count or count == 0:
+            self.count, self.since = count, now
+            return False
+        return now - self.since >= self.settle
+
+
+class NoTableError(ValueError):
+    """响应里没有表格（多半是请求到了需要 JavaScript 渲染的页面）"""
+
+
+class FirstTableParser(HTMLParser):
+    """只收集第一个 <table> 的行（标准库解析，不依赖 lxml）：rows 为 [(是否全是 th, [单元格文本])]"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.depth = 0
+        self.done = False
+        self.rows = []
+        self.row = None
+        self.cell = None
+        self.header = False
+
+    def close_cell(self):
+        if self.cell is not None:
+            self.row.append(' '.join(''.join(self.cell).split()))
+            self.cell = None
+
+    def close_row(self):
+        self.close_cell()
+        if self.row:
+            self.rows.append((self.header, self.row))
+        self.row = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'table':
+            self.depth += 1
+        elif self.depth == 1 and tag == 'tr':
+            self.close_row()
+            self.row, self.header = [], True
+        elif self.depth == 1 and tag in ('td', 'th') and self.row is not None:
+            self.close_cell()
+            self.cell = []
+            self.header = self.header and tag == 'th'
+
+    def handle_endtag(self, tag):
+        if self.done or not self.depth:
+            return
+        if tag == 'table':
+            self.depth -= 1
+            if not self.depth:
+                self.close_row()
+                self.done = True
+        elif self.depth == 1 and tag in ('td', 'th') and self.row is not None:
+            self.close_cell()
+        elif self.depth == 1 and tag == 'tr':
+            self.close_row()
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+
+def read_first_table(html):
+    """页面第一个表格 -> DataFrame；开头全是 th 的行作表头（否则列名为 0, 1, ...），能转成数字的列转成数字"""
+    parser = FirstTableParser()
+    parser.feed(html)
+    parser.close()
+    if not parser.rows:
+        return None
+    headers = [cells for is_header, cells in parser.rows if is_header]
+    body = [cells for is_header, cells in parser.rows if not is_header]
+    width = max(len(cells) for _, cells in parser.rows)
+    columns = headers[-1] + [len(headers[-1]) + i for i in range(width - len(headers[-1]))] if headers \
+        else list(range(width))
+    df = pd.DataFrame([cells + [None] * (width - len(cells)) for cells in body], columns=columns)
+    for column in df.columns:
+        numeric = pd.to_numeric(df[column], errors='coerce')
+        if numeric.notna().equals(df[column].notna()):
+            df[column] = numeric
+    return df
+
+
+def parse_scores(html):
+    """读取页面第一个表格，对调第一列和第二列（包括标题）；没有表格时返回 None"""
+    df = read_first_table(html)
+    if df is None:  # 页面里没有表格
+        return None
+
+    # 对调第一列和第二列，包括标题
+    if df.shape[1] >= 2:  # 确保有至少两列
+        # 标题和数据一起对调，等于调换前两列的位置（两列类型不同时不能原地赋值）
+        df = df.iloc[:, [1, 0] + list(range(2, df.shape[1]))]
+    return df
+
+
+def scrape_app(driver, app_id, timeout=PAGE_TIMEOUT):
+    """打开页面并等到表格加载完成，返回对调后的表格"""
+    driver.get(SCOUT_URL.format(app_id=app_id))
+    WebDriverWait(driver, timeout, poll_frequency=0.5).until(table_settled())
+    html = driver.page_source
+    if RECORD_DIR:
+        os.makedirs(RECORD_DIR, exist_ok=True)
+        with open(os.path.join(RECORD_DIR, f"{app_id}.html"), 'w', encoding='utf-8') as f:
+            f.write(html)
+    return parse_scores(html)
+
+
+def scrape_all(app_ids, service, pool_size=POOL_SIZE):
+    """用浏览器池并行抓取；单个游戏失败不影响其他游戏，失败的结果为 None"""
+    pool = DriverPool(service, size=min(pool_size, len(app_ids)))
+
+    def task(app_id):
+        try:
+            return pool.run(scrape_app, app_id)
+        except TimeoutException:
+            print(f"Timed out waiting for tables for appID: {app_id}")
         except Exception as e:
             print(f"Error reading tables for appID {app_id}: {e}")
+        return None
+
+    try:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            return dict(zip(app_ids, executor.map(metrics.profiled(task), app_ids)))
+    finally:
+        pool.close()
+
+
+def fetch_scores_http(app_id, limiter=None, url=SCOUT_DATA_URL):
+    """不经过浏览器，直接请求数据源并解析第一个表格；响应里没有表格时抛出 NoTableError"""
+    response = get_with_retry(url.format(app_id=app_id), limiter=limiter)
+    # FirstTableParser 读完第一个表格就停止，不需要先截取
+    df = parse_scores(response.text)
+    if df is None:
+        raise NoTableError(f"no <table> in response from {response.url}")
+    return df
 
-        # 关闭浏览器
-        driver.quit()
 
-print(f"所有数据已保存到 {output_file}")
\ No newline at end of file
+def fetch_all_http(app_ids, workers=HTTP_WORKERS, requests_per_second=HTTP_REQUESTS_PER_SECOND,
+                   url=None):
+    """http 后端：复用连接并发请求，单个游戏失败不影响其他游戏
+
+    先单独请求第一个游戏：数据源地址未配置、或返回的不是含表格的数据（例如 JavaScript 渲染的空壳页面）时
+    直接报错，而不是让每个游戏都静默地得到 None。
+    """
+    url = url or SCOUT_DATA_URL
+    if not url:
+        raise RuntimeError("BACKEND='http' requires SCOUT_DATA_URL: the data request the SteamScout page "
+                           "makes (the page itself is rendered by JavaScript); use BACKEND='selenium' otherwise")
+    if not app_ids:
+        return {}
+    limiter = RateLimiter(requests_per_second)
+
+    def task(app_id):
+        try:
+            return fetch_scores_http(app_id, limiter, url)
+        except Exception as e:
+            print(f"Error reading tables for appID {app_id}: {e}")
+            return None
+
+    try:
+        first = fetch_scores_http(app_ids[0], limiter, url)
+    except NoTableError as e:
+        raise RuntimeError(f"SCOUT_DATA_URL={url!r} did not return a scores table: {e}") from e
+    except Exception as e:
+        print(f"Error reading tables for appID {app_ids[0]}: {e}")
+        first = None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(app_ids, [first] + list(executor.map(metrics.profiled(task), app_ids[1:]))))
+
+
+if __name__ == "__main__":
+    with metrics.stage('regional_scores'):
+        if BACKEND == 'http':
+            results = fetch_all_http(app_ids)
+        else:
+            # 设置 ChromeDriver 的路径
+            service = Service(ChromeDriverManager().install())
+            results = scrape_all(app_ids, service)
+
+    with metrics.timer('excel_io_seconds', op='write', file=output_file), \
+            pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        for app_id in app_ids:
+            df = results[app_id]
+            if df is None:
+                print(f"No tables found for appID: {app_id}")
+                continue
+            # 将数据写入 Excel，表名为 appID
+            df.to_excel(writer, sheet_name=str(app_id), index=False)
+            print(f"数据已保存到 {output_file} 的工作表 {app_id}")
+
+    print(f"所有数据已保存到 {output_file}")
+    metrics.export('regional_scores')
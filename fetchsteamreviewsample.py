@@ -1,9 +1,15 @@
-import steamreviews
+import heapq
 import pandas as pd
-import time
-import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
-import re
+
+import metrics
+from httpclient import RateLimiter, get_with_retry
+from reviewcache import REVIEW_COLUMNS, ReviewCache
+from reviewdedup import clean_illegal_chars
+
+# Steam 评论接口
+STEAM_REVIEWS_URL = 'https://store.steampowered.com/appreviews/{app_id}'
 
 # 配置请求参数
 BASE_PARAMS = {
@@ -16,6 +22,36 @@ BASE_PARAMS = {
     }
 }
 
+# 并发抓取配置：同时下载的游戏数、全局每秒请求数（Steam 约 150 次 / 5 分钟）
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 0.5
+RATE_BURST = 2
+MAX_RETRIES = 5
+
+# 前 K 选择：默认翻完全部页面，结果是精确的前 K（按点赞数）
+# STALE_PAGES 设为整数时，前 K 已满且连续这么多页没有评论能进入前 K 就停止翻页；
+# toprated 排序并不保证按点赞数递减，所以这时结果只是近似的前 K。MAX_PAGES 为安全上限
+TOP_K = 50
+STALE_PAGES = None
+MAX_PAGES = None
+
+# 分语言分层抓取：{语言: 配额}，每种语言在服务端单独翻页；None 表示 language='all' 取全局前 TOP_K
+LANGUAGE_QUOTAS = None  # 例如 {'english': 50, 'schinese': 50}
+STRATIFIED_STALE_PAGES = None  # 同 STALE_PAGES；0 表示配额一填满就停止该语言的翻页（近似）
+
+# 本地缓存：已抓取且未过期的游戏在重跑时跳过
+CACHE_TTL_DAYS = 7
+OUTPUT_FILE = 'steam_reviews_top50.xlsx'
+
+# 下游读取的 Parquet 数据集；Excel 只在 EXPORT_XLSX 时导出
+REVIEWS_DATASET = 'data/reviews'
+EXPORT_XLSX = False
+
+# 'full'：重新抓取过期的游戏；'delta'：缓存未过期时只抓上次水位之后的新评论并合并进已存的前 K，
+# 过期（CACHE_TTL_DAYS）后仍做一次全量抓取，刷新旧评论的点赞数
+SYNC_MODE = 'full'
+DELTA_PARAMS = dict(BASE_PARAMS, filter='recent')
+
 # 游戏ID列表
 APP_IDS = [
     1623730, 1517290, 1551360, 1987080, 2050650, 1919590, 1196590, 1451940,
@@ -24,62 +60,284 @@ APP_IDS = [
     1034140, 990630, 1475810, 1465460, 2163330, 1954200, 1601580, 2114740,
     1875830, 1335790, 1509510, 2144740, 973810, 1497440, 1328840
 ]
-def clean_illegal_chars(s):
-    if isinstance(s, str):
-        return re.sub(r'[\x00-\x08\x0b-\x0c\x0e-\x1f]', '', s)
-    return s
+def rows_to_frame(rows):
+    """由输出行构造 DataFrame，整列一次去掉 Excel 不接受的控制字符"""
+    df = pd.DataFrame(rows, columns=REVIEW_COLUMNS)
+    df['content'] = clean_illegal_chars(df['content'].astype(str))
+    return df
+
+
+def build_request(params, cursor):
+    """把 BASE_PARAMS 转成 appreviews 接口的查询参数（与 steamreviews 的默认值一致）"""
+    request = {
+        'json': '1',
+        'language': 'all',
+        'filter': 'updated',
+        'review_type': 'all',
+        'purchase_type': 'all',
+        'num_per_page': '100',
+    }
+    for key, value in params.items():
+        if not isinstance(value, dict):  # json_query 不是接口参数
+            request[key] = value
+    request['cursor'] = cursor
+    return request
+
+
+def fetch_page(app_id, cursor='*', params=BASE_PARAMS, limiter=None):
+    """请求一页评论，返回接口的 JSON"""
+    response = get_with_retry(
+        STEAM_REVIEWS_URL.format(app_id=app_id),
+        params=build_request(params, cursor),
+        limiter=limiter,
+        max_retries=MAX_RETRIES
+    )
+    data = response.json()
+    if data.get('success') != 1:
+        raise RuntimeError(f"Steam returned success={data.get('success')}")
+    return data
+
+
+def iter_review_pages(app_id, params=BASE_PARAMS, limiter=None, max_pages=None):
+    """按游标逐页产出 (评论列表, 下一页游标)，不在内存里累积整份评论"""
+    cursor = '*'
+    pages = 0
+    while True:
+        data = fetch_page(app_id, cursor, params=params, limiter=limiter)
+        page = data.get('reviews', [])
+        if not page:
+            return
+        next_cursor = data.get('cursor')
+        yield page, next_cursor
+        pages += 1
+        if not next_cursor or next_cursor == cursor or (max_pages and pages >= max_pages):
+            return
+        cursor = next_cursor
+
+
+class TopK:
+    """基于小根堆的前 K 选择器，内存 O(K)；同分时保留先出现的条目"""
+
+    def __init__(self, k):
+        self.k = k
+        self.heap = []
+        self.ids = set()
+        self.seq = 0
+
+    def is_full(self):
+        return len(self.heap) >= self.k
+
+    def accepts(self, score):
+        return not self.is_full() or score > self.heap[0][0]
+
+    def push(self, score, item_id, make_item):
+        """score 能进入前 K 时才调用 make_item() 构造条目；返回是否入堆"""
+        if item_id in self.ids or not self.accepts(score):
+            return False
+        entry = (score, -self.seq, item_id, make_item())
+        self.seq += 1
+        if self.is_full():
+            _, _, evicted_id, _ = heapq.heapreplace(self.heap, entry)
+            self.ids.discard(evicted_id)
+        else:
+            heapq.heappush(self.heap, entry)
+        self.ids.add(item_id)
+        return True
+
+    def items(self):
+        """按分数降序返回条目"""
+        return [entry[3] for entry in sorted(self.heap, key=lambda e: (-e[0], -e[1]))]
+
+
+def review_to_row(review_id, data):
+    """把接口返回的单条评论转成输出行"""
+    return {
+        'review_id': review_id,
+        'language': data.get('language', 'unknown'),
+        'is_recommended': data.get('voted_up'),
+        'votes_up': data.get('votes_up', 0),
+        'votes_funny': data.get('votes_funny', 0),
+        'weighted_score': data.get('weighted_vote_score', 0),
+        'playtime_at_review': f"{data.get('author', {}).get('playtime_at_review', 0) / 60:.1f}h",
+        'content': data.get('review', '')[:2000],
+        'created_at': pd.to_datetime(data.get('timestamp_created', 0), unit='s'),
+        'steam_purchase': data.get('steam_purchase', False)
+    }
+
+
+def fetch_reviews(app_id, limiter=None, top_k=TOP_K, stale_pages=STALE_PAGES, max_pages=MAX_PAGES,
+                  params=BASE_PARAMS):
+    """获取单个游戏的前50条点赞最多的评论
+
+    stale_pages 为 None 时翻完所有页，结果是精确的前 K；为整数时前 K 名已满且连续
+    stale_pages 页都没有评论能挤进前 K 就停止翻页。toprated 只是大致按点赞数排序，
+    提前停止可能漏掉后面页里点赞更多的评论，所以这是以请求数换精度的近似。
+    """
+    try:
+        selector = TopK(top_k)
+        stale = 0
+        for page, _ in iter_review_pages(app_id, params=params, limiter=limiter, max_pages=max_pages):
+            added = 0
+            for data in page:
+                added += selector.push(data.get('votes_up', 0), data['recommendationid'],
+                                       lambda data=data: review_to_row(data['recommendationid'], data))
+
+            stale = stale + 1 if selector.is_full() and not added else 0
+            if stale_pages is not None and selector.is_full() and stale >= stale_pages:
+                break
+
+        return rows_to_frame(selector.items())
+
+    except Exception as e:
+        print(f"\n[Error] AppID {app_id}: {str(e)}")
+        return None
+
+
+def fetch_reviews_stratified(app_id, limiter=None, quotas=None, stale_pages=STRATIFIED_STALE_PAGES):
+    """按语言分层抓取：各语言并行在服务端翻页，各自填满配额即停止"""
+    quotas = quotas or LANGUAGE_QUOTAS
+    with ThreadPoolExecutor(max_workers=len(quotas)) as pool:
+        futures = [
+            pool.submit(metrics.profiled(fetch_reviews), app_id, limiter, quota, stale_pages, MAX_PAGES,
+                        dict(BASE_PARAMS, language=language))
+            for language, quota in quotas.items()
+        ]
+        frames = [future.result() for future in futures]
+
+    # 任一语言失败则整个游戏算失败，下次重跑
+    if any(df is None for df in frames):
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+def fetch_game(app_id, limiter=None):
+    """按当前配置抓取单个游戏：分语言配额或全局前 K"""
+    if LANGUAGE_QUOTAS:
+        return fetch_reviews_stratified(app_id, limiter)
+    return fetch_reviews(app_id, limiter)
+
+
+def new_selectors():
+    """每种语言一个前 K 选择器；未分层时全部评论共用一个（键为 None）"""
+    if LANGUAGE_QUOTAS:
+        return {language: TopK(quota) for language, quota in LANGUAGE_QUOTAS.items()}
+    return {None: TopK(TOP_K)}
+
+
+def route(selectors, language):
+    """评论所属的选择器；不在配额里的语言返回 None"""
+    return selectors.get(language if LANGUAGE_QUOTAS else None)
+
+
+def fetch_watermark(app_id, limiter=None):
+    """最新一条评论的 timestamp_created，作为增量同步的起点"""
+    data = fetch_page(app_id, params=dict(DELTA_PARAMS, num_per_page=1), limiter=limiter)
+    return max((review.get('timestamp_created', 0) for review in data.get('reviews', [])), default=0)
 
-def fetch_reviews(app_id):
-    """获取单个游戏的前50条点赞最多的评论"""
-    time.sleep(random.uniform(3, 5))  # 小心别被封IP
 
+def fetch_new_reviews(app_id, since, limiter=None):
+    """按 recent（发布时间倒序）从最新一页开始翻页，直到遇到不晚于 since 的评论
+
+    返回 (新评论列表, 最新时间戳)，请求数只与新增评论量有关。
+    """
+    new_reviews = []
+    newest = since
+    for page, _ in iter_review_pages(app_id, params=DELTA_PARAMS, limiter=limiter):
+        fresh = [review for review in page if review.get('timestamp_created', 0) > since]
+        new_reviews.extend(fresh)
+        newest = max([newest] + [review['timestamp_created'] for review in fresh])
+        if len(fresh) < len(page):
+            break
+    return new_reviews, newest
+
+
+def sync_reviews(app_id, cache, limiter=None):
+    """增量同步单个游戏：没有水位或缓存已过期时全量抓取并记录水位，否则只合并新评论"""
+    params = cache_params()
     try:
-        review_dict, _ = steamreviews.download_reviews_for_app_id(
-            app_id=str(app_id),
-            chosen_request_params=BASE_PARAMS
-        )
-
-        reviews = []
-        for review_id, data in review_dict.get('reviews', {}).items():
-            reviews.append({
-                'review_id': review_id,
-                'language': data.get('language', 'unknown'),
-                'is_recommended': data.get('voted_up'),
-                'votes_up': data.get('votes_up', 0),
-                'votes_funny': data.get('votes_funny', 0),
-                'weighted_score': data.get('weighted_vote_score', 0),
-                'playtime_at_review': f"{data.get('author', {}).get('playtime_at_review', 0) / 60:.1f}h",
-                'content': clean_illegal_chars(data.get('review', '')[:2000]),
-                'created_at': pd.to_datetime(data.get('timestamp_created', 0), unit='s'),
-                'steam_purchase': data.get('steam_purchase', False)
-            })
-
-        # ✅ 核心改动：按 votes_up 降序排序，取前50条
-        reviews_sorted = sorted(reviews, key=lambda x: x['votes_up'], reverse=True)
-        top_reviews = reviews_sorted[:50]
-
-        return pd.DataFrame(top_reviews)
+        since = cache.sync_state(app_id, params)
+        if since is None or not cache.is_fresh(app_id, params):
+            # 先取水位再全量抓取，抓取期间新发的评论留给下一次增量
+            last_timestamp = fetch_watermark(app_id, limiter)
+            df = fetch_game(app_id, limiter)
+            if df is not None:
+                cache.save(app_id, params, df, last_timestamp)
+            return df
+
+        new_reviews, newest = fetch_new_reviews(app_id, since, limiter)
+
+        # 已存的前 K 与新评论一起重新选前 K，无需重新下载旧评论
+        selectors = new_selectors()
+        for row in cache.load(app_id, params).to_dict('records'):
+            selector = route(selectors, row['language'])
+            if selector is not None:
+                selector.push(row['votes_up'], row['review_id'], lambda row=row: row)
+        for data in new_reviews:
+            selector = route(selectors, data.get('language', 'unknown'))
+            if selector is not None:
+                selector.push(data.get('votes_up', 0), data['recommendationid'],
+                              lambda data=data: review_to_row(data['recommendationid'], data))
+
+        rows = [row for selector in selectors.values() for row in selector.items()]
+        df = rows_to_frame(rows)
+        cache.save(app_id, params, df, newest, refresh=False)
+        return df
 
     except Exception as e:
         print(f"\n[Error] AppID {app_id}: {str(e)}")
         return None
 
-# 写入Excel
-with pd.ExcelWriter('steam_reviews_top50.xlsx', engine='openpyxl') as writer:
-    success_count = 0
-    for app_id in tqdm(APP_IDS, desc="Downloading Top Reviews"):
-        df = fetch_reviews(app_id)
+
+def fetch_all(app_ids, max_workers=MAX_WORKERS, requests_per_second=REQUESTS_PER_SECOND, on_result=None,
+              fetch=fetch_reviews):
+    """并发抓取多个游戏；所有线程共享一个令牌桶，保证总请求速率不超限
+
+    fetch(app_id, limiter) 为单个游戏的抓取函数；on_result(app_id, df) 在主线程中
+    按完成顺序回调，可用于逐个落盘。
+    """
+    limiter = RateLimiter(requests_per_second, burst=RATE_BURST)
+    results = {}
+    fetch = metrics.profiled(fetch)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(fetch, app_id, limiter): app_id for app_id in app_ids}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Downloading Top Reviews"):
+            app_id = futures[future]
+            results[app_id] = future.result()
+            if on_result is not None:
+                on_result(app_id, results[app_id])
+    return results
+
+
+def cache_params():
+    """缓存键：请求参数加上 K 或各语言配额"""
+    if LANGUAGE_QUOTAS:
+        return dict(BASE_PARAMS, language_quotas=LANGUAGE_QUOTAS)
+    return dict(BASE_PARAMS, top_k=TOP_K)
+
+
+def save_to_cache(cache):
+    """返回把每个成功的游戏立即写入缓存的回调"""
+    def on_result(app_id, df):
         if df is not None:
-            df.to_excel(writer, sheet_name=str(app_id), index=False)
-            success_count += 1
-        time.sleep(random.uniform(1, 2))
-
-    # 摘要Sheet
-    summary_df = pd.DataFrame({
-        'app_id': APP_IDS,
-        'status': ['Success' if str(app_id) in writer.sheets else 'Failed' for app_id in APP_IDS],
-        'reviews_saved': [50 if str(app_id) in writer.sheets else 0 for app_id in APP_IDS]
-    })
-    summary_df.to_excel(writer, sheet_name='0_Summary', index=False)
-
-print(f"\n完成！成功抓取 {success_count} 个游戏Top 50评论，已保存为 steam_reviews_top50.xlsx")
+            cache.save(app_id, cache_params(), df)
+    return on_result
+
+
+if __name__ == "__main__":
+    cache = ReviewCache(ttl=CACHE_TTL_DAYS * 86400)
+    with metrics.stage('fetch_reviews'):
+        if SYNC_MODE == 'delta':
+            fetch_all(APP_IDS, fetch=lambda app_id, limiter: sync_reviews(app_id, cache, limiter))
+        else:
+            todo = cache.pending(APP_IDS, cache_params())
+            print(f"{len(APP_IDS) - len(todo)} 个游戏命中缓存，{len(todo)} 个需要抓取")
+            fetch_all(todo, on_result=save_to_cache(cache), fetch=fetch_game)
+
+    # 从缓存一次性生成数据集（以及可选的 Excel）
+    success_count = cache.export_dataset(APP_IDS, cache_params(), REVIEWS_DATASET)
+    print(f"\n完成！成功抓取 {success_count} 个游戏Top 50评论，已保存到 {REVIEWS_DATASET}")
+    if EXPORT_XLSX:
+        cache.export_excel(APP_IDS, cache_params(), OUTPUT_FILE)
+        print(f"已导出 {OUTPUT_FILE}")
+    cache.close()
+    metrics.export('fetch_reviews')
@@ -1,14 +1,11 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 
-# 读取Excel文件
-file_path = 'games_studied.xlsx'
-df = pd.read_excel(file_path, sheet_name='All')
+import sheetcache
 
-# 转换为数值类型
-df['price'] = pd.to_numeric(df['price'], errors='coerce')
-df['reviewScore'] = pd.to_numeric(df['reviewScore'], errors='coerce')
-df['ScoreGap'] = pd.to_numeric(df['ScoreGap'], errors='coerce')
+# 读取Excel文件（转换为数值类型后缓存成快照）
+file_path = 'games_studied.xlsx'
+df = sheetcache.load_sheet(file_path, 'All', numeric=['price', 'reviewScore', 'ScoreGap'])
 
 # 定义价格区间
 bins_price = [0, 10, 20, 30, 40, 50, 60, 70]
@@ -1,10 +1,11 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
+import sheetcache
+
 # 读取 Excel 文件
 file_path = 'games_studied.xlsx'  # 替换为您的文件路径
-df = pd.read_excel(file_path, sheet_name='All')
+df = sheetcache.load_sheet(file_path, 'All')
 
 # 筛选 EA? 列为 1 和 0 的数据
 df_ea_0 = df[df['EA?'] == 0]
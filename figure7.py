@@ -7,19 +7,15 @@ from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 import numpy as np
 
+import sheetcache
+
 # 设置字体以支持中文
 matplotlib.rcParams['font.family'] = 'SimHei'  # 使用黑体
 matplotlib.rcParams['axes.unicode_minus'] = False  # 处理负号显示问题
 
-# 读取 Excel 文件
+# 读取 Excel 文件，相关列转换为数值型（结果缓存成快照）
 file_path = 'games_studied.xlsx'
-df = pd.read_excel(file_path, sheet_name='All')
-
-# 将相关列转换为数值型
-df['ScoreGap'] = pd.to_numeric(df['ScoreGap'], errors='coerce')
-df['price'] = pd.to_numeric(df['price'], errors='coerce')
-df['reviewScore'] = pd.to_numeric(df['reviewScore'], errors='coerce')
-df['medianPlaytime'] = pd.to_numeric(df['medianPlaytime'], errors='coerce')
+df = sheetcache.load_sheet(file_path, 'All', numeric=['ScoreGap', 'price', 'reviewScore', 'medianPlaytime'])
 
 # 过滤掉包含 NaN 的行
 df = df.dropna(subset=['ScoreGap', 'price', 'reviewScore', 'medianPlaytime'])
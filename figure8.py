@@ -1,31 +1,72 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy.stats import chi2_contingency, fisher_exact
+from scipy.stats import chi2_contingency
 from statsmodels.stats.multitest import multipletests
 
+import datasetstore
+import metrics
+import resampling
+import sheetcache
+from regionalstats import fisher_exact_2x2, significance_stars
+
+# 大于 0 时在卡方 / Fisher 检验之外追加置换检验 p 值（打乱语言标签 RESAMPLES 次）
+RESAMPLES = resampling.N_RESAMPLES
+
 
 def load_data(file_path):
-    xls = pd.ExcelFile(file_path)
-    sheets = [sheet for sheet in xls.sheet_names if sheet != 'Sheet1']
-    dfs = [pd.read_excel(xls, sheet_name=sheet)[['is_recommended', 'language', 'dominant_emotion']]
-           for sheet in sheets]
-    return pd.concat(dfs, ignore_index=True)
+    columns = ['is_recommended', 'language', 'dominant_emotion']
+    if not file_path.endswith('.xlsx'):
+        # Parquet 数据集：只读取需要的三列
+        return datasetstore.read_frame(file_path, datasetstore.EMOTION_SCHEMA, columns=columns)
+
+    # 一游戏一工作表的 Excel：多进程流式读取，只取需要的三列，结果缓存成快照
+    return sheetcache.load_workbook(file_path, columns)
+
+
+SENTIMENTS = ['positive', 'negative']
+EMOTIONS = ['Anger', 'Disgust', 'Anticipation', 'Fear', 'Joy', 'Sadness', 'Trust', 'Surprise']
+# 详细对比表与柱状图使用的语言对；全部语言两两对比另写一个工作表
+LANGUAGE_PAIR = ('english', 'schinese')
+
+
+def count_cube(df):
+    """一次 bincount 得到 语言 × 推荐 × 主导情感 的计数立方体
 
+    返回 DataFrame：行为 (language, is_recommended) 的 MultiIndex，列为情感；
+    推荐值不是 positive/negative 或语言、情感缺失的行不计入。
+    """
+    language = pd.Categorical(df['language'])
+    # 其他推荐值（如打分失败的 error）先置为缺失，再按固定类别编码
+    recommended = df['is_recommended']
+    sentiment = pd.Categorical(recommended.where(recommended.isin(SENTIMENTS)), categories=SENTIMENTS)
+    emotion = pd.Categorical(df['dominant_emotion'])
+    valid = (language.codes >= 0) & (sentiment.codes >= 0) & (emotion.codes >= 0)
+    n_languages, n_emotions = len(language.categories), len(emotion.categories)
+    codes = ((language.codes[valid].astype(np.int64) * len(SENTIMENTS) + sentiment.codes[valid])
+             * n_emotions + emotion.codes[valid])
+    counts = np.bincount(codes, minlength=n_languages * len(SENTIMENTS) * n_emotions)
+    index = pd.MultiIndex.from_product([language.categories, SENTIMENTS], names=['language', 'is_recommended'])
+    return pd.DataFrame(counts.reshape(-1, n_emotions), index=index, columns=emotion.categories)
 
-def process_data(df):
-    valid_df = df[df['is_recommended'].isin(['positive', 'negative'])]
-    emotions = ['Anger', 'Disgust', 'Anticipation', 'Fear', 'Joy', 'Sadness', 'Trust', 'Surprise']
 
-    def process_subset(subset):
-        return pd.crosstab(
-            index=subset['language'],
-            columns=subset['dominant_emotion'],
-            normalize='index'
-        ).reindex(columns=emotions, fill_value=0).reindex(['english', 'schinese'], fill_value=0) * 100
+def contingency_table(cube, sentiment):
+    """某一推荐类型的 语言 × 情感 列联表，去掉全为 0 的行和列（与 crosstab 的结果一致）"""
+    table = cube.xs(sentiment, level='is_recommended')
+    return table.loc[table.sum(axis=1) > 0, table.sum(axis=0) > 0]
 
-    return (process_subset(valid_df[valid_df['is_recommended'] == 'positive']).T,
-            process_subset(valid_df[valid_df['is_recommended'] == 'negative']).T)
+
+def rates(table):
+    """列联表按行归一化的百分比"""
+    return table.div(table.sum(axis=1), axis=0) * 100
+
+
+def process_data(cube):
+    def process_subset(sentiment):
+        return rates(contingency_table(cube, sentiment)).reindex(
+            columns=EMOTIONS, fill_value=0).reindex(list(LANGUAGE_PAIR), fill_value=0)
+
+    return process_subset('positive').T, process_subset('negative').T
 
 
 # 新增：三级星号标注函数
@@ -41,8 +82,121 @@ def get_significance_stars(p):
         return ''
 
 
-def export_to_excel(valid_df, output_path="analysis_results.xlsx"):
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+def fisher_pvalues(table, first, second):
+    """语言 first[i] 与 second[i] 在每种情感上的 2×2 Fisher 精确检验（是/否该情感），返回 (对数, 情感)"""
+    counts = table.to_numpy()
+    totals = counts.sum(axis=1, keepdims=True)
+    hits = np.stack([counts[first], counts[second]], axis=-1)
+    misses = np.stack([totals[first], totals[second]], axis=-1) - hits
+    return fisher_exact_2x2(np.stack([hits, misses], axis=-1))
+
+
+def permuted_tables(counts, n_resamples):
+    """打乱语言标签下的列联表 (n_resamples, 语言, 情感)
+
+    置换分布只取决于列联表本身，所以直接从计数还原出每条评论的 (语言, 情感) 编码。
+    """
+    cells = np.arange(counts.size)
+    groups = np.repeat(cells // counts.shape[1], counts.ravel())
+    categories = np.repeat(cells % counts.shape[1], counts.ravel())
+    return resampling.permutation_tables(groups, categories, n_resamples)
+
+
+def permutation_tests(table, n_resamples, pair=LANGUAGE_PAIR):
+    """打乱语言标签：返回 (整体卡方的置换 p 值, 各情感 两种语言比例之差的置换 p 值)
+
+    整体检验在全部语言间置换；比例之差只在 pair 两种语言的评论之间置换，与两两 Fisher 检验可比。
+    """
+    counts = table.to_numpy()
+    tables = permuted_tables(counts, n_resamples)
+    p_overall = resampling.permutation_pvalue(resampling.chi2_statistic(counts), resampling.chi2_statistic(tables))
+
+    if not all(language in table.index for language in pair):
+        return p_overall, np.full(counts.shape[1], np.nan)
+    pair_counts = table.loc[list(pair)].to_numpy()
+    totals = pair_counts.sum(axis=1)
+
+    def rate_gap(t):
+        return t[..., 0, :] / totals[0] - t[..., 1, :] / totals[1]
+
+    return p_overall, resampling.permutation_pvalue(rate_gap(pair_counts),
+                                                    rate_gap(permuted_tables(pair_counts, n_resamples)))
+
+
+def pairwise_comparisons(cube):
+    """所有语言两两之间、每种情感的 Fisher 检验；每种推荐类型内部做 Bonferroni 校正"""
+    frames = []
+    for sentiment in SENTIMENTS:
+        table = contingency_table(cube, sentiment)
+        percent = rates(table).to_numpy()
+        first, second = np.triu_indices(len(table), k=1)
+        p = fisher_pvalues(table, first, second)
+        n_emotions = len(table.columns)
+        frame = pd.DataFrame({
+            'Sentiment': sentiment,
+            'Language A': np.repeat(table.index[first], n_emotions),
+            'Language B': np.repeat(table.index[second], n_emotions),
+            'Emotion': np.tile(table.columns, len(first)),
+            'Rate A (%)': percent[first].ravel(),
+            'Rate B (%)': percent[second].ravel(),
+            'p-value (raw)': p.ravel(),
+        })
+        if len(frame):
+            frame['p-value (adjusted)'] = multipletests(frame['p-value (raw)'], method='bonferroni')[1]
+            frame['Significance'] = significance_stars(frame['p-value (adjusted)'])
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def sentiment_tables(cube, sentiment):
+    """一种推荐类型的整体检验表和两种语言的详细对比表"""
+    first, second = LANGUAGE_PAIR
+    # 整体检验
+    contingency_all = contingency_table(cube, sentiment)
+    chi2, p_overall, _, _ = chi2_contingency(contingency_all)
+    overall_df = pd.DataFrame({
+        'Test Type': ['Chi-square test'],
+        'Chi-square': [f"{chi2:.3f}"],
+        'p-value': [f"{p_overall:.5f}"],
+        'Significance': [get_significance_stars(p_overall)]
+    })
+    if RESAMPLES:
+        p_perm_overall, p_perm = permutation_tests(contingency_all, RESAMPLES)
+        overall_df['Permutation p-value'] = [f"{p_perm_overall:.5f}"]
+
+    # 详细对比：两种语言的比例和 Fisher 检验都来自同一张列联表
+    emotions = contingency_all.columns.tolist()
+    pair_table = contingency_all.reindex(list(LANGUAGE_PAIR), fill_value=0)
+    percent = rates(pair_table).fillna(0)
+    raw_pvals = fisher_pvalues(pair_table, [0], [1])[0]
+
+    # Bonferroni 校正
+    corrected_pvals = multipletests(raw_pvals, method='bonferroni')[1]
+
+    detail_data = [[
+        emotion,
+        f"{percent.at[first, emotion]:.1f}%",
+        f"{percent.at[second, emotion]:.1f}%",
+        f"{corrected_pvals[i]:.5f}",
+        get_significance_stars(corrected_pvals[i])
+    ] for i, emotion in enumerate(emotions)]
+
+    detail_df = pd.DataFrame(detail_data,
+                             columns=['Emotion', 'English Rate', 'Chinese Rate',
+                                      'Adjusted p-value', 'Significance'])
+    if RESAMPLES and not np.isnan(p_perm).all():
+        corrected_perm = multipletests(p_perm, method='bonferroni')[1]
+        detail_df['Adjusted permutation p-value'] = [f"{p:.5f}" for p in corrected_perm]
+    return overall_df, detail_df
+
+
+def export_to_excel(cube, output_path="analysis_results.xlsx"):
+    # 先算完所有统计量，计时只覆盖写文件
+    tables = {f"{sentiment.capitalize()} Reviews": sentiment_tables(cube, sentiment) for sentiment in SENTIMENTS}
+    pairwise = pairwise_comparisons(cube)
+
+    with metrics.timer('excel_io_seconds', op='write', file=output_path), \
+            pd.ExcelWriter(output_path, engine='openpyxl') as writer:
         # 创建说明工作表
         legend_df = pd.DataFrame({
             'Symbol': ['*', '**', '***'],
@@ -50,66 +204,20 @@ def export_to_excel(valid_df, output_path="analysis_results.xlsx"):
         })
         legend_df.to_excel(writer, sheet_name='Legend', index=False)
 
-        for sentiment in ['positive', 'negative']:
-            subset = valid_df[valid_df['is_recommended'] == sentiment]
-
-            # 整体检验
-            contingency_all = pd.crosstab(subset['language'], subset['dominant_emotion'])
-            chi2, p_overall, _, _ = chi2_contingency(contingency_all)
-            overall_df = pd.DataFrame({
-                'Test Type': ['Chi-square test'],
-                'Chi-square': [f"{chi2:.3f}"],
-                'p-value': [f"{p_overall:.5f}"],
-                'Significance': [get_significance_stars(p_overall)]
-            })
-
-            # 详细对比：先收集 p 值列表
-            detail_data = []
-            raw_pvals = []
-            emotions = contingency_all.columns.tolist()
-
-            for emotion in emotions:
-                contingency = pd.crosstab(
-                    subset['language'],
-                    subset['dominant_emotion'] == emotion
-                ).reindex(index=['english', 'schinese'], columns=[True, False], fill_value=0)
-
-                _, p = fisher_exact(contingency)
-                raw_pvals.append(p)
-
-            # Bonferroni 校正
-            corrected_pvals = multipletests(raw_pvals, method='bonferroni')[1]
-
-            # 再构造最终表格
-            for i, emotion in enumerate(emotions):
-                en_rate = subset[subset['language'] == 'english']['dominant_emotion'].value_counts(normalize=True).get(
-                    emotion, 0) * 100
-                cn_rate = subset[subset['language'] == 'schinese']['dominant_emotion'].value_counts(normalize=True).get(
-                    emotion, 0) * 100
-
-                detail_data.append([
-                    emotion,
-                    f"{en_rate:.1f}%",
-                    f"{cn_rate:.1f}%",
-                    f"{corrected_pvals[i]:.5f}",
-                    get_significance_stars(corrected_pvals[i])
-                ])
-
-            detail_df = pd.DataFrame(detail_data,
-                                     columns=['Emotion', 'English Rate', 'Chinese Rate',
-                                              'Adjusted p-value', 'Significance'])
-
+        for sheet_name, (overall_df, detail_df) in tables.items():
             # 写入
-            sheet_name = f"{sentiment.capitalize()} Reviews"
             overall_df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=0)
             detail_df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=5)
 
             # 调整列宽
             worksheet = writer.sheets[sheet_name]
-            for col in ['A', 'B', 'C', 'D', 'E']:
+            for col in ['A', 'B', 'C', 'D', 'E', 'F']:
                 worksheet.column_dimensions[col].width = 18
             worksheet['A1'] = f"{sheet_name} Statistical Analysis"
 
+        pairwise.to_excel(writer, sheet_name='Pairwise Comparisons', index=False, float_format='%.5f')
+        cube.to_excel(writer, sheet_name='Counts')
+
 
 def visualize(pos_data, neg_data):
     emotions = pos_data.index.tolist()
@@ -155,13 +263,14 @@ def visualize(pos_data, neg_data):
 
 
 if __name__ == "__main__":
-    df = load_data("emotion_scores.xlsx")
-    valid_df = df[df['is_recommended'].isin(['positive', 'negative'])]
+    source = datasetstore.EMOTIONS_DATASET
+    df = load_data(source if datasetstore.exists(source) else "emotion_scores.xlsx")
+    cube = count_cube(df)
 
     # 导出Excel结果
-    export_to_excel(valid_df, "emotion_analysis.xlsx")
+    export_to_excel(cube, "emotion_analysis.xlsx")
     print("分析结果已保存至 emotion_analysis.xlsx")
 
     # 可视化
-    pos_percent, neg_percent = process_data(df)
-    visualize(pos_percent, neg_percent)
\ No newline at end of file
+    pos_percent, neg_percent = process_data(cube)
+    visualize(pos_percent, neg_percent)
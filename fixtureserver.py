@@ -0,0 +1,287 @@
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 本地替身服务：离线运行、调试和压测各个抓取脚本时代替真实接口
+STEAMSPY_PAGE_SIZE = 1000
+
+# 合成评论用的词表（中英文各一部分），保证每条评论内容不同、去重压缩比接近真实数据
+REVIEW_WORDS = ['fun', 'great', 'boring', 'refund', 'masterpiece', 'bugs', 'optimization', 'story',
+                'graphics', 'price', 'worth', 'trash', 'update', 'devs', 'multiplayer', 'servers',
+                'hours', 'recommend', 'early', 'access', 'combat', 'music', 'grind', 'crash',
+                '好玩', '垃圾', '优化', '剧情', '画面', '推荐', '更新', '服务器', '退款', '期待']
+
+
+class FixtureServer:
+    """在后台线程运行的本地 HTTP 服务，按路径把请求分发给路由函数
+
+    路由函数接收 {参数名: 值} 字典（POST 时合并 JSON 请求体），返回
+    (状态码, Content-Type, 响应体[, 响应头])；响应体为迭代器时逐块发送（流式响应）。
+    以 '/' 结尾的路由按前缀匹配，路径剩余部分放在 query['_tail'] 中。
+    """
+
+    def __init__(self, routes, host='127.0.0.1', port=0):
+        self.routes = routes
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.dispatch({})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                self.dispatch(payload)
+
+            def dispatch(self, payload):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                route = server.routes.get(parsed.path)
+                if route is None:
+                    prefix = next((p for p in server.routes if p.endswith('/') and parsed.path.startswith(p)), None)
+                    if prefix is None:
+                        self.send_error(404)
+                        return
+                    route = server.routes[prefix]
+                    query['_tail'] = parsed.path[len(prefix):]
+                status, content_type, body, *headers = route({**query, **payload})
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                for name, value in (headers[0] if headers else {}).items():
+                    self.send_header(name, value)
+                if isinstance(body, (str, bytes)):
+                    body = body.encode('utf-8') if isinstance(body, str) else body
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                # 流式响应：不带 Content-Length，逐块写出，发送完关闭连接；客户端提前断开时停止
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                try:
+                    for chunk in body:
+                        self.wfile.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def json_response(data, status=200):
+    return status, 'application/json', json.dumps(data, ensure_ascii=False)
+
+
+def with_faults(routes, latency=0.0, error_rate=0.0, seed=0):
+    """给路由加上固定延迟和按比例随机返回的 503（带 Retry-After），模拟慢速或不稳定的服务"""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def wrap(route):
+        def faulty(query):
+            if latency:
+                time.sleep(latency)
+            with lock:
+                failed = rng.random() < error_rate
+            if failed:
+                return 503, 'application/json', json.dumps({'error': 'service unavailable'}), {'Retry-After': '1'}
+            return route(query)
+        return faulty
+
+    return {path: wrap(route) for path, route in routes.items()}
+
+
+def synthetic_review_text(rng, min_words=8, max_words=40):
+    return ' '.join(rng.choice(REVIEW_WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+
+def synthetic_steam_reviews(app_id, num_reviews=500, seed=0):
+    """生成确定性的 appreviews 评论列表，按点赞数降序（与 toprated 排序一致）"""
+    rng = random.Random(f"{seed}-{app_id}")
+    languages = ['english', 'schinese', 'russian', 'brazilian', 'german', 'french', 'spanish', 'japanese']
+    votes = sorted((int(rng.paretovariate(1.2)) - 1 for _ in range(num_reviews)), reverse=True)
+    return [{
+        'recommendationid': f"{app_id}{i:06d}",
+        'author': {'steamid': str(76561190000000000 + rng.randint(0, 10 ** 9)),
+                   'playtime_at_review': rng.randint(0, 60000)},
+        'language': rng.choice(languages),
+        'review': synthetic_review_text(rng),
+        'timestamp_created': 1600000000 + rng.randint(0, 10 ** 8),
+        'voted_up': rng.random() < 0.75,
+        'votes_up': votes[i],
+        'votes_funny': rng.randint(0, 5),
+        'weighted_vote_score': f"{rng.random():.6f}",
+        'steam_purchase': rng.random() < 0.9,
+    } for i in range(num_reviews)]
+
+
+def steam_reviews_routes(num_reviews=500, seed=0):
+    """Steam appreviews 替身：/appreviews/<app_id>，游标即下一页的偏移量"""
+    reviews = {}
+    lock = threading.Lock()
+
+    def app_reviews(query):
+        app_id = query.get('_tail', '')
+        with lock:
+            if app_id not in reviews:
+                reviews[app_id] = synthetic_steam_reviews(app_id, num_reviews, seed)
+            all_reviews = reviews[app_id]
+        cursor = query.get('cursor', '*')
+        offset = 0 if cursor == '*' else int(cursor)
+        per_page = min(int(query.get('num_per_page', 20)), 100)
+        page = all_reviews[offset:offset + per_page]
+        return json_response({
+            'success': 1,
+            'query_summary': {'num_reviews': len(page), 'total_reviews': len(all_reviews)},
+            'reviews': page,
+            'cursor': str(offset + len(page)),
+        })
+
+    return {'/appreviews/': app_reviews}
+
+
+def ollama_routes(token_latency=0.0, chunk_chars=8):
+    """Ollama /api/generate 替身：按提示词哈希生成确定性的情感 JSON，流式时每块间隔 token_latency 秒"""
+    emotions = ['Anger', 'Disgust', 'Anticipation', 'Fear', 'Joy', 'Sadness', 'Trust', 'Surprise']
+
+    def generate(body):
+        rng = random.Random(zlib.crc32(body.get('prompt', '').encode('utf-8')))
+        text = json.dumps({'emotions': {emotion: round(rng.random(), 2) for emotion in emotions},
+                           'confidence': round(rng.uniform(0.5, 1.0), 2)})
+        model = body.get('model', '')
+        if not body.get('stream', True):
+            return json_response({'model': model, 'response': text, 'done': True})
+
+        def chunks():
+            for start in range(0, len(text), chunk_chars):
+                if token_latency:
+                    time.sleep(token_latency)
+                yield json.dumps({'model': model, 'response': text[start:start + chunk_chars], 'done': False}) + '\n'
+            yield json.dumps({'model': model, 'response': '', 'done': True}) + '\n'
+
+        return 200, 'application/x-ndjson', chunks()
+
+    return {'/api/generate': generate}
+
+
+def synthetic_steamspy_catalog(num_apps=5000, seed=0):
+    """生成确定性的 SteamSpy 目录，字段与 request=all 的返回一致"""
+    rng = random.Random(seed)
+    catalog = {}
+    for i in range(num_apps):
+        appid = 10 * (i + 1)
+        low = rng.choice([0, 20000, 50000, 100000, 200000, 500000, 1000000])
+        catalog[str(appid)] = {
+            'appid': appid,
+            'name': f"Game {appid}",
+            'developer': f"Studio {rng.randint(1, 500)}",
+            'publisher': f"Publisher {rng.randint(1, 200)}",
+            'score_rank': '',
+            'positive': rng.randint(0, 100000),
+            'negative': rng.randint(0, 20000),
+            'userscore': 0,
+            'owners': f"{low:,} .. {max(low * 2, 20000):,}",
+            'average_forever': rng.randint(0, 6000),
+            'average_2weeks': rng.randint(0, 600),
+            'median_forever': rng.randint(0, 3000),
+            'median_2weeks': rng.randint(0, 300),
+            'price': str(rng.choice([0, 499, 999, 1999, 2999, 5999])),
+            'initialprice': str(rng.choice([0, 499, 999, 1999, 2999, 5999])),
+            'discount': '0',
+            'ccu': rng.randint(0, 5000),
+        }
+    return catalog
+
+
+def steamspy_routes(catalog):
+    """SteamSpy api.php 替身：支持 request=all（分页）和 request=appdetails"""
+    ordered = list(catalog.values())
+
+    def api(query):
+        request = query.get('request')
+        if request == 'all':
+            page = int(query.get('page', 0))
+            chunk = ordered[page * STEAMSPY_PAGE_SIZE:(page + 1) * STEAMSPY_PAGE_SIZE]
+            return json_response({str(entry['appid']): entry for entry in chunk})
+        if request == 'appdetails':
+            entry = catalog.get(str(query.get('appid')))
+            return json_response(entry or {'appid': int(query.get('appid', 0))})
+        return json_response({'error': f"unknown request {request}"}, status=400)
+
+    return {'/api.php': api}
+
+
+def synthetic_steamscout_page(app_id, languages=None, seed=0):
+    """生成一个与 SteamScout 结构相同的页面：第一个表格为 评分 | 语言"""
+    languages = languages or ['Simplified Chinese', 'English', 'Russian', 'Portuguese - Brazil',
+                              'German', 'French', 'Spanish - Spain', 'Japanese', 'Korean', 'Polish']
+    rng = random.Random(f"{seed}-{app_id}")
+    rows = ''.join(f"<tr><td>{rng.uniform(0.3, 1.0):.2f}</td><td>{language}</td></tr>" for language in languages)
+    return (f"<html><head><title>SteamScout {app_id}</title></head><body>"
+            f"<table><thead><tr><th>Score</th><th>Language</th></tr></thead><tbody>{rows}</tbody></table>"
+            f"<table><tr><td>footer</td></tr></table></body></html>")
+
+
+def load_recorded_pages(directory):
+    """读取 fetchregionalscoresample.RECORD_DIR 保存的 <app_id>.html"""
+    pages = {}
+    for name in os.listdir(directory):
+        if name.endswith('.html'):
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                pages[name[:-len('.html')]] = f.read()
+    return pages
+
+
+def steamscout_routes(pages=None):
+    """SteamScout steamAPI.php 替身：有录制的页面就回放，否则生成合成页面"""
+    pages = pages or {}
+
+    def page(query):
+        app_id = query.get('appID', '')
+        html = pages.get(app_id) or synthetic_steamscout_page(app_id)
+        return 200, 'text/html; charset=utf-8', html
+
+    return {'/SteamScout/steamAPI.php': page}
+
+
+if __name__ == "__main__":
+    routes = {**steamspy_routes(synthetic_steamspy_catalog()), **steamscout_routes(),
+              **steam_reviews_routes(), **ollama_routes()}
+    with FixtureServer(routes) as server:
+        print(f"SteamSpy stand-in:   {server.url}/api.php")
+        print(f"Steam reviews stand-in: {server.url}/appreviews/<app_id>")
+        print(f"Ollama stand-in:     OLLAMA_HOST={server.url}")
+        print(f"SteamScout stand-in: {server.url}/SteamScout/steamAPI.php?appID=<app_id>  (Ctrl+C to stop)")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,121 @@
+import random
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+import metrics
+
+# 需要退避重试的状态码（限流 + 服务端错误）
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """令牌桶限速器：多个线程共享同一个每秒请求预算"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取走一个令牌，必要时阻塞等待；返回本次等待的秒数"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_local = threading.local()
+
+
+def get_session():
+    """每个线程复用一个 requests.Session（连接池）"""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        _local.session = session
+    return session
+
+
+def get_with_retry(url, params=None, limiter=None, max_retries=5, backoff_base=2.0,
+                   backoff_max=60.0, timeout=30):
+    """带限速和指数退避的 GET，遇到 429/5xx 或网络错误时重试
+
+    按主机记录：请求延迟、状态码、限速等待、重试次数和退避睡眠时间（见 metrics）。
+    """
+    host = urlparse(url).netloc
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            metrics.observe('rate_limit_wait_seconds', limiter.acquire(), host=host)
+
+        retry_after = None
+        try:
+            with metrics.timer('http_request_seconds', host=host):
+                response = get_session().get(url, params=params, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            error = e
+            reason = type(e).__name__
+        else:
+            metrics.inc('http_responses', host=host, status=response.status_code)
+            if response.status_code not in RETRY_STATUS:
+                response.raise_for_status()
+                return response
+            error = requests.exceptions.HTTPError(
+                f"HTTP {response.status_code} for {url}", response=response)
+            retry_after = response.headers.get('Retry-After')
+            reason = str(response.status_code)
+
+        if attempt == max_retries:
+            metrics.inc('http_failures', host=host, reason=reason)
+            raise error
+        metrics.inc('http_retries', host=host, reason=reason)
+
+        # 优先遵守服务端给出的 Retry-After，否则指数退避加随机抖动
+        if retry_after is not None and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = min(backoff_max, backoff_base * 2 ** attempt) * random.uniform(0.5, 1.5)
+        metrics.inc('http_backoff_sleep_seconds', delay, host=host)
+        time.sleep(delay)
+
+
+class ResponseCache:
+    """基于 SQLite 的 HTTP 响应缓存，按完整 URL（含参数）存储，ttl 秒后过期"""
+
+    def __init__(self, path, ttl=None):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, body TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, url):
+        """命中且未过期时返回响应文本，否则返回 None"""
+        with self.lock:
+            row = self.conn.execute("SELECT body, fetched_at FROM responses WHERE url = ?", (url,)).fetchone()
+        if row is None or (self.ttl is not None and time.time() - row[1] >= self.ttl):
+            return None
+        return row[0]
+
+    def put(self, url, body):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO responses (url, body, fetched_at) VALUES (?, ?, ?)",
+                              (url, body, time.time()))
@@ -0,0 +1,214 @@
+import bisect
+import cProfile
+import functools
+import json
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# 轻量的进程内指标：计数器和直方图（按标签区分），结束时导出为 Prometheus 文本文件和 JSON 运行报告
+METRICS_DIR = 'metrics'
+# 延迟直方图的桶上界（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 每个直方图保留的样本数上限（蓄水池抽样），用于报告里的分位数
+RESERVOIR_SIZE = 10000
+# 设为 True 时每个 stage() 用 cProfile 采集，结果写到 METRICS_DIR/<stage>.prof；
+# cProfile 只采集调用 enable() 的线程，工作线程里执行的函数要用 profiled() 包装才会被采集
+PROFILE = False
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+# 当前 stage() 里各工作线程的 Profile（未在采集时为 None）；_local.active 表示本线程已在采集
+_thread_profiles = None
+_local = threading.local()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.samples = []
+        self.rng = random.Random(0)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(value)
+        else:
+            i = self.rng.randrange(self.count)
+            if i < RESERVOIR_SIZE:
+                self.samples[i] = value
+
+
+def inc(name, value=1, **labels):
+    """计数器加 value"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """直方图记录一个观测值（通常是秒）"""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = _Histogram()
+        histogram.observe(value)
+
+
+@contextmanager
+def timer(name, **labels):
+    """把 with 块的耗时记到直方图 name"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def stage(name):
+    """一个处理阶段：记录总耗时；PROFILE 为 True 时同时做 cProfile
+
+    主线程和 profiled() 包装的函数所在的工作线程各用一个 Profile，阶段结束时合并写出。
+    """
+    global _thread_profiles
+    profiler = None
+    if PROFILE and not getattr(_local, 'active', False):
+        profiler = cProfile.Profile()
+        _thread_profiles, outer = [], _thread_profiles
+        _local.active = True
+        profiler.enable()
+    try:
+        with timer('stage_seconds', stage=name):
+            yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _local.active = False
+            with _lock:
+                profiles, _thread_profiles = _thread_profiles, outer
+            stats = pstats.Stats(profiler)
+            for thread_profiler in profiles:
+                stats.add(thread_profiler)
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            stats.dump_stats(os.path.join(METRICS_DIR, f"{name}.prof"))
+
+
+def profiled(func):
+    """包装在工作线程中执行的函数：处于采集中的 stage() 内时，每个线程用自己的 Profile 采集"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _lock:
+            profiles = _thread_profiles
+        if profiles is None or getattr(_local, 'active', False):
+            return func(*args, **kwargs)
+        if getattr(_local, 'profiles', None) is not profiles:
+            # 线程池的线程会跨阶段复用，换了阶段就换一个新的 Profile
+            _local.profiler, _local.profiles = cProfile.Profile(), profiles
+            with _lock:
+                profiles.append(_local.profiler)
+        _local.active = True
+        _local.profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.profiler.disable()
+            _local.active = False
+    return wrapper
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _escape(value):
+    """Prometheus 标签值中的反斜杠、双引号和换行要转义"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def prometheus_text():
+    """Prometheus 文本格式（node_exporter textfile collector 可直接读取）"""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, (list(h.counts), h.total, h.count)) for key, h in _histograms.items())
+    for name in sorted({name for (name, _), _ in counters}):
+        lines.append(f"# TYPE {name}_total counter")
+        lines.extend(f"{name}_total{_labels(labels)} {value}" for (n, labels), value in counters if n == name)
+    for name in sorted({name for (name, _), _ in histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (n, labels), (counts, total, count) in histograms:
+            if n != name:
+                continue
+            cumulative = 0
+            for bound, bucket in zip(list(BUCKETS) + ['+Inf'], counts):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+def report():
+    """JSON 运行报告：计数器、直方图摘要（次数、总和、均值、分位数）和派生指标"""
+    with _lock:
+        counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(_counters.items())]
+        histograms = [{
+            'name': name, 'labels': dict(labels), 'count': h.count, 'sum': round(h.total, 6),
+            'mean': round(h.total / h.count, 6) if h.count else None,
+            'p50': _percentile(h.samples, 0.5), 'p90': _percentile(h.samples, 0.9),
+            'p99': _percentile(h.samples, 0.99),
+        } for (name, labels), h in sorted(_histograms.items())]
+
+    def total(name):
+        return sum(c['value'] for c in counters if c['name'] == name)
+
+    derived = {}
+    if total('llm_generation_seconds'):
+        derived['llm_tokens_per_second'] = round(total('llm_tokens') / total('llm_generation_seconds'), 2)
+    return {'counters': counters, 'histograms': histograms, 'derived': derived}
+
+
+def _write(path, text):
+    """先写临时文件再替换，采集器不会读到写了一半的文件"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def export(run_name, directory=METRICS_DIR):
+    """写出 <run_name>.prom 和 <run_name>.json，返回报告"""
+    os.makedirs(directory, exist_ok=True)
+    data = dict(report(), run=run_name, finished_at=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    _write(os.path.join(directory, f"{run_name}.prom"), prometheus_text())
+    _write(os.path.join(directory, f"{run_name}.json"), json.dumps(data, ensure_ascii=False, indent=2))
+    return data
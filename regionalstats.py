@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+from statsmodels.stats.multitest import multipletests
+
+import resampling
+
+# 多重比较校正方法：名称 -> statsmodels multipletests 的 method
+CORRECTIONS = {'bonferroni': 'bonferroni', 'holm': 'holm', 'bh': 'fdr_bh'}
+
+RESULT_COLUMNS = ['Language', 'Mean', 'Global Mean', 'z-statistic',
+                  'p-value (raw)', 'p-value (adjusted)', 'Significance', 'Direction']
+
+
+def significance_stars(p):
+    """逐元素的显著性标记 (***p<0.001, **p<0.01, *p<0.05)；NaN 为空字符串"""
+    p = np.asarray(p, dtype=float)
+    return np.select([p < 0.001, p < 0.01, p < 0.05], ['***', '**', '*'], default='')
+
+
+def adjust_pvalues(p, method='bonferroni'):
+    """多重比较校正，只在非 NaN 的 p 值上做（比较次数 = 实际检验的个数）"""
+    p = np.asarray(p, dtype=float)
+    adjusted = np.full_like(p, np.nan)
+    valid = ~np.isnan(p)
+    if valid.any():
+        adjusted[valid] = multipletests(p[valid], method=CORRECTIONS[method])[1]
+    return adjusted
+
+
+def fisher_exact_2x2(tables):
+    """批量双边 Fisher 精确检验，tables 形状 (..., 2, 2)，p 值与 scipy.stats.fisher_exact 一致
+
+    在超几何分布的整个支撑集上一次算出概率，把不大于观测表概率的项加起来。
+    """
+    tables = np.asarray(tables, dtype=np.int64)
+    flat = tables.reshape(-1, 2, 2)
+    row, col, n = flat[:, 0].sum(axis=1), flat[:, :, 0].sum(axis=1), flat.sum(axis=(1, 2))
+    low, high = np.maximum(0, col - (n - row)), np.minimum(row, col)
+    x = low[:, None] + np.arange(int((high - low).max(initial=0)) + 1)[None, :]
+    pmf = stats.hypergeom.pmf(x, n[:, None], row[:, None], col[:, None])
+    observed = stats.hypergeom.pmf(flat[:, 0, 0], n, row, col)
+    keep = (x <= high[:, None]) & (pmf <= observed[:, None] * (1 + 1e-7))
+    return np.minimum(np.where(keep, pmf, 0.0).sum(axis=1), 1.0).reshape(tables.shape[:-2])
+
+
+def masked_moments(values):
+    """按行忽略 NaN 的 (个数, 均值, 样本标准差)；个数不足 2 的行标准差为 NaN"""
+    values = np.asarray(values, dtype=float)
+    mask = ~np.isnan(values)
+    n = mask.sum(axis=-1)
+    filled = np.where(mask, values, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = filled.sum(axis=-1) / n
+        squares = np.where(mask, values - mean[..., None], 0.0) ** 2
+        std = np.sqrt(squares.sum(axis=-1) / (n - 1))
+    std = np.where(n >= 2, std, np.nan)
+    return n, mean, std
+
+
+def regional_ztest(scores, global_scores, languages=None, method='bonferroni', min_games=2):
+    """每种语言的评分与全球评分做双样本 z 检验，一次完成所有语言
+
+    scores 为 语言 × 游戏 的矩阵（缺失为 NaN），global_scores 为各游戏的全球评分。
+    有效游戏数少于 min_games 的语言不参与检验，结果各列为 NaN。
+    """
+    scores = np.asarray(scores, dtype=float)
+    n1, mean1, std1 = masked_moments(scores)
+    n2, mean2, std2 = masked_moments(np.asarray(global_scores, dtype=float)[None, :])
+
+    tested = n1 >= min_games
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = (mean1 - mean2) / np.sqrt(std1 ** 2 / n1 + std2 ** 2 / n2)
+    z = np.where(tested, z, np.nan)
+    raw_p = 2 * stats.norm.sf(np.abs(z))  # 双边检验
+    adjusted_p = adjust_pvalues(raw_p, method)
+
+    return pd.DataFrame({
+        'Language': languages if languages is not None else np.arange(len(scores)),
+        'Mean': np.where(tested, mean1, np.nan),
+        'Global Mean': np.repeat(mean2, len(scores)),
+        'z-statistic': z,
+        'p-value (raw)': raw_p,
+        'p-value (adjusted)': adjusted_p,
+        'Significance': significance_stars(adjusted_p),
+        'Direction': np.where(np.isnan(z), '', np.where(z > 0, 'Higher', 'Lower')),
+    }, columns=RESULT_COLUMNS)
+
+
+def split_regional_table(data):
+    """地区评分表（行为语言、最后一行为全球平均）-> (语言列表, 语言×游戏矩阵, 全球评分)"""
+    values = data.iloc[:, 1:].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    return data['Language'].iloc[:-1].tolist(), values[:-1], values[-1]
+
+
+def pad_rows(scores):
+    """把每行的非 NaN 值左对齐：返回 (填充后的矩阵, 每行个数)，空位为 0"""
+    scores = np.asarray(scores, dtype=float)
+    mask = ~np.isnan(scores)
+    counts = mask.sum(axis=1)
+    padded = np.zeros((len(scores), max(int(counts.max(initial=0)), 1)))
+    padded[np.arange(padded.shape[1])[None, :] < counts[:, None]] = scores[mask]
+    return padded, counts
+
+
+def _bootstrap_mean_diff(rng, size, padded, counts, global_values):
+    """有放回重抽样：每种语言在自己的有效游戏里抽，全球评分单独抽；返回 (size, 语言) 的均值差"""
+    rows = np.arange(len(padded))[None, :, None]
+    idx = (rng.random((size,) + padded.shape) * counts[None, :, None]).astype(np.int64)
+    valid = np.arange(padded.shape[1])[None, None, :] < counts[None, :, None]
+    means = np.where(valid, padded[rows, idx], 0.0).sum(axis=-1) / counts
+    global_means = global_values[rng.integers(0, len(global_values), (size, len(global_values)))].mean(axis=1)
+    return means - global_means[:, None]
+
+
+def _permutation_mean_diff(rng, size, pooled, counts, totals):
+    """把语言与全球评分合并后打乱，随机键排名前 counts 的作为语言组；返回 (size, 语言) 的均值差
+
+    统计量只需要语言组之和（全球组之和 = 总和 - 语言组之和），所以只取出排名前 max(counts) 的位置。
+    """
+    keys = rng.random((size,) + pooled.shape, dtype=np.float32)
+    keys[:, np.arange(pooled.shape[1])[None, :] >= totals[:, None]] = 2  # 填充位排到最后
+    order = np.argsort(keys, axis=-1)[..., :counts.max()]
+    picked = pooled[np.arange(len(pooled))[None, :, None], order]
+    first = np.where(np.arange(order.shape[-1])[None, None, :] < counts[None, :, None], picked, 0.0).sum(axis=-1)
+    return first / counts - (pooled.sum(axis=-1) - first) / (totals - counts)
+
+
+def regional_resampling(scores, global_scores, method='bonferroni', n_resamples=resampling.N_RESAMPLES,
+                        confidence=0.95, seed=resampling.SEED, workers=resampling.WORKERS, min_games=2):
+    """每种语言 与 全球 的均值差：自助法置信区间和置换检验 p 值（多重比较校正后）
+
+    返回与 scores 行对齐的 DataFrame；有效游戏数少于 min_games 的语言各列为 NaN。
+    """
+    scores = np.asarray(scores, dtype=float)
+    global_values = np.asarray(global_scores, dtype=float)
+    global_values = global_values[~np.isnan(global_values)]
+    counts = (~np.isnan(scores)).sum(axis=1)
+    tested = np.flatnonzero(counts >= min_games)
+
+    result = pd.DataFrame(np.nan, index=range(len(scores)), columns=[
+        'Mean Difference', 'CI low', 'CI high', 'p-value (permutation)', 'p-value (permutation, adjusted)'])
+    if len(tested) == 0:
+        return result
+
+    padded, counts = pad_rows(scores[tested])
+    observed = padded.sum(axis=1) / counts - global_values.mean()
+
+    boot = resampling.run_batched(_bootstrap_mean_diff, n_resamples, args=(padded, counts, global_values),
+                                  per_resample=3 * padded.size + len(global_values), seed=seed, workers=workers)
+    alpha = (1 - confidence) / 2
+    low, high = np.percentile(boot, [100 * alpha, 100 * (1 - alpha)], axis=0)
+
+    # 合并后的矩阵：每行先放该语言的有效值，紧接着放全部全球评分
+    totals = counts + len(global_values)
+    pooled = np.zeros((len(padded), padded.shape[1] + len(global_values)))
+    positions = np.arange(pooled.shape[1])[None, :]
+    pooled[positions < counts[:, None]] = padded[np.arange(padded.shape[1])[None, :] < counts[:, None]]
+    second = (positions >= counts[:, None]) & (positions < totals[:, None])
+    pooled[second] = np.tile(global_values, len(padded))
+    perm = resampling.run_batched(_permutation_mean_diff, n_resamples, args=(pooled, counts, totals),
+                                  per_resample=3 * pooled.size, seed=seed + 1, workers=workers)
+    raw_p = resampling.permutation_pvalue(observed, perm)
+
+    result.loc[tested, 'Mean Difference'] = observed
+    result.loc[tested, 'CI low'] = low
+    result.loc[tested, 'CI high'] = high
+    result.loc[tested, 'p-value (permutation)'] = raw_p
+    result['p-value (permutation, adjusted)'] = adjust_pvalues(result['p-value (permutation)'].to_numpy(), method)
+    return result
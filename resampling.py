@@ -0,0 +1,82 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+# 批量重抽样引擎：按块生成重抽样的下标矩阵，统计量在重抽样轴上向量化计算，
+# 各块可分给进程池；每块的随机数种子由 SeedSequence 派生，结果与进程数无关
+N_RESAMPLES = 10000
+SEED = 42
+WORKERS = os.cpu_count() or 1
+# 每块最多分配的数组元素个数（约 8 字节/个），控制内存峰值
+CHUNK_ELEMENTS = 4_000_000
+
+
+def chunk_sizes(n_resamples, per_resample, chunk_elements=CHUNK_ELEMENTS):
+    """把 n_resamples 次重抽样切成若干块，每块元素数不超过 chunk_elements（至少 1 次/块）"""
+    size = max(1, int(chunk_elements // max(per_resample, 1)))
+    return [min(size, n_resamples - start) for start in range(0, n_resamples, size)]
+
+
+def _run_chunk(statistic, size, seed, args):
+    return statistic(np.random.default_rng(seed), size, *args)
+
+
+def run_batched(statistic, n_resamples=N_RESAMPLES, args=(), per_resample=1, seed=SEED, workers=WORKERS,
+                chunk_elements=CHUNK_ELEMENTS):
+    """按块调用 statistic(rng, size, *args)，返回沿第 0 维拼接的 (n_resamples, ...) 结果
+
+    statistic 必须是模块级函数（进程池需要能序列化）；per_resample 为单次重抽样分配的元素数，
+    用于确定块大小。分块与种子只由 n_resamples、per_resample 和 seed 决定，
+    所以单进程和多进程的结果完全相同。
+    """
+    sizes = chunk_sizes(n_resamples, per_resample, chunk_elements)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as pool:
+            parts = list(pool.map(_run_chunk, repeat(statistic), sizes, seeds, repeat(args)))
+    else:
+        parts = [_run_chunk(statistic, size, s, args) for size, s in zip(sizes, seeds)]
+    return np.concatenate(parts)
+
+
+def resamples_for(alpha, n_tests, n_resamples=N_RESAMPLES):
+    """置换 p 值的下限是 1/(B+1)：Bonferroni 校正 n_tests 次后仍可能低于 alpha 所需的重抽样次数（不少于 n_resamples）"""
+    return max(n_resamples, int(np.ceil(n_tests / alpha)))
+
+
+def permutation_pvalue(observed, resampled):
+    """双边置换 p 值 (1 + #|T*| >= |T|) / (B + 1)，逐列计算；observed 为 NaN 的列返回 NaN"""
+    observed = np.asarray(observed, dtype=float)
+    exceed = (np.abs(resampled) >= np.abs(observed) - 1e-12).sum(axis=0)
+    p = (1 + exceed) / (len(resampled) + 1)
+    return np.where(np.isnan(observed), np.nan, p)
+
+
+def _permuted_tables(rng, size, groups, categories, n_groups, n_categories):
+    """打乱组标签（每行一个置换下标矩阵），返回每次置换的 组 × 类别 列联表 (size, G, C)"""
+    order = np.argsort(rng.random((size, len(groups))), axis=1)
+    permuted = groups[order]
+    codes = (np.arange(size)[:, None] * n_groups + permuted) * n_categories + categories[None, :]
+    return np.bincount(codes.ravel(), minlength=size * n_groups * n_categories).reshape(
+        size, n_groups, n_categories)
+
+
+def chi2_statistic(tables):
+    """批量计算列联表的卡方统计量，tables 形状 (..., G, C)；期望频数为 0 的格子跳过"""
+    tables = np.asarray(tables, dtype=float)
+    total = tables.sum(axis=(-2, -1), keepdims=True)
+    expected = tables.sum(axis=-1, keepdims=True) * tables.sum(axis=-2, keepdims=True) / total
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cells = np.where(expected > 0, (tables - expected) ** 2 / expected, 0.0)
+    return cells.sum(axis=(-2, -1))
+
+
+def permutation_tables(groups, categories, n_resamples=N_RESAMPLES, seed=SEED, workers=WORKERS):
+    """组标签置换下的列联表：groups、categories 为整数编码，返回 (n_resamples, G, C)"""
+    groups = np.asarray(groups, dtype=np.int64)
+    categories = np.asarray(categories, dtype=np.int64)
+    n_groups, n_categories = int(groups.max()) + 1, int(categories.max()) + 1
+    return run_batched(_permuted_tables, n_resamples, args=(groups, categories, n_groups, n_categories),
+                       per_resample=2 * len(groups), seed=seed, workers=workers)
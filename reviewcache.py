@@ -0,0 +1,180 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import datasetstore
+import metrics
+
+# 本地抓取缓存（SQLite），每个游戏抓完立即提交
+CACHE_PATH = 'steam_reviews_cache.sqlite'
+
+REVIEW_COLUMNS = ['review_id', 'language', 'is_recommended', 'votes_up', 'votes_funny',
+                  'weighted_score', 'playtime_at_review', 'content', 'created_at', 'steam_purchase']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawls (
+    app_id INTEGER NOT NULL,
+    params_key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    review_count INTEGER NOT NULL,
+    last_timestamp INTEGER,
+    PRIMARY KEY (app_id, params_key)
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    app_id INTEGER NOT NULL,
+    params_key TEXT NOT NULL,
+    review_id TEXT NOT NULL,
+    language TEXT,
+    is_recommended INTEGER,
+    votes_up INTEGER,
+    votes_funny INTEGER,
+    weighted_score REAL,
+    playtime_at_review TEXT,
+    content TEXT,
+    created_at INTEGER,
+    steam_purchase INTEGER,
+    PRIMARY KEY (app_id, params_key, review_id)
+);
+"""
+
+
+def params_key(params):
+    """请求参数的稳定哈希，参数不同的抓取互不覆盖"""
+    encoded = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()[:16]
+
+
+class ReviewCache:
+    """按 (app_id, 请求参数) 存储评论；ttl 秒后视为过期需要重新抓取，None 表示永不过期"""
+
+    def __init__(self, path=CACHE_PATH, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        # 旧版缓存没有增量同步字段时补上
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(crawls)")}
+        if 'last_timestamp' not in columns:
+            self.conn.execute("ALTER TABLE crawls ADD COLUMN last_timestamp INTEGER")
+
+    def close(self):
+        self.conn.close()
+
+    def is_fresh(self, app_id, params):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT fetched_at FROM crawls WHERE app_id = ? AND params_key = ?",
+                (int(app_id), params_key(params))
+            ).fetchone()
+        if row is None:
+            return False
+        return self.ttl is None or time.time() - row[0] < self.ttl
+
+    def pending(self, app_ids, params):
+        """需要（重新）抓取的 app_id：没有缓存或已过期"""
+        return [app_id for app_id in app_ids if not self.is_fresh(app_id, params)]
+
+    def sync_state(self, app_id, params):
+        """增量同步的水位：已合并的最新评论的 timestamp_created；没有记录时返回 None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT last_timestamp FROM crawls WHERE app_id = ? AND params_key = ?",
+                (int(app_id), params_key(params))
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def save(self, app_id, params, df, last_timestamp=None, refresh=True):
+        """在一个事务里替换该游戏的评论并记录抓取时间（以及增量同步水位）
+
+        last_timestamp 为 None 时保留已有的水位；refresh 为 False 时（增量合并）保留原来的抓取时间，
+        TTL 仍从上一次全量抓取算起，过期后重新全量抓取以刷新旧评论的点赞数。
+        """
+        key = params_key(params)
+        rows = []
+        if df is not None and not df.empty:
+            out = df.reindex(columns=REVIEW_COLUMNS)
+            created = (pd.to_datetime(out['created_at']) - pd.Timestamp('1970-01-01')) // pd.Timedelta(seconds=1)
+            for record, ts in zip(out.itertuples(index=False), created):
+                rows.append((int(app_id), key, str(record.review_id), record.language,
+                             int(bool(record.is_recommended)), int(record.votes_up), int(record.votes_funny),
+                             float(record.weighted_score), record.playtime_at_review, record.content,
+                             int(ts), int(bool(record.steam_purchase))))
+
+        with self.lock, self.conn:
+            previous = self.conn.execute(
+                "SELECT fetched_at, last_timestamp FROM crawls WHERE app_id = ? AND params_key = ?",
+                (int(app_id), key)
+            ).fetchone()
+            fetched_at = previous[0] if previous is not None and not refresh else time.time()
+            if last_timestamp is None and previous is not None:
+                last_timestamp = previous[1]
+            self.conn.execute("DELETE FROM reviews WHERE app_id = ? AND params_key = ?", (int(app_id), key))
+            self.conn.executemany(
+                f"INSERT INTO reviews (app_id, params_key, {', '.join(REVIEW_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(REVIEW_COLUMNS) + 2))})",
+                rows
+            )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO crawls "
+                "(app_id, params_key, params, fetched_at, review_count, last_timestamp) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (int(app_id), key, json.dumps(params, ensure_ascii=False, default=str), fetched_at, len(rows),
+                 last_timestamp)
+            )
+
+    def load(self, app_id, params):
+        """读取缓存的评论，按 votes_up 降序"""
+        with self.lock:
+            df = pd.read_sql_query(
+                f"SELECT {', '.join(REVIEW_COLUMNS)} FROM reviews WHERE app_id = ? AND params_key = ? "
+                "ORDER BY votes_up DESC, rowid",
+                self.conn, params=(int(app_id), params_key(params))
+            )
+        df['is_recommended'] = df['is_recommended'].astype(bool)
+        df['steam_purchase'] = df['steam_purchase'].astype(bool)
+        df['created_at'] = pd.to_datetime(df['created_at'], unit='s')
+        return df
+
+    def crawled_ids(self, params):
+        """已有缓存（不论是否过期）的 app_id 集合"""
+        with self.lock:
+            rows = self.conn.execute("SELECT app_id FROM crawls WHERE params_key = ?", (params_key(params),))
+            return {row[0] for row in rows}
+
+    def export_dataset(self, app_ids, params, path):
+        """把缓存写入按 app_id 分区的 Parquet 数据集，返回写入的游戏数"""
+        crawled = self.crawled_ids(params)
+        written = 0
+        for app_id in app_ids:
+            if int(app_id) in crawled:
+                datasetstore.write_frame(self.load(app_id, params), path, datasetstore.REVIEW_SCHEMA, app_id)
+                written += 1
+        return written
+
+    def export_excel(self, app_ids, params, output_file):
+        """一次性把缓存渲染为 一游戏一工作表 + 0_Summary 的 Excel"""
+        crawled = self.crawled_ids(params)
+        counts = []
+        with metrics.timer('excel_io_seconds', op='write', file=output_file), \
+                pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+            for app_id in app_ids:
+                if int(app_id) not in crawled:
+                    counts.append(None)
+                    continue
+                df = self.load(app_id, params)
+                df.to_excel(writer, sheet_name=str(app_id), index=False)
+                counts.append(len(df))
+
+            summary_df = pd.DataFrame({
+                'app_id': app_ids,
+                'status': ['Success' if n is not None else 'Failed' for n in counts],
+                'reviews_saved': [n or 0 for n in counts]
+            })
+            summary_df.to_excel(writer, sheet_name='0_Summary', index=False)
+        return sum(n is not None for n in counts)
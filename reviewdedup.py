@@ -0,0 +1,108 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# 近重复检测：完全相同（归一化后）直接合并，近似相同用 MinHash + LSH 找候选再核对相似度
+ILLEGAL_CHARS = r'[\x00-\x08\x0b-\x0c\x0e-\x1f]'
+THRESHOLD = 0.8
+NUM_PERM = 64
+BANDS = 16
+SHINGLE = 3
+SEED = 42
+# 太短的文本 k-gram 很少，相似度估计不可靠（如 "10/10" 与 "1/10"），只做完全重复合并
+MIN_CHARS = 20
+
+_MOD = (1 << 31) - 1
+
+
+def clean_illegal_chars(series):
+    """去掉 Excel 不接受的控制字符（整列一次处理）"""
+    return series.str.replace(ILLEGAL_CHARS, '', regex=True)
+
+
+def normalize(series):
+    """用于判重的归一化：去控制字符、小写、标点和空白折叠为单个空格"""
+    # 转成 object 列，保证 \W 按 Unicode 处理（pyarrow 字符串列的正则只认 ASCII）
+    return (clean_illegal_chars(series.fillna('').astype(str).astype(object))
+            .str.lower()
+            .str.replace(r'[\W_]+', ' ', regex=True)
+            .str.strip())
+
+
+def shingles(text, k=SHINGLE):
+    """字符 k-gram 的 32 位哈希（字符级，中英文都适用）"""
+    if len(text) <= k:
+        grams = {text}
+    else:
+        grams = {text[i:i + k] for i in range(len(text) - k + 1)}
+    return np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash(texts, num_perm=NUM_PERM, k=SHINGLE, seed=SEED):
+    """每行一个 MinHash 签名，形状 (len(texts), num_perm)"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MOD, num_perm, dtype=np.uint64)
+    b = rng.integers(0, _MOD, num_perm, dtype=np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for i, text in enumerate(texts):
+        h = shingles(text, k) % _MOD
+        signatures[i] = ((h[:, None] * a + b) % _MOD).min(axis=0)
+    return signatures
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def near_duplicate_roots(texts, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS, k=SHINGLE, seed=SEED,
+                         min_chars=MIN_CHARS):
+    """对（已去完全重复的）文本做 LSH 分桶，估计相似度达到 threshold 的合并为一组
+
+    返回每条文本所在组的代表下标（组内最小下标）；短于 min_chars 的文本自成一组。
+    """
+    n = len(texts)
+    parent = np.arange(n)
+    candidates = np.array([i for i, text in enumerate(texts) if len(text) >= min_chars], dtype=int)
+    if len(candidates) < 2:
+        return parent
+    signatures = np.zeros((n, num_perm), dtype=np.uint64)
+    signatures[candidates] = minhash([texts[i] for i in candidates], num_perm, k, seed)
+    rows = num_perm // bands
+    for band in range(bands):
+        buckets = {}
+        for i in candidates:
+            key = signatures[i, band * rows:(band + 1) * rows].tobytes()
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            for j, other in enumerate(members[1:], start=1):
+                for earlier in members[:j]:
+                    root_a, root_b = _find(parent, earlier), _find(parent, other)
+                    if root_a == root_b:
+                        break
+                    if np.mean(signatures[earlier] == signatures[other]) >= threshold:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+                        break
+    return np.array([_find(parent, i) for i in range(n)])
+
+
+def group_representatives(contents, threshold=THRESHOLD):
+    """每条评论所属组的代表（组内第一条）的位置下标
+
+    先按归一化文本合并完全重复，再在去重后的文本上找近似重复。
+    """
+    normalized = normalize(pd.Series(contents).reset_index(drop=True))
+    codes, uniques = pd.factorize(normalized)
+    # factorize 按首次出现的顺序编号，return_index 即每个编号第一次出现的位置
+    _, first_seen = np.unique(codes, return_index=True)
+    roots = near_duplicate_roots(list(uniques), threshold)
+    return first_seen[roots[codes]]
+
+
+def compression_ratio(representatives):
+    """评论数 / 需要打分的组数"""
+    groups = len(np.unique(representatives))
+    return len(representatives) / groups if groups else 1.0
@@ -0,0 +1,142 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tqdm import tqdm
+
+import datasetstore
+import emotioncache
+import embeddingindex
+import fetchsteamreviewsample as fetcher
+import metrics
+import scorecheckpoint
+import sentimentanalysissample as scoring
+from httpclient import RateLimiter
+from reviewcache import ReviewCache
+
+# 抓取与打分流水线：抓完一个游戏就放进有界队列，打分阶段同时处理已抓到的游戏
+# 队列满时抓取线程阻塞等待（背压），内存里最多有 FETCH_WORKERS + QUEUE_SIZE 个游戏
+APP_IDS = fetcher.APP_IDS
+FETCH_WORKERS = fetcher.MAX_WORKERS
+REQUESTS_PER_SECOND = fetcher.REQUESTS_PER_SECOND
+QUEUE_SIZE = 2
+# 打分阶段的并发由 sentimentanalysissample.MAX_IN_FLIGHT 控制（同时在途的推理请求数）
+
+_DONE = object()
+
+
+def fetch_one(app_id, cache, limiter):
+    """单个游戏的评论：缓存新鲜时直接读缓存，否则按 SYNC_MODE 抓取并写入缓存"""
+    params = fetcher.cache_params()
+    if fetcher.SYNC_MODE == 'delta':
+        return fetcher.sync_reviews(app_id, cache, limiter)
+    if cache.is_fresh(app_id, params):
+        return cache.load(app_id, params)
+    df = fetcher.fetch_game(app_id, limiter)
+    if df is not None:
+        cache.save(app_id, params, df)
+    return df
+
+
+def produce(app_ids, cache, out, stop, bar, max_workers=FETCH_WORKERS, requests_per_second=REQUESTS_PER_SECOND):
+    """抓取阶段：多线程抓取，抓完的游戏写入评论数据集后放进队列；全部结束后放入结束标记"""
+    limiter = RateLimiter(requests_per_second, burst=fetcher.RATE_BURST)
+
+    def put(item):
+        # 队列满时阻塞；打分阶段出错退出后不再等待
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def work(app_id):
+        # 打分阶段出错或被中断后，还没开始的游戏不再抓取，join() 不必等整轮抓完
+        if stop.is_set():
+            return
+        df = fetch_one(app_id, cache, limiter)
+        if df is not None:
+            datasetstore.write_frame(df, fetcher.REVIEWS_DATASET, datasetstore.REVIEW_SCHEMA, app_id)
+        bar.update(1)
+        if df is not None:
+            put((app_id, df))
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for future in [pool.submit(metrics.profiled(work), app_id) for app_id in app_ids]:
+            future.result()
+    finally:
+        # 抓取出错时取消还没开始的游戏
+        pool.shutdown(cancel_futures=True)
+        put(_DONE)
+
+
+def consume(items, scorer, checkpoint, output, bar, index=None, recorder=None):
+    """打分阶段：逐个游戏打分，打完立即合并进情感数据集（向量库同时保存）；进度条总数随游戏到达增加"""
+    while True:
+        item = items.get()
+        if item is _DONE:
+            return
+        app_id, df = item
+        reviews = scoring.prepare_reviews(df[scoring.INPUT_COLUMNS].copy()).assign(app_id=int(app_id))
+        reviews['review_id'] = reviews['review_id'].astype(str)
+        pending = scoring.pending_reviews(reviews, output, checkpoint)
+        # 去重只在单个游戏内做；跨游戏的完全重复由 EmotionCache 命中
+        scoring.score_to_checkpoint(pending, scorer, checkpoint, index, bar=bar, recorder=recorder)
+        scorecheckpoint.compact(output, checkpoint, reviews[['app_id', 'review_id']])
+        if index is not None:
+            index.save()
+
+
+def run(app_ids=APP_IDS, output=datasetstore.EMOTIONS_DATASET, cache=None, index=None):
+    """抓取与打分重叠执行，总耗时接近较慢的那个阶段"""
+    reviews_cache = ReviewCache(ttl=fetcher.CACHE_TTL_DAYS * 86400)
+    checkpoint = scorecheckpoint.ScoreCheckpoint()
+    # 上次中断留下的检查点先合并掉，之后每个游戏打完就合并、清空
+    leftover = checkpoint.read()
+    if len(leftover):
+        reviews = datasetstore.read_frame(fetcher.REVIEWS_DATASET, datasetstore.REVIEW_SCHEMA,
+                                          columns=['app_id', 'review_id'],
+                                          filters={'app_id': leftover['app_id'].unique().tolist()})
+        scorecheckpoint.compact(output, checkpoint, reviews)
+
+    recorder = scoring.LLMRecorder() if index is not None else None
+    scorer = scoring.make_scorer(cache, recorder)
+    items = queue.Queue(maxsize=QUEUE_SIZE)
+    stop = threading.Event()
+    fetch_bar = tqdm(total=len(app_ids), desc="抓取", unit="游戏", position=0)
+    score_bar = tqdm(total=0, desc="打分", unit="组", position=1)
+    errors = []
+
+    def producer_main():
+        try:
+            produce(app_ids, reviews_cache, items, stop, fetch_bar)
+        except Exception as e:
+            errors.append(e)
+
+    producer = threading.Thread(target=metrics.profiled(producer_main), daemon=True)
+    producer.start()
+    try:
+        consume(items, scorer, checkpoint, output, score_bar, index, recorder)
+    finally:
+        stop.set()
+        producer.join()
+        fetch_bar.close()
+        score_bar.close()
+        reviews_cache.close()
+    if errors:
+        raise errors[0]
+
+    if scoring.EXPORT_XLSX:
+        datasetstore.export_excel(output, datasetstore.EMOTION_SCHEMA, scoring.OUTPUT_XLSX)
+
+
+if __name__ == "__main__":
+    cache = emotioncache.EmotionCache()
+    index = embeddingindex.EmbeddingIndex() if scoring.KNN_PROPAGATION else None
+    with metrics.stage('pipeline'):
+        run(cache=cache, index=index)
+    print(f"缓存统计: {cache.stats()}")
+    cache.close()
+    metrics.export('pipeline')
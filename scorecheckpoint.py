@@ -0,0 +1,106 @@
+import os
+import shutil
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import datasetstore
+
+# 情感打分的检查点：每打完一批就把结果写成一个 Parquet 文件，中断后重跑只补没打过分的评论
+CHECKPOINT_DIR = 'data/emotion_checkpoint'
+
+
+class ScoreCheckpoint:
+    """追加式的批次文件目录；compact 把批次合并进情感数据集后清空"""
+
+    def __init__(self, path=CHECKPOINT_DIR, schema=datasetstore.EMOTION_SCHEMA):
+        self.path = path
+        self.schema = schema
+        os.makedirs(path, exist_ok=True)
+        # 上次中断时没写完的临时文件直接删掉（那一批会被当作未打分重新处理）
+        for name in os.listdir(path):
+            if name.endswith('.tmp'):
+                os.remove(os.path.join(path, name))
+        files = self.batch_files()
+        self.next_batch = int(files[-1][6:12]) + 1 if files else 0
+
+    def batch_files(self):
+        return sorted(name for name in os.listdir(self.path)
+                      if name.startswith('batch-') and name.endswith('.parquet'))
+
+    def append(self, frame):
+        """写入一批结果：先写临时文件、fsync，再原子替换，中断时不会留下半个批次"""
+        name = f"batch-{self.next_batch:06d}.parquet"
+        tmp = os.path.join(self.path, name + '.tmp')
+        pq.write_table(datasetstore.to_table(frame, self.schema), tmp)
+        with open(tmp, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, name))
+        self.next_batch += 1
+
+    def read(self):
+        """按写入顺序读出所有批次"""
+        files = self.batch_files()
+        if not files:
+            return pd.DataFrame(columns=self.schema.names)
+        return pd.concat([pq.read_table(os.path.join(self.path, name)).to_pandas() for name in files],
+                         ignore_index=True)
+
+    def remove(self, files):
+        """删除指定的批次文件（合并过的批次）"""
+        for name in files:
+            os.remove(os.path.join(self.path, name))
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.makedirs(self.path, exist_ok=True)
+        self.next_batch = 0
+
+
+def scored_keys(output, checkpoint, app_ids=None):
+    """已经有有效结果的 (app_id, review_id)：情感数据集和检查点中 dominant_emotion 不是 error 的行
+
+    app_ids 不为 None 时只读这些游戏的分区（逐个游戏打分时不必每次读整个数据集）。
+    """
+    columns = ['app_id', 'review_id', 'dominant_emotion']
+    pending = checkpoint.read()[columns]
+    if app_ids is not None:
+        app_ids = [int(app_id) for app_id in app_ids]
+        pending = pending[pending['app_id'].isin(app_ids)]
+    frames = [pending]
+    if datasetstore.exists(output):
+        filters = None if app_ids is None else {'app_id': app_ids}
+        frames.append(datasetstore.read_frame(output, datasetstore.EMOTION_SCHEMA, columns=columns,
+                                              filters=filters))
+    done = pd.concat(frames, ignore_index=True)
+    done = done[done['dominant_emotion'] != 'error']
+    return set(zip(done['app_id'].astype(int), done['review_id'].astype(str)))
+
+
+def compact(output, checkpoint, reviews):
+    """把检查点合并进情感数据集，每个游戏重写一次分区，然后从检查点中去掉已合并的行
+
+    reviews 为要合并的游戏的全部评论（含 app_id、review_id 列），决定最终保留哪些行及其顺序；
+    同一条评论有多个结果时以检查点中最后写入的为准。检查点里其他游戏的行（如上次中断的
+    流水线留下的）原样保留：先写成一个新批次，再删除旧批次。
+    """
+    files = checkpoint.batch_files()
+    new = checkpoint.read()
+    for app_id, wanted in reviews.groupby('app_id', sort=False):
+        parts = [new[new['app_id'] == app_id]]
+        if datasetstore.exists(output):
+            parts.insert(0, datasetstore.read_frame(output, datasetstore.EMOTION_SCHEMA,
+                                                    filters={'app_id': int(app_id)}))
+        merged = (pd.concat(parts, ignore_index=True)
+                  .assign(review_id=lambda df: df['review_id'].astype(str))
+                  .drop_duplicates('review_id', keep='last')
+                  .set_index('review_id'))
+        order = wanted['review_id'].astype(str)
+        merged = merged.loc[order[order.isin(merged.index)]].reset_index()
+        datasetstore.write_frame(merged.drop(columns='app_id'), output, datasetstore.EMOTION_SCHEMA, app_id)
+    rest = new[~new['app_id'].isin(reviews['app_id'].unique())]
+    if len(rest):
+        checkpoint.append(rest)
+        checkpoint.remove(files)
+    else:
+        checkpoint.clear()
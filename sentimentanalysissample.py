@@ -1,9 +1,22 @@
 import pandas as pd
+import numpy as np
 from ollama import generate
 import json
 import os
+import time
 from tqdm import tqdm
 from collections import defaultdict
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import datasetstore
+import emotioncache
+import emotionlexicon
+import reviewdedup
+import embeddingindex
+import metrics
+import scorecheckpoint
 
 # 初始化情感标签及默认值
 EMOTION_TYPES = ['Anger', 'Disgust', 'Anticipation', 'Fear',
@@ -21,12 +34,219 @@ EMOTION_SENTIMENT_MAPPING = {
     'Surprise': 'positive'
 }
 
+# 输入输出：按 app_id 分区的 Parquet 数据集；Excel 只在 EXPORT_XLSX 时导出
+REVIEWS_DATASET = datasetstore.REVIEWS_DATASET
+EMOTIONS_DATASET = datasetstore.EMOTIONS_DATASET
+EXPORT_XLSX = False
+OUTPUT_XLSX = 'emotion_scores.xlsx'
+INPUT_COLUMNS = ['review_id', 'content', 'language', 'is_recommended']
+
+# 模型与生成参数；修改提示词或预算后递增 PROMPT_VERSION，使旧的缓存结果失效
+MODEL = 'deepseek-r1:8b'
+NUM_PREDICT = 256  # 输出 JSON 只有一百多个 token，给足余量后截断
+OPTIONS = {'temperature': 0.1, 'num_predict': NUM_PREDICT}
+PROMPT_VERSION = 3
+
+# 流式生成：JSON 对象一闭合且字段齐全就断开连接，不再等模型生成剩余 token
+STREAMING = True
+# 评论长度预算（估算 token 数：中日韩字符按 1 个，其他按 4 个字符 1 个）；默认 None 不截断。
+# 抓取时内容已截到 2000 字符，英文永远到不了 512 这样的预算，中日韩评论却会被截掉，
+# 跨语言比较时只改变部分语言的模型输入，所以只在明确需要时设置
+MAX_REVIEW_TOKENS = None
+# 模型常驻时间；提示词前缀（情感定义）固定不变，常驻时服务端可复用前缀缓存
+KEEP_ALIVE = '30m'
+
+# 打分模式：'llm' 全部交给大模型；'cascade' 先用词典打分，置信度低于 CASCADE_THRESHOLD 的才交给大模型
+SCORING_MODE = 'llm'
+CASCADE_THRESHOLD = 0.6
+# 大于 0 时抽样这么多条评论，对比词典与大模型的结果，输出各阈值下的一致率
+CASCADE_EVAL_SAMPLE = 0
+CASCADE_EVAL_THRESHOLDS = [0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+
+# 打分前去重：完全重复和相似度达到 DEDUP_THRESHOLD 的评论（跨游戏、跨语言）只打一次分，
+# 组内其余评论复用代表的结果（默认关闭，与逐条打分的结果保持一致）
+DEDUP = False
+DEDUP_THRESHOLD = 0.8
+
+# 近邻标签传播：已打分评论的向量存入 embeddingindex，新评论的 KNN_K 个近邻中相似度不低于
+# KNN_THRESHOLD 的按相似度加权得到情感向量；没有足够相似的近邻时才调用大模型
+KNN_PROPAGATION = False
+KNN_K = 5
+KNN_THRESHOLD = 0.92
+
+# 每打完这么多组（去重后的代表评论）就写一次检查点；重跑时跳过已有有效结果的评论
+CHECKPOINT_BATCH = 200
+CHECKPOINT_DIR = scorecheckpoint.CHECKPOINT_DIR
+
+# 同时在途的推理请求数，与 Ollama 服务端的 OLLAMA_NUM_PARALLEL 保持一致
+MAX_IN_FLIGHT = 4
+
+
+def list_games(source):
+    """[(游戏ID, 读取函数)]：source 为 Parquet 数据集目录（Excel 由 load_corpus 经 read_workbook 整体读取）"""
+    return [(str(app_id), lambda app_id=app_id: datasetstore.read_frame(
+                source, datasetstore.REVIEW_SCHEMA, columns=INPUT_COLUMNS, filters={'app_id': app_id}))
+            for app_id in datasetstore.app_ids(source)]
+
+
+def finalize_result(emotions, confidence):
+    """由情感强度确定主导情感和最终极性"""
+    # 确定主导情感
+    max_score = max(emotions.values())
+    candidates = [k for k, v in emotions.items() if v == max_score]
+
+    # 直接根据主导情感确定最终极性（参考网页7的二分类逻辑）
+    dominant_emotion = candidates[0]
+    if len(candidates) > 1:
+        dominant_emotion = max(candidates, key=lambda x: EMOTION_SENTIMENT_MAPPING[x] == 'positive')
+
+    # 强制覆盖为二分类结果（参考网页3的极性分类）
+    final_sentiment = EMOTION_SENTIMENT_MAPPING[dominant_emotion]
+
+    return {
+        'sentiment': final_sentiment,  # 只返回positive/negative
+        'confidence': confidence,
+        'emotions': emotions,
+        'dominant_emotion': dominant_emotion
+    }
+
+
+def analyze_sentiment_fast(text):
+    """词典打分：只用 CPU，输出格式与 analyze_sentiment 相同"""
+    emotions, confidence = emotionlexicon.score_text(text)
+    return finalize_result({emo: emotions[emo] for emo in EMOTION_TYPES}, confidence)
+
+
+class Cascade:
+    """两级打分：词典置信度达到 threshold 直接采用，否则交给大模型"""
+
+    def __init__(self, fast, slow, threshold=CASCADE_THRESHOLD):
+        self.fast = fast
+        self.slow = slow
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.counts = {'fast': 0, 'slow': 0}
+
+    def __call__(self, text):
+        result = self.fast(text)
+        tier = 'fast' if result['confidence'] >= self.threshold else 'slow'
+        with self.lock:
+            self.counts[tier] += 1
+        return result if tier == 'fast' else self.slow(text)
 
-def init_excel_file(file_path):
-    """初始化带八种情感字段的Excel文件"""
-    columns = ['review_id', 'content', 'language', 'is_recommended',
-               'sentiment', 'confidence', 'dominant_emotion'] + EMOTION_TYPES
-    pd.DataFrame(columns=columns).to_excel(file_path, index=False)
+
+def cascade_agreement(texts, thresholds=CASCADE_EVAL_THRESHOLDS, slow=None):
+    """词典与大模型逐条对比：各阈值下走快速通道的比例，以及这些评论上与大模型的一致率"""
+    fast = score_reviews(texts, scorer=analyze_sentiment_fast, desc="词典打分")
+    full = score_reviews(texts, scorer=slow or analyze_sentiment, desc="大模型打分")
+
+    valid = (full['dominant_emotion'] != 'error').to_numpy()
+    same_emotion = (fast['dominant_emotion'] == full['dominant_emotion']).to_numpy()
+    same_sentiment = (fast['sentiment'] == full['sentiment']).to_numpy()
+    abs_error = np.abs(fast[EMOTION_TYPES].to_numpy() - full[EMOTION_TYPES].to_numpy()).mean(axis=1)
+
+    rows = []
+    for threshold in thresholds:
+        accepted = (fast['confidence'] >= threshold).to_numpy() & valid
+        n = accepted.sum()
+        rows.append({
+            'threshold': threshold,
+            'fast_path_share': n / max(valid.sum(), 1),
+            'emotion_agreement': same_emotion[accepted].mean() if n else np.nan,
+            'sentiment_agreement': same_sentiment[accepted].mean() if n else np.nan,
+            'emotion_mae': abs_error[accepted].mean() if n else np.nan,
+            # 级联整体输出（未走快速通道的等同大模型）与全大模型的一致率
+            'overall_emotion_agreement': (same_emotion[accepted].sum() + (valid & ~accepted).sum())
+                                         / max(valid.sum(), 1),
+        })
+    return pd.DataFrame(rows)
+
+
+def estimate_tokens(text):
+    cjk = sum(1 for ch in text if '\u3000' <= ch <= '\u9fff' or '\uac00' <= ch <= '\ud7af')
+    return cjk + (len(text) - cjk) / 4
+
+
+def truncate_to_budget(text, max_tokens=MAX_REVIEW_TOKENS):
+    """按估算的 token 数截断过长的评论；max_tokens 为 None 时原样返回"""
+    if max_tokens is None or not isinstance(text, str) or estimate_tokens(text) <= max_tokens:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+class JsonObjectScanner:
+    """增量扫描流式输出，顶层 JSON 对象闭合时返回其文本（会跳过字符串里的括号）"""
+
+    def __init__(self):
+        self.buffer = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+
+    def feed(self, chunk):
+        for ch in chunk:
+            if not self.started:
+                if ch != '{':
+                    continue
+                self.started = True
+            self.buffer.append(ch)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == '{':
+                self.depth += 1
+            elif ch == '}':
+                self.depth -= 1
+                if self.depth == 0:
+                    return ''.join(self.buffer)
+        return None
+
+    def text(self):
+        return ''.join(self.buffer)
+
+
+def generate_json(prompt):
+    """流式生成，顶层 JSON 对象一闭合就关闭流，服务端随即停止生成
+
+    每个流式块约为一个 token：首块前的时间记为首 token 延迟，之后的块数和时间计入生成速度。
+    """
+    scanner = JsonObjectScanner()
+    start = time.perf_counter()
+    first = None
+    tokens = 0
+    stream = generate(model=MODEL, prompt=prompt, format='json', options=OPTIONS,
+                      stream=True, keep_alive=KEEP_ALIVE)
+    try:
+        for chunk in stream:
+            if first is None:
+                first = time.perf_counter()
+                metrics.observe('llm_first_token_seconds', first - start)
+            tokens += 1
+            obj = scanner.feed(chunk.get('response', ''))
+            if obj is not None or chunk.get('done'):
+                return obj if obj is not None else scanner.text()
+    finally:
+        if first is not None:
+            metrics.inc('llm_tokens', tokens)
+            metrics.inc('llm_generation_seconds', time.perf_counter() - first)
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+    return scanner.text()
 
 
 def analyze_sentiment(text):
@@ -59,43 +279,35 @@ def analyze_sentiment(text):
         "Surprise": 0.0-1.0
       }}
     }}
-    评论内容：{text}"""
+    评论内容：{truncate_to_budget(text, MAX_REVIEW_TOKENS)}"""
 
     try:
-        response = generate(
-            model='deepseek-r1:8b',
-            prompt=prompt,
-            format='json',
-            options={'temperature': 0.1}
-        )
-        result = json.loads(response['response'])
+        with metrics.timer('llm_request_seconds', streaming=STREAMING):
+            if STREAMING:
+                result = json.loads(generate_json(prompt))
+            else:
+                response = generate(
+                    model=MODEL,
+                    prompt=prompt,
+                    format='json',
+                    options=OPTIONS,
+                    keep_alive=KEEP_ALIVE
+                )
+                result = json.loads(response['response'])
+                # 非流式时服务端直接给出生成的 token 数和耗时（纳秒）
+                if response.get('eval_count') and response.get('eval_duration'):
+                    metrics.inc('llm_tokens', response['eval_count'])
+                    metrics.inc('llm_generation_seconds', response['eval_duration'] / 1e9)
 
         # 结果校验
         for emo in EMOTION_TYPES:
             val = result['emotions'].get(emo, 0.0)
             result['emotions'][emo] = min(max(float(val), 0.0), 1.0)
 
-        # 确定主导情感
-        emotions = result['emotions']
-        max_score = max(emotions.values())
-        candidates = [k for k, v in emotions.items() if v == max_score]
-
-        # 直接根据主导情感确定最终极性（参考网页7的二分类逻辑）
-        dominant_emotion = candidates[0]
-        if len(candidates) > 1:
-            dominant_emotion = max(candidates, key=lambda x: EMOTION_SENTIMENT_MAPPING[x] == 'positive')
-
-        # 强制覆盖为二分类结果（参考网页3的极性分类）
-        final_sentiment = EMOTION_SENTIMENT_MAPPING[dominant_emotion]
-
-        return {
-            'sentiment': final_sentiment,  # 只返回positive/negative
-            'confidence': result['confidence'],
-            'emotions': result['emotions'],
-            'dominant_emotion': dominant_emotion
-        }
+        return finalize_result(result['emotions'], result['confidence'])
 
     except Exception as e:
+        metrics.inc('llm_errors', error=type(e).__name__)
         return {
             'sentiment': 'negative',  # 错误时默认负面
             'confidence': 0.0,
@@ -103,46 +315,256 @@ def analyze_sentiment(text):
             'dominant_emotion': 'error'
         }
 
-def process_game_reviews(file_path):
-    """改进的主处理流程"""
-    excel_file = pd.ExcelFile(file_path)
-    init_excel_file('emotion_scores.xlsx')
-
-    with pd.ExcelWriter('emotion_scores.xlsx', engine='openpyxl', mode='a') as writer:
-        for sheet_name in tqdm(excel_file.sheet_names, desc="处理游戏"):
-            if sheet_name == '0_Summary':
-                continue
-
-            df = excel_file.parse(sheet_name)
-
-            # 新增：转换推荐字段为情感标签
-            df['is_recommended'] = df['is_recommended'].map({
-                True: 'positive',
-                False: 'negative',
-                'TRUE': 'positive',  # 兼容字符串类型
-                'FALSE': 'negative'
-            }).astype('category')
-
-            # 情感分析
-            tqdm.pandas(desc=f"情感分析 - {sheet_name}")
-            results = df['content'].progress_apply(
-                lambda x: pd.Series(analyze_sentiment(x))
-            )
-
-            # 构建结果数据
-            emotion_df = pd.json_normalize(results['emotions'])
-            final_df = pd.concat([
-                df[['review_id', 'content', 'language', 'is_recommended']],
-                results[['sentiment', 'confidence', 'dominant_emotion']],
-                emotion_df
-            ], axis=1)
-
-            # 保存结果
-            final_df.to_excel(
-                writer,
-                sheet_name=sheet_name,
-                index=False
-            )
+class LLMRecorder:
+    """包在大模型打分（含结果缓存）外面：记下本批由大模型给出（新打分或缓存命中、且不是出错兜底）的文本
+
+    近邻传播只把这些结果加入向量库，词典结果和传播结果不加；缓存命中的文本不一定在库里
+    （缓存先于向量库建立，或向量库目录被删过），所以是否加入由向量库里有没有这条文本决定。
+    """
+
+    def __init__(self, scorer=None):
+        self.scorer = scorer or analyze_sentiment
+        self.lock = threading.Lock()
+        self.texts = set()
+
+    def __call__(self, text):
+        result = self.scorer(text)
+        if result['dominant_emotion'] != 'error':
+            with self.lock:
+                self.texts.add(text)
+        return result
+
+    def take(self):
+        """取出并清空已记下的文本"""
+        with self.lock:
+            texts, self.texts = self.texts, set()
+        return texts
+
+
+def score_reviews(texts, max_in_flight=MAX_IN_FLIGHT, scorer=None, desc="情感分析", bar=None):
+    """并发打分：最多 max_in_flight 个请求在途（满了就等一个完成再提交），
+    结果按输入顺序直接写进列式数组，最后一次性构造 DataFrame；bar 为外部进度条时在其上累计"""
+    # 打分在线程池里执行，包一层才会被 metrics.stage() 的 cProfile 采集
+    scorer = metrics.profiled(scorer or analyze_sentiment)
+    n = len(texts)
+    sentiment = np.empty(n, dtype=object)
+    confidence = np.full(n, np.nan)
+    dominant = np.empty(n, dtype=object)
+    emotions = np.zeros((n, len(EMOTION_TYPES)))
+
+    def store(i, result):
+        sentiment[i] = result['sentiment']
+        confidence[i] = pd.to_numeric(result['confidence'], errors='coerce')
+        dominant[i] = result['dominant_emotion']
+        emotions[i] = [result['emotions'][emo] for emo in EMOTION_TYPES]
+
+    progress = tqdm(total=n, desc=desc) if bar is None else nullcontext(bar)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool, progress as bar:
+        in_flight = {}
+        for i, text in enumerate(texts):
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    store(in_flight.pop(future), future.result())
+                    bar.update(1)
+            in_flight[pool.submit(scorer, text)] = i
+        for future in wait(in_flight).done:
+            store(in_flight[future], future.result())
+            bar.update(1)
+
+    frame = pd.DataFrame(emotions, columns=EMOTION_TYPES)
+    frame.insert(0, 'sentiment', sentiment)
+    frame.insert(1, 'confidence', confidence)
+    frame.insert(2, 'dominant_emotion', dominant)
+    return frame
+
+
+def results_to_frame(results):
+    """[analyze_sentiment 结果] -> 与 score_reviews 相同列的 DataFrame"""
+    frame = pd.DataFrame([[r['emotions'][emo] for emo in EMOTION_TYPES] for r in results],
+                         columns=EMOTION_TYPES, dtype=float)
+    frame.insert(0, 'sentiment', [r['sentiment'] for r in results])
+    frame.insert(1, 'confidence', pd.to_numeric(pd.Series([r['confidence'] for r in results], dtype=object),
+                                                errors='coerce'))
+    frame.insert(2, 'dominant_emotion', [r['dominant_emotion'] for r in results])
+    return frame
+
+
+def score_with_neighbours(texts, scorer, index, recorder=None, desc="情感分析", bar=None):
+    """有足够相似的已打分近邻时加权传播其情感向量，其余调用 scorer
+
+    recorder 为包在大模型打分外面的 LLMRecorder，其记下的、库里还没有的结果加入向量库
+    （内存中，保存由调用方在合并时做）；为 None 时只查询不加入。
+    """
+    if not texts:
+        return score_reviews(texts, scorer=scorer, desc=desc, bar=bar)
+    vectors = embeddingindex.embed_texts(texts)
+    n = len(texts)
+    assigned = np.zeros(n, dtype=bool)
+    propagated = []
+    if len(index):
+        sims, idx = index.search(vectors, KNN_K)
+        weights = np.where(sims >= KNN_THRESHOLD, sims, 0.0)
+        assigned = weights.sum(axis=1) > 0
+        w = weights[assigned] / weights[assigned].sum(axis=1, keepdims=True)
+        emotions = np.einsum('nk,nke->ne', w, index.emotions[idx[assigned]])
+        confidence = (w * index.confidence[idx[assigned]]).sum(axis=1) * sims[assigned, 0]
+        propagated = [finalize_result(dict(zip(EMOTION_TYPES, map(float, e))), float(c))
+                      for e, c in zip(emotions, confidence)]
+    if bar is None:
+        print(f"近邻传播 {assigned.sum()} 条，交给打分函数 {n - assigned.sum()} 条")
+    else:
+        bar.update(int(assigned.sum()))
+
+    rest = np.flatnonzero(~assigned)
+    scored = score_reviews([texts[i] for i in rest], scorer=scorer, desc=desc, bar=bar)
+
+    # 只把大模型给出的结果加入向量库（传播、词典的不加）；库里已有的文本不重复加，同一文本只加一次
+    fresh = recorder.take() if recorder is not None else set()
+    ok = []
+    for j, i in enumerate(rest):
+        if texts[i] in fresh and texts[i] not in index:
+            fresh.discard(texts[i])
+            ok.append(j)
+    index.add(vectors[rest[ok]], scored[EMOTION_TYPES].to_numpy()[ok],
+              scored['confidence'].fillna(0.0).to_numpy()[ok],
+              [embeddingindex.text_key(texts[rest[j]]) for j in ok])
+
+    frame = pd.concat([results_to_frame(propagated).set_axis(np.flatnonzero(assigned)),
+                       scored.set_axis(rest)])
+    return frame.sort_index().reset_index(drop=True)
+
+
+def score_texts(texts, scorer, index=None, recorder=None, desc="情感分析", bar=None):
+    """按配置选择打分方式：有向量库时先做近邻传播"""
+    if index is not None:
+        return score_with_neighbours(texts, scorer, index, recorder, desc, bar)
+    return score_reviews(texts, scorer=scorer, desc=desc, bar=bar)
+
+
+def prepare_reviews(df):
+    """转换推荐字段为情感标签"""
+    # 新增：转换推荐字段为情感标签
+    df['is_recommended'] = df['is_recommended'].map({
+        True: 'positive',
+        False: 'negative',
+        'TRUE': 'positive',  # 兼容字符串类型
+        'FALSE': 'negative'
+    }).astype('category')
+    return df
+
+
+def load_corpus(source):
+    """读入全部游戏的评论，加上 app_id 列"""
+    if source.endswith('.xlsx'):
+        corpus = prepare_reviews(datasetstore.read_workbook(source, INPUT_COLUMNS))
+    else:
+        games = [prepare_reviews(load()).assign(app_id=int(sheet_name)) for sheet_name, load in list_games(source)]
+        if not games:
+            return pd.DataFrame(columns=['app_id'] + INPUT_COLUMNS)
+        corpus = pd.concat(games, ignore_index=True)
+    corpus['review_id'] = corpus['review_id'].astype(str)
+    return corpus
+
+
+def plan_groups(texts):
+    """每条评论所属组的代表下标；关闭去重时每条自成一组"""
+    if not DEDUP or not texts:
+        return np.arange(len(texts))
+    representatives = reviewdedup.group_representatives(texts, DEDUP_THRESHOLD)
+    print(f"去重：{len(texts)} 条评论 -> {len(np.unique(representatives))} 组，压缩比 "
+          f"{reviewdedup.compression_ratio(representatives):.2f}")
+    return representatives
+
+
+def make_scorer(cache=None, recorder=None):
+    """按配置组装打分函数：可选的结果缓存，可选的词典级联；recorder 包在大模型打分（含缓存）外面"""
+    scorer = analyze_sentiment
+    if cache is not None:
+        scorer = emotioncache.cached(analyze_sentiment, cache, MODEL, OPTIONS, PROMPT_VERSION)
+    if recorder is not None:
+        recorder.scorer = scorer
+        scorer = recorder
+    if SCORING_MODE == 'cascade':
+        scorer = Cascade(analyze_sentiment_fast, scorer)
+    return scorer
+
+
+def pending_reviews(corpus, output, checkpoint):
+    """去掉情感数据集和检查点中已有有效结果的评论（只读 corpus 中出现的游戏的分区）"""
+    done = scorecheckpoint.scored_keys(output, checkpoint, corpus['app_id'].unique().tolist())
+    keys = pd.Series(list(zip(corpus['app_id'], corpus['review_id'])), index=corpus.index, dtype=object)
+    return corpus[~keys.isin(done)].reset_index(drop=True)
+
+
+def score_to_checkpoint(pending, scorer, checkpoint, index=None, batch_size=CHECKPOINT_BATCH, bar=None,
+                        recorder=None):
+    """去重后按组分批打分，一批打完就把组内所有评论写入检查点；bar 为外部进度条（单位：组）"""
+    texts = pending['content'].tolist()
+    representatives = plan_groups(texts)
+    unique = np.unique(representatives)
+    members = pd.Series(np.arange(len(texts))).groupby(representatives).agg(list)
+    if bar is not None:
+        bar.total += len(unique)
+        bar.refresh()
+    progress = tqdm(total=len(unique), desc="情感分析", unit="组") if bar is None else nullcontext(bar)
+    with progress as bar:
+        for start in range(0, len(unique), batch_size):
+            batch = unique[start:start + batch_size]
+            scored = score_texts([texts[i] for i in batch], scorer, index, recorder, bar=bar)
+            rows = np.concatenate([members[i] for i in batch])
+            expanded = scored.iloc[np.repeat(np.arange(len(batch)), [len(members[i]) for i in batch])]
+            checkpoint.append(pd.concat([
+                pending.loc[rows, ['app_id'] + INPUT_COLUMNS].reset_index(drop=True),
+                expanded.reset_index(drop=True)
+            ], axis=1))
+    return len(unique)
+
+
+def process_game_reviews(source=REVIEWS_DATASET, output=EMOTIONS_DATASET, cache=None, index=None,
+                         checkpoint_dir=CHECKPOINT_DIR, batch_size=CHECKPOINT_BATCH):
+    """改进的主处理流程：按批打分并写入检查点，全部完成后合并成情感数据集
+
+    中断后重跑会跳过情感数据集和检查点中已有有效结果的评论，只补剩下的；
+    cache 为 EmotionCache 时复用已有结果；index 为 EmbeddingIndex 时先做近邻标签传播，
+    大模型新打出的结果加入向量库，合并时保存一次。
+    """
+    recorder = LLMRecorder() if index is not None else None
+    scorer = make_scorer(cache, recorder)
+    checkpoint = scorecheckpoint.ScoreCheckpoint(checkpoint_dir)
+    corpus = load_corpus(source)
+    pending = pending_reviews(corpus, output, checkpoint)
+    print(f"共 {len(corpus)} 条评论，已打分 {len(corpus) - len(pending)} 条，待打分 {len(pending)} 条")
+
+    # 去重在全部待打分评论上做（跨游戏、跨语言）
+    score_to_checkpoint(pending, scorer, checkpoint, index, batch_size, recorder=recorder)
+
+    # 合并：每个游戏只重写一次分区
+    scorecheckpoint.compact(output, checkpoint, corpus[['app_id', 'review_id']])
+    if index is not None:
+        index.save()
+
+    if EXPORT_XLSX:
+        datasetstore.export_excel(output, datasetstore.EMOTION_SCHEMA, OUTPUT_XLSX)
+
+    if isinstance(scorer, Cascade):
+        print(f"词典直接打分 {scorer.counts['fast']} 条，交给大模型 {scorer.counts['slow']} 条")
 
 if __name__ == "__main__":
-    process_game_reviews('steam_reviews_top50.xlsx')
\ No newline at end of file
+    source = REVIEWS_DATASET if datasetstore.exists(REVIEWS_DATASET) else 'steam_reviews_top50.xlsx'
+    cache = emotioncache.EmotionCache()
+    if CASCADE_EVAL_SAMPLE:
+        reviews = load_corpus(source)
+        contents = reviews['content'].dropna()
+        sample = contents.sample(min(CASCADE_EVAL_SAMPLE, len(contents)), random_state=42)
+        report = cascade_agreement(sample.tolist(), slow=emotioncache.cached(
+            analyze_sentiment, cache, MODEL, OPTIONS, PROMPT_VERSION))
+        print(report.to_string(index=False))
+        report.to_excel('cascade_agreement.xlsx', index=False)
+
+    index = embeddingindex.EmbeddingIndex() if KNN_PROPAGATION else None
+    with metrics.stage('sentiment'):
+        process_game_reviews(source, cache=cache, index=index)
+    print(f"缓存统计: {cache.stats()}")
+    metrics.export('sentiment')
+    cache.close()
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import datasetstore
+import metrics
+
+# 分析脚本共用的 Excel 读取缓存：每个工作表解析、转换类型后存一份 Parquet 快照，
+# 放在源文件旁边的 SNAPSHOT_DIR 目录；源文件的修改时间和大小不变时直接读快照，
+# 变了再比较内容哈希（只是被 touch 过的文件不重新解析）
+SNAPSHOT_DIR = '.snapshots'
+# 快照格式变化时加一，旧快照自动失效
+SNAPSHOT_VERSION = 1
+HASH_CHUNK = 1 << 20
+
+# 同一进程内重复读取时直接返回内存里结果的深拷贝（调用方可以随意修改）：快照路径 -> (源文件状态, DataFrame)
+_memory = {}
+
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_path(source, kind, options):
+    """快照文件名：源文件名 + 读取方式 + 选项的哈希（不同的列选择、类型转换互不覆盖）"""
+    key = json.dumps([SNAPSHOT_VERSION, kind, options], sort_keys=True, default=str)
+    name = f"{os.path.basename(source)}.{hashlib.sha1(key.encode()).hexdigest()[:12]}.parquet"
+    return os.path.join(os.path.dirname(os.path.abspath(source)), SNAPSHOT_DIR, name)
+
+
+def coerce_numeric(df, numeric):
+    """numeric 中的列用 pd.to_numeric(errors='coerce') 转成数字；'all' 表示除纯文本、日期、布尔外的所有列
+
+    其余混合类型的列转成字符串，Parquet 才能保存。
+    """
+    if numeric == 'all':
+        numeric = [column for column in df.columns if pd.api.types.infer_dtype(df[column], skipna=True)
+                   not in ('string', 'datetime64', 'datetime', 'date', 'boolean', 'empty')]
+    for column in numeric:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    for column in df.columns:
+        if pd.api.types.infer_dtype(df[column], skipna=True).startswith('mixed'):
+            df[column] = df[column].astype('string')
+    return df
+
+
+def _read_snapshot(path, stamp, source):
+    """快照仍然有效时返回 DataFrame，否则返回 None；内容没变只是时间戳变了时更新快照里的状态"""
+    if not os.path.exists(path):
+        return None
+    table = pq.read_table(path)
+    meta = json.loads(table.schema.metadata[b'sheetcache'])
+    if meta['stamp'] != stamp:
+        if meta['hash'] != file_hash(source):
+            return None
+        meta['stamp'] = stamp
+        _write_table(path, table, meta)
+    frame = table.to_pandas()
+    frame.columns = meta['columns']  # Parquet 只保存字符串列名，还原成原来的列名（如整数的游戏 ID）
+    return frame
+
+
+def _write_table(path, table, meta):
+    metadata = dict(table.schema.metadata or {}, sheetcache=json.dumps(meta))
+    tmp = path + '.tmp'
+    pq.write_table(table.replace_schema_metadata(metadata), tmp)
+    os.replace(tmp, path)
+
+
+def cached(source, kind, options, parse):
+    """按 源文件 + 读取方式 + 选项 缓存 parse() 的结果：先查进程内缓存，再查快照，最后才解析 Excel"""
+    path = snapshot_path(source, kind, options)
+    stamp = file_stamp(source)
+    memo = _memory.get(path)
+    if memo is not None and memo[0] == stamp:
+        metrics.inc('snapshot_hits', file=source, level='memory')
+        return memo[1].copy(deep=True)
+
+    with metrics.timer('snapshot_read_seconds', file=source):
+        frame = _read_snapshot(path, stamp, source)
+    if frame is not None:
+        metrics.inc('snapshot_hits', file=source, level='disk')
+    else:
+        metrics.inc('snapshot_misses', file=source)
+        frame = parse()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        _write_table(path, table, {'stamp': stamp, 'hash': file_hash(source), 'columns': list(frame.columns)})
+    _memory[path] = (stamp, frame)
+    return frame.copy(deep=True)
+
+
+def load_sheet(file_path, sheet_name=0, numeric=()):
+    """读取单个工作表，numeric 中的列（或 'all'）转成数字"""
+    def parse():
+        with metrics.timer('excel_io_seconds', op='read', file=file_path):
+            df = pd.read_excel(file_path, sheet_name=sheet_name)
+        return coerce_numeric(df, numeric)
+
+    return cached(file_path, 'sheet', [sheet_name, numeric], parse)
+
+
+def load_workbook(file_path, columns=None, numeric=()):
+    """读取 一游戏一工作表 的 Excel（datasetstore.read_workbook），只取 columns 列并加上 app_id"""
+    def parse():
+        return coerce_numeric(datasetstore.read_workbook(file_path, columns), numeric)
+
+    return cached(file_path, 'workbook', [columns, numeric], parse)
@@ -1,20 +1,210 @@
 import requests
 import pandas as pd
+import json
+import os
+import sqlite3
 import time
-import random
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
 
+import metrics
+from httpclient import RateLimiter, ResponseCache, get_with_retry
 
-def get_median_playtime(app_ids):
+STEAMSPY_URL = 'https://steamspy.com/api.php'
+
+# 客户端配置：并发数、每秒请求数（SteamSpy 限制约 1 次/秒）、响应缓存有效期
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 1.0
+CACHE_PATH = 'steamspy_cache.sqlite'
+CACHE_TTL_DAYS = 7
+
+# 结果以追加方式写入 CSV（每次运行开始时清空），每 BATCH_SIZE 条刷新一次，结束时再导出一次 Excel
+RESULTS_CSV = 'steamspy_api_results.csv'
+OUTPUT_FILE = 'steamspy_api_results.xlsx'
+BATCH_SIZE = 50
+RESULT_COLUMNS = ['App ID', 'Median Playtime (Hours)']
+
+# 批量目录：request=all 分页（每页 1000 个游戏，SteamSpy 限制约 1 次/分钟）存入本地索引
+USE_CATALOG = False
+CATALOG_PATH = 'steamspy_catalog.sqlite'
+CATALOG_REQUESTS_PER_SECOND = 1 / 60
+CATALOG_TTL_DAYS = 7
+CATALOG_COLUMNS = ['appid', 'name', 'owners', 'price', 'initialprice', 'positive', 'negative',
+                   'average_forever', 'median_forever', 'average_2weeks', 'median_2weeks']
+GAMES_FILE = 'games_studied.xlsx'
+# 补充了 SteamSpy 字段的 games_studied 写到 OUTPUT_FILE 的这个工作表
+ENRICHED_SHEET = 'Enriched Games'
+
+
+class SteamSpyClient:
+    """复用连接的 SteamSpy 客户端，带全局限速和本地响应缓存"""
+
+    def __init__(self, base_url=STEAMSPY_URL, max_workers=MAX_WORKERS,
+                 requests_per_second=REQUESTS_PER_SECOND, cache_path=CACHE_PATH, ttl_days=CACHE_TTL_DAYS):
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(requests_per_second)
+        self.cache = ResponseCache(cache_path, ttl=ttl_days * 86400) if cache_path else None
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+    def request(self, limiter=None, **params):
+        """GET api.php，优先返回缓存的响应"""
+        key = requests.Request('GET', self.base_url, params=params).prepare().url
+        if self.cache is not None:
+            body = self.cache.get(key)
+            if body is not None:
+                return json.loads(body)
+
+        response = get_with_retry(self.base_url, params=params, limiter=limiter or self.limiter)
+        if self.cache is not None:
+            self.cache.put(key, response.text)
+        return response.json()
+
+    def appdetails(self, app_id):
+        return self.request(request='appdetails', appid=app_id)
+
+    def catalog_page(self, page, limiter=None):
+        return self.request(limiter=limiter, request='all', page=page)
+
+    def map(self, func, app_ids):
+        """并发对每个 app_id 调用 func，按输入顺序产出 (app_id, 结果或异常)"""
+        def call(app_id):
+            try:
+                return app_id, func(app_id)
+            except requests.exceptions.RequestException as e:
+                return app_id, e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            yield from pool.map(metrics.profiled(call), app_ids)
+
+
+class ResultSink:
+    """只追加的结果文件：攒够一批再写入 CSV，避免每条都重写整个文件
+
+    创建时删除上次运行留下的 CSV，导出的 Excel 只包含本次运行的结果。
+    """
+
+    def __init__(self, path=RESULTS_CSV, columns=RESULT_COLUMNS, batch_size=BATCH_SIZE):
+        self.path = path
+        self.columns = columns
+        self.batch_size = batch_size
+        self.buffer = []
+        if os.path.exists(path):
+            os.remove(path)
+
+    def append(self, row):
+        self.buffer.append(row)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        write_header = not os.path.exists(self.path)
+        pd.DataFrame(self.buffer, columns=self.columns).to_csv(
+            self.path, mode='a', header=write_header, index=False)
+        self.buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def to_excel(self, output_file):
+        """把累积的 CSV 一次性导出为 Excel（同一 App ID 保留最后一次结果）"""
+        self.flush()
+        if os.path.exists(self.path):
+            df = pd.read_csv(self.path).drop_duplicates(subset=self.columns[0], keep='last')
+        else:  # 本次运行没有任何结果
+            df = pd.DataFrame(columns=self.columns)
+        with metrics.timer('excel_io_seconds', op='write', file=output_file):
+            df.to_excel(output_file, index=False)
+        return df
+
+
+class CatalogIndex:
+    """SteamSpy 全量目录的本地索引（appid 为主键），查询不再逐个请求 appdetails"""
+
+    def __init__(self, path=CATALOG_PATH):
+        self.conn = sqlite3.connect(path)
+        columns = ', '.join(f"{c} {'INTEGER PRIMARY KEY' if c == 'appid' else ''}" for c in CATALOG_COLUMNS)
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS catalog ({columns});
+            CREATE TABLE IF NOT EXISTS ingest_log (pages INTEGER, apps INTEGER, ingested_at REAL);
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def is_stale(self, ttl_days=CATALOG_TTL_DAYS):
+        row = self.conn.execute("SELECT MAX(ingested_at) FROM ingest_log").fetchone()
+        return row[0] is None or time.time() - row[0] >= ttl_days * 86400
+
+    def ingest(self, client, requests_per_second=CATALOG_REQUESTS_PER_SECOND, max_pages=None):
+        """逐页拉取 request=all 直到返回空页，每页一个事务写入；请求数 = 页数"""
+        limiter = RateLimiter(requests_per_second)
+        page = apps = 0
+        with tqdm(desc="SteamSpy catalog", unit="page") as bar:
+            while max_pages is None or page < max_pages:
+                data = client.catalog_page(page, limiter=limiter)
+                if not data:
+                    break
+                rows = [tuple(entry.get(c) for c in CATALOG_COLUMNS) for entry in data.values()]
+                with self.conn:
+                    self.conn.executemany(
+                        f"INSERT OR REPLACE INTO catalog ({', '.join(CATALOG_COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(CATALOG_COLUMNS))})",
+                        rows
+                    )
+                page += 1
+                apps += len(rows)
+                bar.update(1)
+
+        with self.conn:
+            self.conn.execute("INSERT INTO ingest_log VALUES (?, ?, ?)", (page, apps, time.time()))
+        return apps
+
+    def lookup(self, app_ids):
+        """按 appid 批量查询，返回 DataFrame（未收录的 appid 不在结果中）"""
+        ids = [int(app_id) for app_id in app_ids]
+        frames = []
+        for start in range(0, len(ids), 500):  # SQLite 变量个数限制
+            chunk = ids[start:start + 500]
+            frames.append(pd.read_sql_query(
+                f"SELECT * FROM catalog WHERE appid IN ({', '.join('?' * len(chunk))})",
+                self.conn, params=chunk
+            ))
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=CATALOG_COLUMNS)
+        df['price'] = pd.to_numeric(df['price'], errors='coerce') / 100  # 美分 -> 美元
+        df['initialprice'] = pd.to_numeric(df['initialprice'], errors='coerce') / 100
+        return df
+
+
+def get_median_playtime(app_ids, client=None, sink=None, index=None):
     median_playtimes = {}
+    own_client = client is None
+    client = client or SteamSpyClient()
 
-    for app_id in app_ids:
-        # 构造 API 请求的 URL
-        url = f"https://steamspy.com/api.php?request=appdetails&appid={app_id}"
+    # 有本地索引时先查索引，只有未收录的游戏才请求 appdetails
+    if index is not None:
+        found = index.lookup(app_ids).set_index('appid')['median_forever']
+        for app_id in app_ids:
+            if int(app_id) in found.index and pd.notna(found[int(app_id)]):
+                median_playtimes[app_id] = found[int(app_id)] / 60
+                if sink is not None:
+                    sink.append([app_id, median_playtimes[app_id]])
+        app_ids = [app_id for app_id in app_ids if app_id not in median_playtimes]
 
-        try:
-            response = requests.get(url)
-            response.raise_for_status()  # 检查请求是否成功
-            data = response.json()
+    try:
+        for app_id, data in tqdm(client.map(client.appdetails, app_ids), total=len(app_ids), desc="SteamSpy"):
+            if isinstance(data, Exception):
+                print(f"Error fetching data for app ID {app_id}: {data}")
+                median_playtimes[app_id] = None
+                continue
 
             # 提取中位数游戏时间
             if 'median_forever' in data:
@@ -22,26 +212,61 @@ def get_median_playtime(app_ids):
             else:
                 median_playtimes[app_id] = None  # 如果没有找到中位数
 
-            # 创建 DataFrame
-            df = pd.DataFrame(list(median_playtimes.items()), columns=['App ID', 'Median Playtime (Hours)'])
+            if sink is not None:
+                sink.append([app_id, median_playtimes[app_id]])
+    finally:
+        if own_client:
+            client.close()
 
-            # 保存为 Excel 文件
-            output_file = 'steamspy_api_results.xlsx'
-            df.to_excel(output_file, index=False)
-            print(f"Current results saved to {output_file}")
+    return median_playtimes
 
-            # 等待随机 1 到 2 秒
-            time.sleep(random.uniform(1, 2))
 
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching data for app ID {app_id}: {e}")
-            median_playtimes[app_id] = None
+def enrich_games(index, games_file=GAMES_FILE, sheet_name='All'):
+    """用本地索引为 games_studied.xlsx 的每个游戏补充时长、拥有者和价格
 
-    return median_playtimes
+    拥有者区间（如 "20,000 .. 50,000"）另外拆成 steamspy_owners_low / steamspy_owners_high 两列数字。
+    """
+    with metrics.timer('excel_io_seconds', op='read', file=games_file):
+        games = pd.read_excel(games_file, sheet_name=sheet_name)
+    games['steamId'] = pd.to_numeric(games['steamId'], errors='coerce').astype('Int64')
+    catalog = index.lookup(games['steamId'].dropna())
+    bounds = catalog['owners'].astype(str).str.replace(',', '').str.extract(r'(\d+)\s*\.\.\s*(\d+)')
+    catalog['owners_low'] = pd.to_numeric(bounds[0], errors='coerce')
+    catalog['owners_high'] = pd.to_numeric(bounds[1], errors='coerce')
+    catalog = catalog.add_prefix('steamspy_')
+    return games.merge(catalog, left_on='steamId', right_on='steamspy_appid', how='left')
+
+
+def write_enriched(enriched, output_file=OUTPUT_FILE, sheet_name=ENRICHED_SHEET):
+    """把补充后的游戏表写入 output_file 的单独工作表（文件已存在时保留其他工作表）"""
+    mode = 'a' if os.path.exists(output_file) else 'w'
+    extra = {'if_sheet_exists': 'replace'} if mode == 'a' else {}
+    with metrics.timer('excel_io_seconds', op='write', file=output_file), \
+            pd.ExcelWriter(output_file, engine='openpyxl', mode=mode, **extra) as writer:
+        enriched.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+if __name__ == "__main__":
+    # 示例 appid 列表
+    app_ids = [
+        2140330, 1190970
+    ] # 这里可以替换为你自己的 appid 列表
 
+    index = enriched = None
+    if USE_CATALOG:
+        index = CatalogIndex()
+        if index.is_stale():
+            client = SteamSpyClient()
+            with metrics.stage('steamspy_catalog'):
+                print(f"Catalog ingested: {index.ingest(client)} apps")
+            client.close()
+        enriched = enrich_games(index)
+        app_ids = enriched['steamId'].dropna().tolist()
 
-# 示例 appid 列表
-app_ids = [
-    2140330, 1190970
-] # 这里可以替换为你自己的 appid 列表
-median_playtimes = get_median_playtime(app_ids)
+    with metrics.stage('steamspy'), ResultSink() as sink:
+        median_playtimes = get_median_playtime(app_ids, sink=sink, index=index)
+    sink.to_excel(OUTPUT_FILE)
+    if enriched is not None:
+        write_enriched(enriched, OUTPUT_FILE)
+    print(f"Results saved to {OUTPUT_FILE}")
+    metrics.export('steamspy')
@@ -1,84 +1,43 @@
 import pandas as pd
-import numpy as np
-from scipy import stats
 
-# 读取数据
-file_path = 'games_studied_regional_score.xlsx'
-data = pd.read_excel(file_path, sheet_name='Sheet1')
-
-# 提取全球平均值行
-global_means = data.iloc[-1, 1:].values
-global_means = pd.to_numeric(global_means, errors='coerce')
-global_mean_value = np.nanmean(global_means)
-
-# 创建结果DataFrame
-results = pd.DataFrame(columns=[
-    'Language', 'Mean', 'Global Mean', 'z-statistic',
-    'p-value (raw)', 'p-value (adjusted)', 'Significance', 'Direction'
-])
-
-# 计算比较次数（排除最后一行全球平均值）
-num_comparisons = len(data) - 1
-
-
-# 显著性标记函数
-def get_significance_stars(adjusted_p):
-    if adjusted_p < 0.001:
-        return '***'
-    elif adjusted_p < 0.01:
-        return '**'
-    elif adjusted_p < 0.05:
-        return '*'
-    else:
-        return ''
-
-
-# 逐行计算
-for index, row in data.iterrows():
-    if index == len(data) - 1:
-        continue  # 跳过全球平均值行
-
-    language = row['Language']
-    region_data = pd.to_numeric(row[1:], errors='coerce').dropna().values
-
-    if len(region_data) < 2:
+import resampling
+import sheetcache
+from regionalstats import regional_resampling, regional_ztest, significance_stars, split_regional_table
+
+# 多重比较校正：'bonferroni'、'holm' 或 'bh'（Benjamini-Hochberg）
+CORRECTION = 'bonferroni'
+# 大于 0 时在 z 检验结果旁追加自助法置信区间和置换检验 p 值；显著性标记仍按 z 检验
+RESAMPLES = resampling.N_RESAMPLES
+# 为 True 时再加一列按置换检验校正 p 值的显著性标记（游戏数少的语言正态近似不可靠）；
+# 置换 p 值最小为 1/(RESAMPLES+1)，此时重抽样次数自动提高到校正后仍能达到 p < 0.001
+PERMUTATION_SIGNIFICANCE = False
+
+if __name__ == "__main__":
+    # 读取数据
+    file_path = 'games_studied_regional_score.xlsx'
+    data = sheetcache.load_sheet(file_path, 'Sheet1', numeric='all')
+
+    # 语言 × 游戏 矩阵与最后一行的全球平均值，所有语言一次算完
+    languages, region_scores, global_means = split_regional_table(data)
+    results = regional_ztest(region_scores, global_means, languages, method=CORRECTION)
+    if RESAMPLES:
+        n_resamples = RESAMPLES
+        if PERMUTATION_SIGNIFICANCE:
+            n_resamples = resampling.resamples_for(0.001, results['z-statistic'].notna().sum(), RESAMPLES)
+        resampled = regional_resampling(region_scores, global_means, method=CORRECTION, n_resamples=n_resamples)
+        results = pd.concat([results, resampled.drop(columns='Mean Difference')], axis=1)
+        if PERMUTATION_SIGNIFICANCE:
+            results['Significance (permutation)'] = significance_stars(results['p-value (permutation, adjusted)'])
+
+    # 有效数据不足的语言不参与检验
+    for language in results.loc[results['z-statistic'].isna(), 'Language']:
         print(f"Skipped {language}: insufficient data")
-        continue
-
-    # 计算统计量
-    language_mean = np.nanmean(region_data)
-    language_std = np.nanstd(region_data, ddof=1)
-    n1 = len(region_data)
-    n2 = len(global_means)
-    global_std = np.nanstd(global_means, ddof=1)
-
-    # 计算Z统计量和双边p值
-    z_statistic = (language_mean - global_mean_value) / np.sqrt((language_std ** 2 / n1) + (global_std ** 2 / n2))
-    raw_p = 2 * (1 - stats.norm.cdf(abs(z_statistic)))  # 双边检验
-
-    # Bonferroni校正
-    adjusted_p = min(1, raw_p * num_comparisons)
-
-    # 判断方向和显著性
-    direction = "Higher" if z_statistic > 0 else "Lower"
-    stars = get_significance_stars(adjusted_p)
-
-    # 存储结果
-    results = pd.concat([results, pd.DataFrame({
-        'Language': [language],
-        'Mean': [language_mean],
-        'Global Mean': [global_mean_value],
-        'z-statistic': [z_statistic],
-        'p-value (raw)': [raw_p],
-        'p-value (adjusted)': [adjusted_p],
-        'Significance': [stars],
-        'Direction': [direction]
-    })], ignore_index=True)
+    results = results.dropna(subset=['z-statistic']).reset_index(drop=True)
 
-# 输出结果
-print(results)
+    # 输出结果
+    print(results)
 
-# 保存结果
-output_path = 'Table 2.xlsx'
-results.to_excel(output_path, index=False)
-print(f"\nResults saved to {output_path}")
\ No newline at end of file
+    # 保存结果
+    output_path = 'Table 2.xlsx'
+    results.to_excel(output_path, index=False)
+    print(f"\nResults saved to {output_path}")
@@ -0,0 +1,100 @@
+import os
+
+import pandas as pd
+import pytest
+
+import datasetstore
+
+
+def reviews(ids, languages):
+    n = len(ids)
+    return pd.DataFrame({
+        'review_id': ids,
+        'language': languages,
+        'is_recommended': [True, False] * (n // 2) + [True] * (n % 2),
+        'votes_up': list(range(n, 0, -1)),
+        'votes_funny': 0,
+        'weighted_score': 0.5,
+        'playtime_at_review': '1.0h',
+        'content': [f'review {i}' for i in ids],
+        'created_at': pd.Timestamp('2024-01-01'),
+        'steam_purchase': True,
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    return str(tmp_path / 'reviews')
+
+
+def test_round_trip_keeps_row_order(store):
+    df = reviews(['a', 'b', 'c', 'd'], ['schinese', 'english', 'schinese', 'english'])
+    datasetstore.write_frame(df, store, datasetstore.REVIEW_SCHEMA, 1)
+    back = datasetstore.read_frame(store, datasetstore.REVIEW_SCHEMA, filters={'app_id': 1})
+    assert back['review_id'].tolist() == ['a', 'b', 'c', 'd']
+    assert back['language'].tolist() == df['language'].tolist()
+    assert back['app_id'].tolist() == [1] * 4
+    assert back['votes_up'].tolist() == [4, 3, 2, 1]
+
+
+def test_filters_and_column_selection(store):
+    datasetstore.write_frame(reviews(['a', 'b', 'c'], ['english', 'schinese', 'english']), store,
+                             datasetstore.REVIEW_SCHEMA, 1)
+    datasetstore.write_frame(reviews(['x'], ['english']), store, datasetstore.REVIEW_SCHEMA, 2)
+    english = datasetstore.read_frame(store, datasetstore.REVIEW_SCHEMA, columns=['app_id', 'review_id'],
+                                      filters={'language': 'english'})
+    assert list(english.columns) == ['app_id', 'review_id']
+    assert sorted(zip(english['app_id'], english['review_id'])) == [(1, 'a'), (1, 'c'), (2, 'x')]
+    assert datasetstore.app_ids(store) == [1, 2]
+
+
+def test_rewrite_replaces_partition_and_ignores_leftovers(store):
+    datasetstore.write_frame(reviews(['a', 'b'], ['english', 'english']), store, datasetstore.REVIEW_SCHEMA, 1)
+    # 上次中断留下的临时目录不会被读到
+    os.makedirs(os.path.join(store, '.tmp-app_id=1'))
+    datasetstore.write_frame(reviews(['a', 'b'], ['english', 'english']), store, datasetstore.REVIEW_SCHEMA, 3)
+    os.makedirs(os.path.join(store, '.tmp-app_id=3'))
+    datasetstore.write_frame(reviews(['c'], ['koreana']), store, datasetstore.REVIEW_SCHEMA, 1)
+
+    back = datasetstore.read_frame(store, datasetstore.REVIEW_SCHEMA)
+    assert sorted(zip(back['app_id'], back['review_id'])) == [(1, 'c'), (3, 'a'), (3, 'b')]
+    assert sorted(os.listdir(store)) == ['.tmp-app_id=3', 'app_id=1', 'app_id=3']
+
+
+def test_export_excel_keeps_row_and_sheet_order(store, tmp_path):
+    datasetstore.write_frame(reviews(['a', 'b', 'c', 'd'], ['schinese', 'english', 'koreana', 'english']),
+                             store, datasetstore.REVIEW_SCHEMA, 20)
+    datasetstore.write_frame(reviews(['x'], ['english']), store, datasetstore.REVIEW_SCHEMA, 10)
+    output = str(tmp_path / 'out.xlsx')
+    datasetstore.export_excel(store, datasetstore.REVIEW_SCHEMA, output, order=[20, 10])
+
+    sheets = pd.read_excel(output, sheet_name=None)
+    assert list(sheets) == ['20', '10']
+    assert sheets['20']['review_id'].tolist() == ['a', 'b', 'c', 'd']
+    assert 'app_id' not in sheets['20'].columns
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    """一游戏一工作表的 Excel：review_id 以文本保存，含缺失值和汇总表"""
+    path = str(tmp_path / 'reviews.xlsx')
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({'games': [3]}).to_excel(writer, sheet_name='0_Summary', index=False)
+        for app_id, n in [(10, 3), (20, 1), (30, 4)]:
+            df = reviews([str(app_id * 100 + i) for i in range(n)], ['english', None, 'schinese', 'german'][:n])
+            df.loc[n - 1, 'content'] = None
+            df.to_excel(writer, sheet_name=str(app_id), index=False)
+    return path
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_read_workbook_matches_read_excel(workbook, workers):
+    columns = ['review_id', 'content', 'language', 'is_recommended', 'votes_up']
+    expected = pd.concat([df[columns].assign(app_id=int(name))
+                          for name, df in pd.read_excel(workbook, sheet_name=None).items() if name != '0_Summary'],
+                         ignore_index=True)
+    frame = datasetstore.read_workbook(workbook, columns, workers=workers)
+
+    assert list(frame.columns) == ['app_id'] + columns
+    assert frame['app_id'].tolist() == [10] * 3 + [20] + [30] * 4
+    pd.testing.assert_frame_equal(frame[expected.columns], expected, check_dtype=False)
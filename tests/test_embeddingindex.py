@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+
+import embeddingindex
+import emotioncache
+import sentimentanalysissample as scoring
+from embeddingindex import EmbeddingIndex
+
+
+def rows(n, dim=4, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, rng.random((n, 8)), rng.random(n)
+
+
+def test_embed_texts_empty_input_skips_the_model():
+    assert embeddingindex.embed_texts([]).shape == (0, 0)
+
+
+def test_add_grows_and_keeps_rows_in_order(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    vectors, emotions, confidence = rows(10)
+    for start in range(0, 10, 3):
+        index.add(vectors[start:start + 3], emotions[start:start + 3], confidence[start:start + 3])
+    assert len(index) == 10
+    assert np.array_equal(index.vectors, vectors)
+    assert np.array_equal(index.emotions, emotions)
+    assert np.array_equal(index.confidence, confidence)
+
+
+def test_save_writes_only_new_rows_and_reload_restores_all(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    vectors, emotions, confidence = rows(6)
+    index.add(vectors[:4], emotions[:4], confidence[:4])
+    index.save()
+    index.save()  # 没有新增行时不写分片
+    index.add(vectors[4:], emotions[4:], confidence[4:])
+    index.save()
+    assert index.shard_files() == ['shard-000000.npz', 'shard-000001.npz']
+    with np.load(tmp_path / 'shard-000001.npz') as data:
+        assert len(data['vectors']) == 2
+
+    reloaded = EmbeddingIndex(str(tmp_path))
+    assert np.array_equal(reloaded.vectors, vectors)
+    reloaded.add(vectors[:1], emotions[:1], confidence[:1])
+    reloaded.save()
+    assert reloaded.shard_files()[-1] == 'shard-000002.npz'
+
+
+def test_leftover_tmp_is_removed(tmp_path):
+    (tmp_path / 'shard-000000.npz.tmp').write_bytes(b'truncated')
+    index = EmbeddingIndex(str(tmp_path))
+    assert len(index) == 0 and not os.listdir(tmp_path)
+
+
+def test_many_shards_are_merged_on_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddingindex, 'MAX_SHARDS', 3)
+    index = EmbeddingIndex(str(tmp_path))
+    vectors, emotions, confidence = rows(5)
+    for i in range(5):
+        index.add(vectors[i:i + 1], emotions[i:i + 1], confidence[i:i + 1])
+        index.save()
+    merged = EmbeddingIndex(str(tmp_path))
+    assert merged.shard_files() == ['shard-000005.npz']
+    assert np.array_equal(merged.vectors, vectors)
+
+
+def test_merged_shard_supersedes_undeleted_older_shards(tmp_path, monkeypatch):
+    index = EmbeddingIndex(str(tmp_path))
+    vectors, emotions, confidence = rows(3)
+    index.add(vectors, emotions, confidence)
+    index.save()
+    # 模拟合并写完、删除旧分片前中断
+    index._write_shard(1, slice(0, 3), merged=True)
+    reloaded = EmbeddingIndex(str(tmp_path))
+    assert len(reloaded) == 3
+    assert reloaded.shard_files() == ['shard-000001.npz']
+
+
+def test_search_matches_brute_force(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddingindex, 'SEARCH_CHUNK', 7)
+    index = EmbeddingIndex(str(tmp_path))
+    vectors, emotions, confidence = rows(30)
+    index.add(vectors, emotions, confidence)
+    queries = rows(4, seed=1)[0]
+    sims, idx = index.search(queries, 5)
+    expected = np.argsort(-(queries @ vectors.T), axis=1)[:, :5]
+    assert np.array_equal(idx, expected)
+    assert np.all(np.diff(sims, axis=1) <= 0)
+
+
+def llm_result(text):
+    emotions = dict.fromkeys(scoring.EMOTION_TYPES, 0.0)
+    emotions['Trust'] = 0.9
+    return scoring.finalize_result(emotions, 0.8)
+
+
+def test_only_model_results_enter_the_index_once(tmp_path, monkeypatch):
+    texts = ['非常好玩，强烈推荐', 'cached review', 'llm review', 'llm review']
+    codes = {text: i for i, text in enumerate(dict.fromkeys(texts))}
+    monkeypatch.setattr(embeddingindex, 'embed_texts',
+                        lambda texts: np.eye(8, dtype=np.float32)[[codes[t] for t in texts]])
+    monkeypatch.setattr(scoring, 'SCORING_MODE', 'cascade')
+    # 缓存在开启近邻传播之前就已填好：缓存命中的文本不在向量库里
+    cache = emotioncache.EmotionCache(str(tmp_path / 'cache.sqlite'))
+    cache.put(emotioncache.make_key('cached review', scoring.MODEL, scoring.OPTIONS, scoring.PROMPT_VERSION),
+              llm_result('cached review'))
+    calls = []
+    monkeypatch.setattr(scoring, 'analyze_sentiment', lambda text: calls.append(text) or llm_result(text))
+    recorder = scoring.LLMRecorder()
+    scorer = scoring.make_scorer(cache, recorder)
+    index = EmbeddingIndex(str(tmp_path / 'index'))
+
+    frame = scoring.score_with_neighbours(texts, scorer, index, recorder, bar=None)
+    assert len(frame) == 4
+    # 词典直接打分的不加入；缓存命中的补进库里；同一文本只加一次
+    assert set(calls) == {'llm review'}
+    assert sorted(index.vectors.argmax(axis=1)) == [1, 2]
+    assert 'cached review' in index and 'llm review' in index and '非常好玩，强烈推荐' not in index
+    assert scorer.counts == {'fast': 1, 'slow': 3}
+
+    # 再打一遍（阈值调高，不做传播）：都已在库里，不重复加入；文本哈希随分片一起保存
+    monkeypatch.setattr(scoring, 'KNN_THRESHOLD', 2.0)
+    scoring.score_with_neighbours(texts, scorer, index, recorder, bar=None)
+    assert len(index) == 2
+    index.save()
+    assert 'cached review' in EmbeddingIndex(str(tmp_path / 'index'))
+    cache.close()
+
+
+def test_empty_batch_with_index(tmp_path):
+    index = EmbeddingIndex(str(tmp_path))
+    frame = scoring.score_with_neighbours([], scoring.analyze_sentiment_fast, index)
+    assert len(frame) == 0 and len(index) == 0
@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+import emotioncache
+from emotioncache import EmotionCache, make_key
+
+
+def result(emotion='Joy', padding=''):
+    return {'sentiment': 'positive', 'confidence': 0.9, 'emotions': {emotion: 0.9},
+            'dominant_emotion': emotion, 'note': padding}
+
+
+def last_used(path):
+    conn = sqlite3.connect(path)
+    rows = dict(conn.execute("SELECT key, last_used FROM results"))
+    conn.close()
+    return rows
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'cache.sqlite')
+
+
+def test_key_changes_with_any_input():
+    base = make_key('text', 'model', {'temperature': 0.1}, 1)
+    assert base == make_key('text', 'model', {'temperature': 0.1}, 1)
+    assert len({base, make_key('text2', 'model', {'temperature': 0.1}, 1),
+                make_key('text', 'model2', {'temperature': 0.1}, 1),
+                make_key('text', 'model', {'temperature': 0.2}, 1),
+                make_key('text', 'model', {'temperature': 0.1}, 2)}) == 5
+
+
+def test_hits_do_not_write_until_flushed(path):
+    cache = EmotionCache(path)
+    cache.put('a', result())
+    stored = last_used(path)['a']
+    assert cache.get('a') == result()
+    assert cache.get('missing') is None
+    # 命中只记在内存里，关闭时才写回
+    assert last_used(path)['a'] == stored
+    cache.close()
+    assert last_used(path)['a'] > stored
+    assert EmotionCache(path).stats()['entries'] == 1
+
+
+def test_touches_are_flushed_in_batches(path, monkeypatch):
+    monkeypatch.setattr(emotioncache, 'TOUCH_BATCH', 2)
+    cache = EmotionCache(path)
+    cache.put('a', result())
+    cache.put('b', result())
+    before = last_used(path)
+    cache.get('a')
+    assert last_used(path) == before
+    cache.get('b')
+    after = last_used(path)
+    assert after['a'] > before['a'] and after['b'] > before['b']
+    cache.close()
+
+
+def test_eviction_respects_unflushed_hits(path):
+    entry = len(result(padding='x' * 100).__repr__())
+    cache = EmotionCache(path, max_bytes=10 ** 9)
+    for key in ['a', 'b', 'c']:
+        cache.put(key, result(padding='x' * 100))
+    cache.get('a')  # a 最近被用过，不应被淘汰
+    cache.max_bytes = cache.total_bytes - entry // 2
+    cache.put('d', result(padding='x' * 100))
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.stats()['evictions'] == 2
+    cache.close()
+
+
+def test_error_results_are_not_cached(path):
+    cache = EmotionCache(path)
+    cache.put('a', result(emotion='error'))
+    assert cache.get('a') is None
+    assert cache.stats()['skipped_errors'] == 1
+    cache.close()
@@ -0,0 +1,69 @@
+import pytest
+
+import emotionlexicon
+import sentimentanalysissample as scoring
+from emotionlexicon import score_text
+
+
+def dominant(text):
+    emotions, confidence = score_text(text)
+    top = max(emotions, key=emotions.get)
+    return (top if emotions[top] else None), confidence
+
+
+@pytest.mark.parametrize('text', [
+    '不推荐，不好玩',
+    '不是很推荐',
+    '一点都不好玩',
+    'not fun, not worth it',
+    "I don't recommend, not fun at all",
+    'never had fun with this',
+])
+def test_negated_positive_phrases_are_not_joy(text):
+    emotion, confidence = dominant(text)
+    assert emotion not in emotionlexicon.POSITIVE
+    assert confidence < scoring.CASCADE_THRESHOLD
+
+
+def test_negated_hit_counts_against_its_polarity():
+    emotion, confidence = dominant('不好玩，垃圾')
+    assert emotion == 'Anger'
+    assert confidence >= scoring.CASCADE_THRESHOLD
+
+
+def test_negation_does_not_cross_clauses():
+    assert dominant('不贵，好玩')[0] == 'Joy'
+    assert dominant('no bugs. great fun')[0] == 'Joy'
+
+
+def test_lexicon_terms_that_contain_negation_words_still_match():
+    assert dominant("can't wait for the roadmap")[0] == 'Anticipation'
+    assert dominant('没想到')[0] == 'Surprise'
+    assert dominant('无敌好玩')[0] == 'Joy'
+
+
+def test_single_characters_do_not_match_inside_other_words():
+    assert dominant('这游戏滚动条做得很好') == (None, 0.0)
+    assert all(len(word) > 1 for words in emotionlexicon.LEXICON.values() for word in words)
+
+
+def test_plain_positive_and_ratings():
+    assert dominant('太好玩了，神作')[0] == 'Joy'
+    assert dominant('10/10 masterpiece')[0] == 'Joy'
+    assert dominant('3/10')[0] == 'Disgust'
+
+
+def test_empty_and_unmatched_text():
+    assert score_text('')[1] == 0.0
+    assert score_text(None)[1] == 0.0
+    assert score_text('今天天气不错')[1] == 0.0
+
+
+def test_cascade_sends_negated_reviews_to_the_llm():
+    slow_calls = []
+    cascade = scoring.Cascade(scoring.analyze_sentiment_fast,
+                              lambda text: slow_calls.append(text) or {'confidence': 1.0})
+    cascade('不推荐，不好玩')
+    cascade('太好玩了，神作，推荐')
+    assert slow_calls == ['不推荐，不好玩']
+    assert cascade.counts == {'fast': 1, 'slow': 1}
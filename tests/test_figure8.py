@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+import figure8
+from regionalstats import fisher_exact_2x2
+
+
+def language_table(rows):
+    return pd.DataFrame(rows, columns=['Anger', 'Joy', 'Trust']).rename(
+        index=dict(enumerate(['english', 'schinese', 'russian'][:len(rows)])))
+
+
+def test_rate_gap_permutation_ignores_other_languages():
+    pair = [[30, 50, 20], [10, 70, 20]]
+    with_other = figure8.permutation_tests(language_table(pair + [[400, 5, 5]]), 2000)[1]
+    pair_only = figure8.permutation_tests(language_table(pair), 2000)[1]
+    assert np.allclose(with_other, pair_only)
+
+
+def test_rate_gap_permutation_agrees_with_fisher():
+    table = language_table([[30, 50, 20], [10, 70, 20], [400, 5, 5]])
+    p_perm = figure8.permutation_tests(table, 4000)[1]
+    p_fisher = figure8.fisher_pvalues(table, [0], [1])[0]
+    assert np.all(np.abs(p_perm - p_fisher) < 0.02)
+    assert p_perm[2] > 0.5
+
+
+def test_missing_pair_language_gives_nan():
+    table = language_table([[30, 50, 20]])
+    p_overall, p_gap = figure8.permutation_tests(table, 100)
+    assert np.isnan(p_gap).all()
+
+
+def test_fisher_exact_matches_scipy():
+    from scipy.stats import fisher_exact
+    tables = np.array([[[3, 7], [9, 1]], [[12, 5], [4, 20]]])
+    expected = [fisher_exact(t)[1] for t in tables]
+    assert np.allclose(fisher_exact_2x2(tables), expected)
+
+
+def reviews_frame(seed=0, n=2000):
+    """随机评论：含缺失语言 / 情感，以及不是 positive/negative 的推荐值"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'language': rng.choice(['english', 'schinese', 'russian', 'german', None], n, p=[.4, .3, .15, .1, .05]),
+        'is_recommended': rng.choice(['positive', 'negative', 'error'], n, p=[.6, .35, .05]),
+        'dominant_emotion': rng.choice(figure8.EMOTIONS + [None], n),
+    })
+    # 只出现在 error 行里的语言：立方体里有这一行，但计数全为 0
+    df.loc[0, ['language', 'is_recommended']] = ['french', 'error']
+    return df
+
+
+def test_count_cube_matches_crosstab():
+    df = reviews_frame()
+    cube = figure8.count_cube(df)
+    valid = df[df['is_recommended'].isin(figure8.SENTIMENTS)]
+    for sentiment in figure8.SENTIMENTS:
+        subset = valid[valid['is_recommended'] == sentiment]
+        expected = pd.crosstab(subset['language'], subset['dominant_emotion'])
+        table = figure8.contingency_table(cube, sentiment)
+        pd.testing.assert_frame_equal(table, expected, check_dtype=False, check_names=False)
+    assert cube.loc['french'].to_numpy().sum() == 0
+    assert cube.to_numpy().sum() == len(valid.dropna())
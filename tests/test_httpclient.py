@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from fixtureserver import FixtureServer, json_response
+from httpclient import RateLimiter, ResponseCache, get_with_retry
+
+
+def test_burst_is_available_immediately():
+    limiter = RateLimiter(rate=1, burst=3)
+    assert [limiter.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_rate_is_enforced_after_burst():
+    limiter = RateLimiter(rate=20, burst=1)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    # 第一个令牌立即可用，其余 4 个每个 1/20 秒
+    assert time.monotonic() - start >= 4 / 20 * 0.9
+
+
+def test_budget_is_shared_between_threads():
+    limiter = RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=lambda: [limiter.acquire() for _ in range(5)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start >= 19 / 50 * 0.9
+
+
+def flaky(failures, status=503):
+    calls = []
+
+    def route(query):
+        calls.append(query)
+        if len(calls) <= failures:
+            return status, 'text/plain', 'busy', {'Retry-After': '0'}
+        return json_response({'ok': True})
+
+    return route, calls
+
+
+def test_retries_on_503_until_success():
+    route, calls = flaky(2)
+    with FixtureServer({'/api': route}) as server:
+        response = get_with_retry(server.url + '/api', params={'x': '1'}, max_retries=3)
+    assert response.json() == {'ok': True}
+    assert len(calls) == 3
+
+
+def test_gives_up_after_max_retries():
+    route, calls = flaky(10)
+    with FixtureServer({'/api': route}) as server:
+        with pytest.raises(requests.exceptions.HTTPError):
+            get_with_retry(server.url + '/api', max_retries=2)
+    assert len(calls) == 3
+
+
+def test_client_errors_are_not_retried():
+    route, calls = flaky(10, status=404)
+    with FixtureServer({'/api': route}) as server:
+        with pytest.raises(requests.exceptions.HTTPError):
+            get_with_retry(server.url + '/api', max_retries=3)
+    assert len(calls) == 1
+
+
+def test_response_cache_expires(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'responses.sqlite'), ttl=60)
+    cache.put('http://x/?a=1', 'body')
+    assert cache.get('http://x/?a=1') == 'body'
+    assert cache.get('http://x/?a=2') is None
+    cache.ttl = 0
+    assert cache.get('http://x/?a=1') is None
+    cache.close()
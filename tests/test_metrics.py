@@ -0,0 +1,54 @@
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def busy_worker(n):
+    return sum(i * i for i in range(n))
+
+
+def test_label_values_are_escaped():
+    metrics.inc('snapshot_hits', file='C:\\data\\"top"\nreviews.xlsx')
+    line = [l for l in metrics.prometheus_text().splitlines() if l.startswith('snapshot_hits_total')][0]
+    assert line == 'snapshot_hits_total{file="C:\\\\data\\\\\\"top\\"\\nreviews.xlsx"} 1'
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics.observe('llm_request_seconds', 0.02)
+    metrics.observe('llm_request_seconds', 3.0)
+    text = metrics.prometheus_text()
+    assert 'llm_request_seconds_bucket{le="0.025"} 1' in text
+    assert 'llm_request_seconds_bucket{le="+Inf"} 2' in text
+    assert 'llm_request_seconds_count 2' in text
+
+
+def test_stage_profile_includes_worker_threads(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'PROFILE', True)
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    expected = [busy_worker(1000), busy_worker(2000)]
+    with metrics.stage('unit'):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            assert list(pool.map(metrics.profiled(busy_worker), [1000, 2000])) == expected
+        metrics.profiled(busy_worker)(10)  # 主线程里直接调用，不重复采集
+    stats = pstats.Stats(str(tmp_path / 'unit.prof')).stats
+    calls = [value[1] for key, value in stats.items() if key[2] == 'busy_worker']
+    assert calls == [3]
+    assert metrics._thread_profiles is None
+
+
+def test_profiled_is_a_passthrough_outside_a_profiling_stage():
+    assert metrics.profiled(busy_worker)(10) == busy_worker(10)
+    with metrics.stage('unit'):
+        assert metrics.profiled(busy_worker)(10) == busy_worker(10)
+    report = metrics.report()
+    assert report['histograms'][0]['name'] == 'stage_seconds'
@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+import fetchregionalscoresample as regional
+from fixtureserver import FixtureServer, steamscout_routes, synthetic_steamscout_page
+
+
+def test_reads_only_the_first_table_with_th_header():
+    df = regional.read_first_table(synthetic_steamscout_page(1, languages=['English', 'Japanese']))
+    assert list(df.columns) == ['Score', 'Language']
+    assert df['Language'].tolist() == ['English', 'Japanese']
+    assert pd.api.types.is_float_dtype(df['Score'])
+
+
+def test_cells_without_header_entities_and_unclosed_tags():
+    html = ("<p>intro</p><table><tr><td>0.5<td>Portugu&ecirc;s &amp; <b>Brasil</b></tr>"
+            "<tr><td> 0.75 </td><td>Simplified\n  Chinese</td></tr></table><table><tr><td>x</td></tr></table>")
+    df = regional.read_first_table(html)
+    assert list(df.columns) == [0, 1]
+    assert df[0].tolist() == [0.5, 0.75]
+    assert df[1].tolist() == ['Português & Brasil', 'Simplified Chinese']
+
+
+def test_nested_table_is_read_whole():
+    html = ("<table><tr><th>Score</th><th>Language</th></tr>"
+            "<tr><td>0.5</td><td>English<table><tr><td>tooltip</td></tr></table></td></tr>"
+            "<tr><td>0.7</td><td>German</td></tr></table>")
+    df = regional.parse_scores(html)
+    # 内层表格不会提前结束外层表格，后面的行照常读入
+    assert df['Language'].str.startswith('English').tolist() == [True, False]
+    assert df['Language'].iloc[1] == 'German'
+    assert df['Score'].tolist() == [0.5, 0.7]
+
+
+def test_no_table():
+    assert regional.read_first_table('<html><body><div id="app"></div></body></html>') is None
+    assert regional.parse_scores('<html></html>') is None
+
+
+def test_parse_scores_swaps_the_first_two_columns():
+    df = regional.parse_scores(synthetic_steamscout_page(1, languages=['English', 'German']))
+    assert list(df.columns) == ['Language', 'Score']
+    assert df['Language'].tolist() == ['English', 'German']
+    assert df['Score'].between(0, 1).all()
+
+
+@pytest.fixture
+def scout():
+    pages = {'2': '<html><script src="app.js"></script><div id="root"></div></html>'}
+    with FixtureServer(steamscout_routes(pages)) as server:
+        yield server.url + '/SteamScout/steamAPI.php?appID={app_id}'
+
+
+def test_http_backend_fetches_every_app(scout):
+    results = regional.fetch_all_http([1, 3, 4], requests_per_second=1000, url=scout)
+    assert sorted(results) == [1, 3, 4]
+    assert all(list(df.columns) == ['Language', 'Score'] for df in results.values())
+
+
+def test_http_backend_fails_loudly_without_a_data_url(monkeypatch):
+    monkeypatch.setattr(regional, 'SCOUT_DATA_URL', None)
+    with pytest.raises(RuntimeError, match='SCOUT_DATA_URL'):
+        regional.fetch_all_http([1])
+
+
+def test_http_backend_fails_loudly_on_a_page_without_tables(scout):
+    # 第一个游戏返回 JavaScript 空壳页面：直接报错
+    with pytest.raises(RuntimeError, match='did not return a scores table'):
+        regional.fetch_all_http([2, 1], requests_per_second=1000, url=scout)
+    # 之后的游戏没有表格只记为失败
+    results = regional.fetch_all_http([1, 2], requests_per_second=1000, url=scout)
+    assert results[1] is not None and results[2] is None
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from scipy import stats
+from statsmodels.stats.multitest import multipletests
+
+from regionalstats import CORRECTIONS, adjust_pvalues, regional_ztest
+
+
+def scores_with_gaps(seed=0, languages=12, games=30):
+    """语言 × 游戏 的评分矩阵：随机缺失，另有一行只剩 1 个游戏、一行全缺失"""
+    rng = np.random.default_rng(seed)
+    scores = rng.normal(0.75, 0.1, (languages, games)) + rng.normal(0, 0.05, (languages, 1))
+    scores[rng.random(scores.shape) < 0.3] = np.nan
+    scores[3, 1:] = np.nan
+    scores[7] = np.nan
+    return scores, rng.normal(0.75, 0.1, games)
+
+
+def baseline_rows(scores, global_scores):
+    """原 table2.py 的逐行循环（Bonferroni 的比较次数取实际检验的语言数）"""
+    global_mean = np.nanmean(global_scores)
+    global_std = np.nanstd(global_scores, ddof=1)
+    rows = {}
+    for i, row in enumerate(scores):
+        values = row[~np.isnan(row)]
+        if len(values) < 2:
+            continue
+        z = (values.mean() - global_mean) / np.sqrt(values.std(ddof=1) ** 2 / len(values)
+                                                     + global_std ** 2 / len(global_scores))
+        rows[i] = (values.mean(), z, 2 * (1 - stats.norm.cdf(abs(z))))
+    return {i: (mean, z, p, min(1, p * len(rows))) for i, (mean, z, p) in rows.items()}
+
+
+def test_ztest_matches_per_row_loop():
+    scores, global_scores = scores_with_gaps()
+    result = regional_ztest(scores, global_scores, languages=[f'L{i}' for i in range(len(scores))])
+    expected = baseline_rows(scores, global_scores)
+
+    assert result['Language'].tolist() == [f'L{i}' for i in range(len(scores))]
+    for i, (mean, z, raw_p, adjusted_p) in expected.items():
+        assert result.loc[i, 'Mean'] == pytest.approx(mean, rel=1e-12)
+        assert result.loc[i, 'z-statistic'] == pytest.approx(z, rel=1e-12)
+        assert result.loc[i, 'p-value (raw)'] == pytest.approx(raw_p, rel=1e-9, abs=1e-15)
+        assert result.loc[i, 'p-value (adjusted)'] == pytest.approx(adjusted_p, rel=1e-9, abs=1e-15)
+        assert result.loc[i, 'Direction'] == ('Higher' if z > 0 else 'Lower')
+    assert result['Global Mean'].eq(global_scores.mean()).all()
+
+
+def test_ztest_skipped_languages_are_nan_rows():
+    scores, global_scores = scores_with_gaps()
+    result = regional_ztest(scores, global_scores)
+
+    skipped = result.loc[[3, 7]]
+    assert skipped[['Mean', 'z-statistic', 'p-value (raw)', 'p-value (adjusted)']].isna().all().all()
+    assert skipped['Significance'].tolist() == ['', '']
+    assert skipped['Direction'].tolist() == ['', '']
+    assert result.drop(index=[3, 7])['z-statistic'].notna().all()
+
+
+def test_ztest_ignores_missing_global_scores():
+    scores, global_scores = scores_with_gaps()
+    with_gaps = np.append(global_scores, [np.nan, np.nan])
+    result = regional_ztest(scores, with_gaps)
+    assert np.allclose(result['z-statistic'], regional_ztest(scores, global_scores)['z-statistic'],
+                       equal_nan=True)
+
+
+@pytest.mark.parametrize('method', sorted(CORRECTIONS))
+def test_adjust_pvalues_matches_multipletests(method):
+    rng = np.random.default_rng(1)
+    p = rng.random(20) ** 3
+    p[[2, 5, 11]] = np.nan
+
+    adjusted = adjust_pvalues(p, method)
+    valid = ~np.isnan(p)
+    assert np.isnan(adjusted[~valid]).all()
+    # 比较次数只算非 NaN 的 p 值
+    assert np.allclose(adjusted[valid], multipletests(p[valid], method=CORRECTIONS[method])[1])
+
+
+def test_adjust_pvalues_all_nan():
+    assert np.isnan(adjust_pvalues([np.nan, np.nan], 'holm')).all()
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import resampling
+from regionalstats import regional_resampling
+
+
+def test_permutation_pvalue_floor_and_nan():
+    resampled = np.zeros((99, 3))
+    p = resampling.permutation_pvalue([5.0, 0.0, np.nan], resampled)
+    assert p[0] == pytest.approx(1 / 100)
+    assert p[1] == 1.0
+    assert np.isnan(p[2])
+
+
+def test_resamples_for_reaches_the_adjusted_threshold():
+    n_resamples = resampling.resamples_for(0.001, 23, n_resamples=1000)
+    assert n_resamples == 23000
+    # 观测值比所有重抽样都极端时，Bonferroni 校正后的最小 p 值低于 0.001
+    assert 23 / (n_resamples + 1) < 0.001
+    assert resampling.resamples_for(0.001, 2, n_resamples=10000) == 10000
+
+
+def test_run_batched_is_independent_of_worker_count():
+    groups = np.repeat([0, 1, 2], [40, 30, 30])
+    categories = np.arange(100) % 4
+    args = dict(n_resamples=50, seed=7)
+    single = resampling.permutation_tables(groups, categories, workers=1, **args)
+    # 强制分成多块、多进程
+    chunks = resampling.run_batched(resampling._permuted_tables, 50,
+                                    args=(groups, categories, 3, 4), per_resample=200, seed=7,
+                                    workers=2, chunk_elements=2000)
+    same_chunks = resampling.run_batched(resampling._permuted_tables, 50,
+                                         args=(groups, categories, 3, 4), per_resample=200, seed=7,
+                                         workers=1, chunk_elements=2000)
+    assert np.array_equal(chunks, same_chunks)
+    assert single.shape == (50, 3, 4)
+    # 置换只打乱组标签：每次置换的组大小和类别合计都不变
+    assert np.array_equal(single.sum(axis=2), np.tile([40, 30, 30], (50, 1)))
+    assert np.array_equal(single.sum(axis=1), np.tile(np.bincount(categories), (50, 1)))
+
+
+def test_chi2_statistic_matches_scipy():
+    from scipy.stats import chi2_contingency
+    table = np.array([[10, 20, 30], [25, 15, 5]])
+    assert resampling.chi2_statistic(table) == pytest.approx(chi2_contingency(table, correction=False)[0])
+
+
+def test_permutation_pvalues_are_calibrated_under_the_null():
+    rng = np.random.default_rng(0)
+    pvalues = []
+    for seed in range(200):
+        groups = np.repeat([0, 1], 30)
+        categories = rng.integers(0, 3, 60)
+        tables = resampling.permutation_tables(groups, categories, 199, seed=seed, workers=1)
+        observed = np.bincount(groups * 3 + categories, minlength=6).reshape(2, 3)
+        pvalues.append(resampling.permutation_pvalue(resampling.chi2_statistic(observed),
+                                                     resampling.chi2_statistic(tables)))
+    pvalues = np.array(pvalues)
+    assert 0.02 <= np.mean(pvalues < 0.05) <= 0.09
+    assert 0.4 <= np.mean(pvalues) <= 0.6
+
+
+def test_regional_resampling_detects_a_shifted_language():
+    rng = np.random.default_rng(1)
+    global_scores = rng.normal(80, 5, 40)
+    scores = np.vstack([global_scores + rng.normal(0, 1, 40),
+                        global_scores - 10 + rng.normal(0, 1, 40),
+                        np.r_[70.0, np.full(39, np.nan)]])
+    result = regional_resampling(scores, global_scores, n_resamples=999, workers=1)
+    assert result.loc[0, 'p-value (permutation)'] > 0.05
+    assert result.loc[1, 'p-value (permutation)'] == pytest.approx(1 / 1000)
+    assert result.loc[1, 'CI low'] < -10 + 3 and result.loc[1, 'CI high'] > -10 - 3
+    assert result.loc[2].isna().all()
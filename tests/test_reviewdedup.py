@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+import reviewdedup
+
+LONG = 'This game is absolutely fantastic, the combat and the story kept me hooked for weeks.'
+
+
+def test_normalize_folds_case_punctuation_and_control_chars():
+    normalized = reviewdedup.normalize(pd.Series(['Great  GAME!!!', 'great game', 'great\x07 game', None]))
+    assert list(normalized) == ['great game', 'great game', 'great game', '']
+
+
+def test_exact_duplicates_share_first_representative():
+    reps = reviewdedup.group_representatives(['Good!', 'bad', 'good', 'BAD.', 'ok'])
+    assert list(reps) == [0, 1, 0, 1, 4]
+
+
+def test_near_duplicates_are_merged():
+    near = LONG.replace('weeks', 'week')
+    other = '这个游戏的优化非常糟糕，掉帧严重，客服也不回复，完全不推荐购买。'
+    reps = reviewdedup.group_representatives([LONG, other, near])
+    assert list(reps) == [0, 1, 0]
+
+
+def test_short_texts_are_only_merged_when_identical():
+    reps = reviewdedup.group_representatives(['10/10', '1/10', '10/10'])
+    assert list(reps) == [0, 1, 0]
+
+
+def test_dissimilar_long_texts_stay_apart():
+    texts = [LONG, 'Terrible port, crashes on launch and the refund took two weeks to arrive.']
+    assert list(reviewdedup.group_representatives(texts)) == [0, 1]
+
+
+def test_minhash_is_deterministic_and_estimates_similarity():
+    a, b = reviewdedup.minhash([LONG, LONG]), reviewdedup.minhash([LONG])
+    assert np.array_equal(a[0], a[1]) and np.array_equal(a[0], b[0])
+    different = reviewdedup.minhash(['completely unrelated sentence about the weather today'])
+    assert np.mean(a[0] == different[0]) < 0.2
+
+
+def test_compression_ratio():
+    assert reviewdedup.compression_ratio(np.array([0, 0, 2, 2])) == 2.0
+    assert reviewdedup.compression_ratio(np.array([], dtype=int)) == 1.0
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+import datasetstore
+import fetchsteamreviewsample as fetcher
+import reviewpipeline
+import scorecheckpoint
+import sentimentanalysissample as scoring
+from fixtureserver import synthetic_steam_reviews
+
+APP_IDS = list(range(1, 41))
+
+
+@pytest.fixture
+def fetched(tmp_path, monkeypatch):
+    """数据集、缓存都写到临时目录；抓取换成本地生成的评论并记录调用，打分只用词典"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scoring, 'analyze_sentiment', scoring.analyze_sentiment_fast)
+    monkeypatch.setattr(scoring, 'SCORING_MODE', 'llm')
+    calls = []
+    lock = threading.Lock()
+
+    def fetch_one(app_id, cache, limiter):
+        with lock:
+            calls.append(app_id)
+        time.sleep(0.02)
+        reviews = synthetic_steam_reviews(app_id, num_reviews=5)
+        return fetcher.rows_to_frame([fetcher.review_to_row(r['recommendationid'], r) for r in reviews])
+
+    monkeypatch.setattr(reviewpipeline, 'fetch_one', fetch_one)
+    return calls
+
+
+def test_run_scores_every_game(fetched):
+    reviewpipeline.run(APP_IDS[:6])
+
+    assert sorted(fetched) == APP_IDS[:6]
+    scores = datasetstore.read_frame(datasetstore.EMOTIONS_DATASET, datasetstore.EMOTION_SCHEMA)
+    assert sorted(scores['app_id'].unique().tolist()) == APP_IDS[:6]
+    assert len(scores) == 6 * 5
+    assert (scores['dominant_emotion'] != 'error').all()
+    assert not len(scorecheckpoint.ScoreCheckpoint().read())
+
+
+def test_consumer_failure_stops_fetching(fetched, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('compact failed')
+
+    monkeypatch.setattr(scorecheckpoint, 'compact', fail)
+    with pytest.raises(RuntimeError, match='compact failed'):
+        reviewpipeline.run(APP_IDS)
+
+    # 出错时只有在途的抓取和队列里的游戏已经开始，剩下的游戏不再抓取
+    assert len(fetched) < len(APP_IDS) // 2
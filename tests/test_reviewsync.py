@@ -0,0 +1,70 @@
+import pytest
+
+import fetchsteamreviewsample as fetcher
+from fixtureserver import FixtureServer, json_response, synthetic_steam_reviews
+from reviewcache import ReviewCache
+
+APP_ID = 7
+
+
+@pytest.fixture
+def steam(monkeypatch):
+    """可修改的评论列表：filter=recent 时按发布时间倒序，否则按点赞数降序"""
+    reviews = synthetic_steam_reviews(APP_ID, num_reviews=30)
+
+    def route(query):
+        key = 'timestamp_created' if query.get('filter') == 'recent' else 'votes_up'
+        ordered = sorted(reviews, key=lambda r: -r[key])
+        offset = 0 if query.get('cursor', '*') == '*' else int(query['cursor'])
+        page = ordered[offset:offset + int(query.get('num_per_page', 20))]
+        return json_response({'success': 1, 'reviews': page, 'cursor': str(offset + len(page))})
+
+    with FixtureServer({'/appreviews/': route}) as server:
+        monkeypatch.setattr(fetcher, 'STEAM_REVIEWS_URL', server.url + '/appreviews/{app_id}')
+        monkeypatch.setattr(fetcher, 'LANGUAGE_QUOTAS', None)
+        yield reviews
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ReviewCache(str(tmp_path / 'reviews.sqlite'), ttl=3600)
+    yield cache
+    cache.close()
+
+
+def fetched_at(cache):
+    return cache.conn.execute("SELECT fetched_at FROM crawls").fetchone()[0]
+
+
+def test_delta_merges_new_reviews_and_keeps_fetch_time(steam, cache):
+    fetcher.sync_reviews(APP_ID, cache)
+    first = fetched_at(cache)
+    newest = max(r['timestamp_created'] for r in steam)
+    assert cache.sync_state(APP_ID, fetcher.cache_params()) == newest
+
+    steam.append(dict(steam[0], recommendationid='new', timestamp_created=newest + 10, votes_up=10 ** 6))
+    df = fetcher.sync_reviews(APP_ID, cache)
+    assert df['review_id'].iloc[0] == 'new'
+    assert cache.sync_state(APP_ID, fetcher.cache_params()) == newest + 10
+    assert fetched_at(cache) == first
+
+
+def test_expired_entry_is_fetched_in_full(steam, cache):
+    fetcher.sync_reviews(APP_ID, cache)
+    old = steam[-1]
+    old['votes_up'] = 10 ** 7
+
+    # 未过期：增量只看新评论，旧评论的点赞数不变
+    df = fetcher.sync_reviews(APP_ID, cache)
+    assert df.loc[df['review_id'] == old['recommendationid'], 'votes_up'].item() != 10 ** 7
+
+    cache.ttl = 0
+    df = fetcher.sync_reviews(APP_ID, cache)
+    assert df.loc[df['review_id'] == old['recommendationid'], 'votes_up'].item() == 10 ** 7
+
+
+def test_full_mode_save_keeps_the_watermark(steam, cache):
+    fetcher.sync_reviews(APP_ID, cache)
+    watermark = cache.sync_state(APP_ID, fetcher.cache_params())
+    fetcher.save_to_cache(cache)(APP_ID, fetcher.fetch_game(APP_ID))
+    assert cache.sync_state(APP_ID, fetcher.cache_params()) == watermark
@@ -0,0 +1,106 @@
+import pandas as pd
+
+import datasetstore
+import scorecheckpoint
+from scorecheckpoint import ScoreCheckpoint
+
+EMOTIONS = ['Anger', 'Disgust', 'Anticipation', 'Fear', 'Joy', 'Sadness', 'Trust', 'Surprise']
+
+
+def results(app_id, review_ids, dominant='Joy'):
+    frame = pd.DataFrame({
+        'app_id': app_id,
+        'review_id': [str(r) for r in review_ids],
+        'content': [f'review {r}' for r in review_ids],
+        'is_recommended': 'positive',
+        'sentiment': 'positive',
+        'confidence': 0.9,
+        'dominant_emotion': dominant,
+    })
+    for emotion in EMOTIONS:
+        frame[emotion] = 0.5
+    return frame.reindex(columns=datasetstore.EMOTION_SCHEMA.names)
+
+
+def test_append_and_read_in_order(tmp_path):
+    checkpoint = ScoreCheckpoint(str(tmp_path))
+    checkpoint.append(results(1, [1, 2]))
+    checkpoint.append(results(1, [3]))
+    assert checkpoint.batch_files() == ['batch-000000.parquet', 'batch-000001.parquet']
+    assert checkpoint.read()['review_id'].tolist() == ['1', '2', '3']
+
+
+def test_resume_ignores_and_removes_truncated_tmp(tmp_path):
+    checkpoint = ScoreCheckpoint(str(tmp_path))
+    checkpoint.append(results(1, [1]))
+    (tmp_path / 'batch-000001.parquet.tmp').write_bytes(b'PAR1 truncated')
+
+    resumed = ScoreCheckpoint(str(tmp_path))
+    assert resumed.batch_files() == ['batch-000000.parquet']
+    assert not (tmp_path / 'batch-000001.parquet.tmp').exists()
+    assert resumed.next_batch == 1
+    resumed.append(results(1, [2]))
+    assert resumed.read()['review_id'].tolist() == ['1', '2']
+
+
+def test_next_batch_follows_highest_file_not_count(tmp_path):
+    checkpoint = ScoreCheckpoint(str(tmp_path))
+    for review_id in range(3):
+        checkpoint.append(results(1, [review_id]))
+    (tmp_path / 'batch-000000.parquet').unlink()
+    resumed = ScoreCheckpoint(str(tmp_path))
+    assert resumed.next_batch == 3
+    resumed.append(results(1, [9]))
+    assert resumed.read()['review_id'].tolist() == ['1', '2', '9']
+
+
+def test_scored_keys_skip_errors(tmp_path):
+    checkpoint = ScoreCheckpoint(str(tmp_path / 'checkpoint'))
+    checkpoint.append(results(1, [1, 2]))
+    checkpoint.append(results(1, [3], dominant='error'))
+    assert scorecheckpoint.scored_keys(str(tmp_path / 'emotions'), checkpoint) == {(1, '1'), (1, '2')}
+
+
+def test_compact_merges_and_clears(tmp_path):
+    output = str(tmp_path / 'emotions')
+    checkpoint = ScoreCheckpoint(str(tmp_path / 'checkpoint'))
+    checkpoint.append(results(7, [1, 2], dominant='error'))
+    checkpoint.append(results(7, [2]))
+    reviews = pd.DataFrame({'app_id': 7, 'review_id': ['2', '1']})
+    scorecheckpoint.compact(output, checkpoint, reviews)
+
+    assert checkpoint.batch_files() == []
+    merged = datasetstore.read_frame(output, datasetstore.EMOTION_SCHEMA)
+    assert merged['review_id'].tolist() == ['2', '1']
+    assert merged['dominant_emotion'].tolist() == ['Joy', 'error']
+
+
+def test_scored_keys_only_reads_requested_games(tmp_path):
+    output = str(tmp_path / 'emotions')
+    checkpoint = ScoreCheckpoint(str(tmp_path / 'checkpoint'))
+    checkpoint.append(results(1, [1]))
+    checkpoint.append(results(2, [5]))
+    scorecheckpoint.compact(output, checkpoint, pd.DataFrame({'app_id': [1, 2], 'review_id': ['1', '5']}))
+    checkpoint.append(results(2, [6]))
+    checkpoint.append(results(3, [7]))
+
+    assert scorecheckpoint.scored_keys(output, checkpoint, [2]) == {(2, '5'), (2, '6')}
+    assert scorecheckpoint.scored_keys(output, checkpoint) == {(1, '1'), (2, '5'), (2, '6'), (3, '7')}
+
+
+def test_compact_keeps_rows_of_other_games(tmp_path):
+    output = str(tmp_path / 'emotions')
+    checkpoint = ScoreCheckpoint(str(tmp_path / 'checkpoint'))
+    checkpoint.append(results(1, [1, 2]))
+    checkpoint.append(results(9, [5, 6]))  # 例如上次中断的流水线留下的
+    scorecheckpoint.compact(output, checkpoint, pd.DataFrame({'app_id': 1, 'review_id': ['1', '2']}))
+
+    assert datasetstore.app_ids(output) == [1]
+    left = checkpoint.read()
+    assert list(zip(left['app_id'], left['review_id'])) == [(9, '5'), (9, '6')]
+    assert checkpoint.batch_files() == ['batch-000002.parquet']
+
+    scorecheckpoint.compact(output, checkpoint, pd.DataFrame({'app_id': 9, 'review_id': ['6', '5']}))
+    assert checkpoint.batch_files() == []
+    assert datasetstore.read_frame(output, datasetstore.EMOTION_SCHEMA,
+                                   filters={'app_id': 9})['review_id'].tolist() == ['6', '5']
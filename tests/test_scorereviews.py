@@ -0,0 +1,51 @@
+import random
+import time
+import zlib
+
+import ollama
+import pytest
+
+import sentimentanalysissample as scoring
+from fixtureserver import FixtureServer, ollama_routes
+
+
+@pytest.fixture(params=[True, False], ids=['streaming', 'blocking'])
+def ollama_server(request, monkeypatch):
+    """Ollama 替身：每个请求随机延迟（完成顺序与提交顺序不同），提示词含 FAIL 的返回 500"""
+    generate = ollama_routes()['/api/generate']
+
+    def route(body):
+        prompt = body.get('prompt', '')
+        time.sleep(random.Random(zlib.crc32(prompt.encode('utf-8'))).uniform(0, 0.05))
+        if 'FAIL' in prompt:
+            return 500, 'application/json', '{"error": "model crashed"}'
+        return generate(body)
+
+    with FixtureServer({'/api/generate': route}) as server:
+        monkeypatch.setattr(scoring, 'generate', ollama.Client(host=server.url).generate)
+        monkeypatch.setattr(scoring, 'STREAMING', request.param)
+        yield server
+
+
+def test_results_come_back_in_input_order(ollama_server):
+    texts = [f'review number {i}' for i in range(24)]
+    expected = [scoring.analyze_sentiment(text) for text in texts]
+    frame = scoring.score_reviews(texts, max_in_flight=6, desc='test')
+
+    assert len(frame) == len(texts)
+    assert frame['confidence'].tolist() == [r['confidence'] for r in expected]
+    assert frame['dominant_emotion'].tolist() == [r['dominant_emotion'] for r in expected]
+    assert frame[scoring.EMOTION_TYPES].to_numpy().tolist() == [
+        [r['emotions'][emo] for emo in scoring.EMOTION_TYPES] for r in expected]
+
+
+def test_failed_requests_become_error_rows(ollama_server):
+    texts = ['fine one', 'FAIL two', 'fine three', 'FAIL four']
+    frame = scoring.score_reviews(texts, max_in_flight=4, desc='test')
+
+    errors = frame['dominant_emotion'] == 'error'
+    assert errors.tolist() == [False, True, False, True]
+    assert (frame.loc[errors, 'confidence'] == 0.0).all()
+    assert (frame.loc[errors, 'sentiment'] == 'negative').all()
+    assert (frame.loc[errors, scoring.EMOTION_TYPES] == 0.0).all().all()
+    assert frame.loc[~errors, 'confidence'].between(0.5, 1.0).all()
@@ -0,0 +1,70 @@
+import os
+
+import pandas as pd
+import pytest
+
+import sheetcache
+
+
+@pytest.fixture(autouse=True)
+def empty_memory(monkeypatch):
+    monkeypatch.setattr(sheetcache, '_memory', {})
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / 'scores.xlsx')
+    pd.DataFrame({'Language': ['english', 'schinese'], 570: [81, 'unknown'], 730: [90, 70]}).to_excel(
+        path, sheet_name='Sheet1', index=False)
+    return path
+
+
+def parse_counter(monkeypatch):
+    calls = []
+    original = pd.read_excel
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(pd, 'read_excel', counting)
+    return calls
+
+
+def test_memory_hit_returns_an_independent_copy(workbook):
+    first = sheetcache.load_sheet(workbook, 'Sheet1', numeric='all')
+    first.loc[0, 730] = -1
+    first['Language'] = first['Language'].str.upper()
+    second = sheetcache.load_sheet(workbook, 'Sheet1', numeric='all')
+    assert second.loc[0, 730] == 90
+    assert second['Language'].tolist() == ['english', 'schinese']
+
+
+def test_snapshot_restores_types_and_column_names(workbook, monkeypatch):
+    sheetcache.load_sheet(workbook, 'Sheet1', numeric='all')
+    sheetcache._memory.clear()
+    calls = parse_counter(monkeypatch)
+    frame = sheetcache.load_sheet(workbook, 'Sheet1', numeric='all')
+    assert calls == []
+    assert list(frame.columns) == ['Language', 570, 730]
+    assert frame[570].isna().tolist() == [False, True]
+
+
+def test_touch_keeps_snapshot_but_new_content_reparses(workbook, monkeypatch):
+    sheetcache.load_sheet(workbook, 'Sheet1')
+    sheetcache._memory.clear()
+    stat = os.stat(workbook)
+    os.utime(workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    calls = parse_counter(monkeypatch)
+    sheetcache.load_sheet(workbook, 'Sheet1')
+    assert calls == []
+
+    pd.DataFrame({'Language': ['english'], 570: [50]}).to_excel(workbook, sheet_name='Sheet1', index=False)
+    assert sheetcache.load_sheet(workbook, 'Sheet1')[570].tolist() == [50]
+    assert len(calls) == 1
+
+
+def test_options_get_separate_snapshots(workbook):
+    raw = sheetcache.load_sheet(workbook, 'Sheet1')
+    numeric = sheetcache.load_sheet(workbook, 'Sheet1', numeric=[570])
+    assert raw[570].tolist() == ['81', 'unknown']
+    assert numeric[570].isna().tolist() == [False, True]
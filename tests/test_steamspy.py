@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+
+import steamspyapisample as steamspy
+from fixtureserver import FixtureServer, STEAMSPY_PAGE_SIZE, steamspy_routes, synthetic_steamspy_catalog
+
+
+@pytest.fixture
+def catalog():
+    return synthetic_steamspy_catalog(num_apps=2500)
+
+
+@pytest.fixture
+def client(catalog):
+    with FixtureServer(steamspy_routes(catalog)) as server:
+        client = steamspy.SteamSpyClient(base_url=server.url + '/api.php', requests_per_second=1000,
+                                         cache_path=None)
+        yield client
+        client.close()
+
+
+@pytest.fixture
+def index(tmp_path, client):
+    index = steamspy.CatalogIndex(str(tmp_path / 'catalog.sqlite'))
+    index.ingest(client, requests_per_second=1000)
+    yield index
+    index.close()
+
+
+def test_ingest_reads_every_page_once(index, catalog):
+    pages, apps = index.conn.execute("SELECT pages, apps FROM ingest_log").fetchone()
+    assert apps == len(catalog)
+    assert pages == -(-len(catalog) // STEAMSPY_PAGE_SIZE)
+    assert not index.is_stale()
+
+
+def test_lookup_converts_cents_and_skips_unknown_ids(index, catalog):
+    df = index.lookup([10, 20, 999999])
+    assert sorted(df['appid']) == [10, 20]
+    row = df.set_index('appid').loc[10]
+    assert row['price'] == int(catalog['10']['price']) / 100
+    assert row['owners'] == catalog['10']['owners']
+
+
+def test_enrich_games_joins_catalog_fields(tmp_path, index, catalog):
+    games_file = tmp_path / 'games.xlsx'
+    pd.DataFrame({'steamId': [10, 30, 999999], 'name': ['a', 'b', 'c']}).to_excel(
+        games_file, sheet_name='All', index=False)
+    enriched = steamspy.enrich_games(index, str(games_file))
+
+    assert len(enriched) == 3
+    first = enriched.iloc[0]
+    assert first['steamspy_average_forever'] == catalog['10']['average_forever']
+    low, high = (int(part.replace(',', '')) for part in catalog['10']['owners'].split(' .. '))
+    assert (first['steamspy_owners_low'], first['steamspy_owners_high']) == (low, high)
+    assert pd.isna(enriched.iloc[2]['steamspy_appid'])
+
+    output = tmp_path / 'out.xlsx'
+    pd.DataFrame({'App ID': [10]}).to_excel(output, index=False)
+    steamspy.write_enriched(enriched, str(output))
+    sheets = pd.read_excel(output, sheet_name=None)
+    assert set(sheets) == {'Sheet1', steamspy.ENRICHED_SHEET}
+    assert len(sheets[steamspy.ENRICHED_SHEET]) == 3
+
+
+def test_median_playtime_uses_index_then_appdetails(index, client, catalog):
+    calls = []
+    appdetails = client.appdetails
+    client.appdetails = lambda app_id: calls.append(app_id) or appdetails(app_id)
+    # 999999 不在索引里，只有它请求 appdetails（替身返回没有 median_forever 的条目）
+    result = steamspy.get_median_playtime([10, 999999], client=client, index=index)
+    assert result[10] == catalog['10']['median_forever'] / 60
+    assert result[999999] is None
+    assert calls == [999999]
+
+
+def test_result_sink_exports_only_this_run(tmp_path):
+    path = str(tmp_path / 'results.csv')
+    with steamspy.ResultSink(path, batch_size=2) as sink:
+        for app_id in [1, 2, 3]:
+            sink.append([app_id, 1.0])
+    assert len(sink.to_excel(str(tmp_path / 'first.xlsx'))) == 3
+
+    with steamspy.ResultSink(path, batch_size=2) as sink:
+        sink.append([4, 2.0])
+        sink.append([4, 3.0])
+    df = sink.to_excel(str(tmp_path / 'second.xlsx'))
+    assert df.values.tolist() == [[4, 3.0]]
+    assert pd.read_excel(tmp_path / 'second.xlsx')['App ID'].tolist() == [4]
+
+
+def test_result_sink_without_results_writes_an_empty_sheet(tmp_path):
+    with steamspy.ResultSink(str(tmp_path / 'results.csv')) as sink:
+        pass
+    df = sink.to_excel(str(tmp_path / 'empty.xlsx'))
+    assert df.empty and list(pd.read_excel(tmp_path / 'empty.xlsx').columns) == steamspy.RESULT_COLUMNS
@@ -0,0 +1,66 @@
+from collections import Counter
+
+import pytest
+
+import fetchsteamreviewsample as fetcher
+from fixtureserver import FixtureServer, json_response, synthetic_steam_reviews
+
+PAGE = 20
+
+
+@pytest.fixture
+def language_server(monkeypatch):
+    """按 language 参数过滤的 appreviews 替身，记录每种语言请求的页数"""
+    reviews = synthetic_steam_reviews(1, num_reviews=600)
+    pages = Counter()
+
+    def route(query):
+        language = query.get('language', 'all')
+        pages[language] += 1
+        matching = [r for r in reviews if language == 'all' or r['language'] == language]
+        offset = 0 if query.get('cursor', '*') == '*' else int(query['cursor'])
+        page = matching[offset:offset + PAGE]
+        return json_response({'success': 1, 'reviews': page, 'cursor': str(offset + len(page))})
+
+    with FixtureServer({'/appreviews/': route}) as server:
+        monkeypatch.setattr(fetcher, 'STEAM_REVIEWS_URL', server.url + '/appreviews/{app_id}')
+        yield reviews, pages
+
+
+def top_votes(reviews, language, k):
+    return sorted((r['votes_up'] for r in reviews if r['language'] == language), reverse=True)[:k]
+
+
+def test_each_language_fills_its_own_quota(language_server):
+    reviews, pages = language_server
+    quotas = {'english': 5, 'schinese': 3}
+    df = fetcher.fetch_reviews_stratified(1, quotas=quotas)
+
+    assert Counter(df['language']) == quotas
+    for language, quota in quotas.items():
+        got = sorted(df.loc[df['language'] == language, 'votes_up'], reverse=True)
+        assert got == top_votes(reviews, language, quota)
+    # 默认翻完每种语言的全部页面
+    for language in quotas:
+        total = sum(r['language'] == language for r in reviews)
+        assert pages[language] == -(-total // PAGE) + 1  # 最后再请求一次空页才知道到底了
+    assert pages['all'] == 0
+
+
+def test_opt_in_early_stop_requests_fewer_pages(language_server):
+    reviews, pages = language_server
+    df = fetcher.fetch_reviews_stratified(1, quotas={'english': 5}, stale_pages=0)
+
+    # 配额填满就停止：只请求了第一页
+    assert pages['english'] == 1
+    assert len(df) == 5 and set(df['language']) == {'english'}
+    # 合成评论按点赞数降序，所以第一页的前 5 条就是精确的前 5
+    assert sorted(df['votes_up'], reverse=True) == top_votes(reviews, 'english', 5)
+
+
+def test_failed_language_fails_the_game(language_server, monkeypatch):
+    monkeypatch.setattr(fetcher, 'MAX_RETRIES', 0)
+    df = fetcher.fetch_reviews_stratified(1, quotas={'english': 5, 'missing': 5})
+    assert df is not None  # 没有评论的语言返回空表，不算失败
+    monkeypatch.setattr(fetcher, 'STEAM_REVIEWS_URL', 'http://127.0.0.1:9/appreviews/{app_id}')
+    assert fetcher.fetch_reviews_stratified(1, quotas={'english': 5}) is None
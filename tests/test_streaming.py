@@ -0,0 +1,72 @@
+import json
+
+import sentimentanalysissample as scoring
+from sentimentanalysissample import JsonObjectScanner
+
+
+def feed_all(chunks):
+    scanner = JsonObjectScanner()
+    for chunk in chunks:
+        obj = scanner.feed(chunk)
+        if obj is not None:
+            return obj
+    return None
+
+
+def test_object_split_across_chunks():
+    text = '{"emotions": {"Joy": 0.9, "Anger": 0.1}, "confidence": 0.8}'
+    chunks = [text[i:i + 3] for i in range(0, len(text), 3)]
+    assert json.loads(feed_all(['  noise before '] + chunks + [' trailing'])) == json.loads(text)
+
+
+def test_braces_and_escaped_quotes_inside_strings():
+    text = '{"note": "a } and { and \\" quote \\\\", "nested": {"x": "}}"}}'
+    assert feed_all([text[:10], text[10:30], text[30:]]) == text
+    assert json.loads(feed_all([text + '{"second": 1}'])) == json.loads(text)
+
+
+def test_truncated_stream_returns_partial_text():
+    scanner = JsonObjectScanner()
+    assert scanner.feed('{"emotions": {"Joy": 0.9') is None
+    assert scanner.text() == '{"emotions": {"Joy": 0.9'
+
+
+class FakeStream:
+    """模拟 ollama 的流式响应：逐块产出，记录是否被提前关闭"""
+
+    def __init__(self, pieces, done=True):
+        self.chunks = [{'response': piece, 'done': False} for piece in pieces]
+        if done:
+            self.chunks.append({'response': '', 'done': True})
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_generate_json_stops_as_soon_as_the_object_closes(monkeypatch):
+    stream = FakeStream(['{"a":', ' {"b": 1}', '}', ' more tokens', ' never read'])
+    monkeypatch.setattr(scoring, 'generate', lambda **kwargs: stream)
+    assert scoring.generate_json('prompt') == '{"a": {"b": 1}}'
+    assert stream.consumed == 3
+    assert stream.closed
+
+
+def test_generate_json_returns_truncated_text_when_the_stream_ends(monkeypatch):
+    for done in (True, False):
+        stream = FakeStream(['{"emotions": ', '{"Joy": 0.9'], done=done)
+        monkeypatch.setattr(scoring, 'generate', lambda **kwargs: stream)
+        assert scoring.generate_json('prompt') == '{"emotions": {"Joy": 0.9'
+        assert stream.closed
+
+
+def test_truncated_output_becomes_an_error_row(monkeypatch):
+    monkeypatch.setattr(scoring, 'STREAMING', True)
+    monkeypatch.setattr(scoring, 'generate', lambda **kwargs: FakeStream(['{"emotions": {"Joy": 0.9']))
+    assert scoring.analyze_sentiment('text')['dominant_emotion'] == 'error'
@@ -0,0 +1,57 @@
+import pytest
+
+import fetchsteamreviewsample as fetcher
+from fetchsteamreviewsample import TopK
+from fixtureserver import FixtureServer, json_response, synthetic_steam_reviews
+
+
+def test_keeps_the_k_largest_in_descending_order():
+    selector = TopK(3)
+    for i, score in enumerate([5, 1, 9, 7, 3, 8]):
+        selector.push(score, f"id{i}", lambda score=score: score)
+    assert selector.items() == [9, 8, 7]
+
+
+def test_ties_keep_the_first_seen_item():
+    selector = TopK(2)
+    for item_id in ['a', 'b', 'c']:
+        selector.push(1, item_id, lambda item_id=item_id: item_id)
+    assert selector.items() == ['a', 'b']
+
+
+def test_duplicate_ids_are_ignored_and_items_built_lazily():
+    selector = TopK(2)
+    built = []
+    assert selector.push(5, 'a', lambda: built.append('a') or 'a')
+    assert not selector.push(6, 'a', lambda: built.append('a again') or 'a again')
+    selector.push(7, 'b', lambda: 'b')
+    assert not selector.push(1, 'c', lambda: built.append('c') or 'c')
+    assert built == ['a']
+
+
+@pytest.fixture
+def unordered_reviews(monkeypatch):
+    """大致按点赞数降序、但点赞最多的一条排在最后一页的评论"""
+    reviews = synthetic_steam_reviews(1, num_reviews=300)
+    reviews.append(dict(reviews[0], recommendationid='late', votes_up=10 ** 6))
+
+    def route(query):
+        offset = 0 if query.get('cursor', '*') == '*' else int(query['cursor'])
+        page = reviews[offset:offset + 50]
+        return json_response({'success': 1, 'reviews': page, 'cursor': str(offset + len(page))})
+
+    with FixtureServer({'/appreviews/': route}) as server:
+        monkeypatch.setattr(fetcher, 'STEAM_REVIEWS_URL', server.url + '/appreviews/{app_id}')
+        yield reviews
+
+
+def test_default_fetch_is_exact_top_k(unordered_reviews):
+    df = fetcher.fetch_reviews(1, top_k=10)
+    expected = sorted(unordered_reviews, key=lambda r: -r['votes_up'])[:10]
+    assert sorted(df['votes_up'], reverse=True) == [r['votes_up'] for r in expected]
+    assert 'late' in set(df['review_id'])
+
+
+def test_early_stop_is_only_approximate(unordered_reviews):
+    df = fetcher.fetch_reviews(1, top_k=10, stale_pages=1)
+    assert 'late' not in set(df['review_id'])